@@ -100,6 +100,7 @@ append_to_sources("vkdispatch_native/", [
     "init.cpp",
     "context.cpp",
     "buffer.cpp",
+    "buffer_pool.cpp",
     "image.cpp",
     "command_list.cpp",
     "stage_transfer.cpp",
@@ -107,6 +108,8 @@ append_to_sources("vkdispatch_native/", [
     "stage_compute.cpp",
     "descriptor_set.cpp",
     "stream.cpp",
+    "staging.cpp",
+    "future.cpp",
     "VMAImpl.cpp",
     "VolkImpl.cpp"
 ])
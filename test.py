@@ -92,13 +92,14 @@ def init_accumulators(max_cross, best_index):
 init_accumulators[max_cross.size](max_cross, best_index)
 
 
-def get_rotation_matrix(angles: typing.List[int], offsets: typing.List[int] = [0, 0]):
-    in_matricies = np.zeros(shape=(4, 4), dtype=np.float32)
+def get_rotation_matrices(angles: np.ndarray, offsets: typing.List[int] = [0, 0]):
+    angles = np.asarray(angles, dtype=np.float64).reshape(-1, 3)
+    in_matricies = np.zeros(shape=(angles.shape[0], 4, 4), dtype=np.float32)
 
-    cos_phi = np.cos(np.deg2rad(angles[0]))
-    sin_phi = np.sin(np.deg2rad(angles[0]))
-    cos_theta = np.cos(np.deg2rad(angles[1]))
-    sin_theta = np.sin(np.deg2rad(angles[1]))
+    cos_phi = np.cos(np.deg2rad(angles[:, 0]))
+    sin_phi = np.sin(np.deg2rad(angles[:, 0]))
+    cos_theta = np.cos(np.deg2rad(angles[:, 1]))
+    sin_theta = np.sin(np.deg2rad(angles[:, 1]))
 
     M00 = cos_phi * cos_theta
     M01 = -sin_phi
@@ -108,25 +109,29 @@ def get_rotation_matrix(angles: typing.List[int], offsets: typing.List[int] = [0
 
     M20 = -sin_theta
 
-    cos_psi_in_plane = np.cos(np.deg2rad(-angles[2] - 90))
-    sin_psi_in_plane = np.sin(np.deg2rad(-angles[2] - 90))
+    cos_psi_in_plane = np.cos(np.deg2rad(-angles[:, 2] - 90))
+    sin_psi_in_plane = np.sin(np.deg2rad(-angles[:, 2] - 90))
 
     m00 = cos_psi_in_plane
     m01 = sin_psi_in_plane
     m10 = -sin_psi_in_plane
     m11 = cos_psi_in_plane
 
-    in_matricies[0, 0] = m00 * M00 + m10 * M01
-    in_matricies[0, 1] = m00 * M10 + m10 * M11
-    in_matricies[0, 2] = m00 * M20
-    in_matricies[0, 3] = offsets[0]
+    in_matricies[:, 0, 0] = m00 * M00 + m10 * M01
+    in_matricies[:, 0, 1] = m00 * M10 + m10 * M11
+    in_matricies[:, 0, 2] = m00 * M20
+    in_matricies[:, 0, 3] = offsets[0]
+
+    in_matricies[:, 1, 0] = m01 * M00 + m11 * M01
+    in_matricies[:, 1, 1] = m01 * M10 + m11 * M11
+    in_matricies[:, 1, 2] = m01 * M20
+    in_matricies[:, 1, 3] = offsets[1]
 
-    in_matricies[1, 0] = m01 * M00 + m11 * M01
-    in_matricies[1, 1] = m01 * M10 + m11 * M11
-    in_matricies[1, 2] = m01 * M20
-    in_matricies[1, 3] = offsets[1]
+    return in_matricies.transpose(0, 2, 1)
 
-    return in_matricies.T
+
+def get_rotation_matrix(angles: typing.List[int], offsets: typing.List[int] = [0, 0]):
+    return get_rotation_matrices([angles[:3]], offsets)[0]
 
 
 @vd.compute_shader(vd.complex64[0])
@@ -438,25 +443,19 @@ batch_size = 100
 
 status_bar = tqdm.tqdm(total=test_values.shape[0])
 
-for i in range(0, test_values.shape[0], batch_size):
-    data = b""
-
-    for j in range(batch_size):
-        if i + j >= test_values.shape[0]:
-            break
 
-        rotation_matrix["rot_matrix"] = get_rotation_matrix(
-            test_values[i + j][:3], [0, 0]
-        )
-        defocus["defocus"] = test_values[i + j][3]
-        template_index["index"] = i + j
+def template_batches():
+    for i in range(0, test_values.shape[0], batch_size):
+        batch_values = test_values[i : i + batch_size]
 
-        for pc_buffer in cmd_list.pc_buffers:
-            data += pc_buffer.get_bytes()
+        yield {
+            "rot_matrix": get_rotation_matrices(batch_values[:, :3], [0, 0]),
+            "defocus": batch_values[:, 3],
+            "index": np.arange(i, i + batch_values.shape[0]),
+        }
 
-    cmd_list.submit(data=data)
 
-    status_bar.update(batch_size)
+cmd_list.stream(template_batches(), depth=3, on_batch=status_bar.update, batched=True)
 
 status_bar.close()
 
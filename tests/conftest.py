@@ -0,0 +1,14 @@
+import pytest
+
+import vkdispatch as vd
+import vkdispatch_native
+
+
+@pytest.fixture(scope="session", autouse=True)
+def require_device() -> None:
+    # Without a build, the source directory is imported as a namespace package
+    if not hasattr(vkdispatch_native, "init"):
+        pytest.skip("vkdispatch_native is not built")
+
+    if len(vd.get_devices()) == 0:
+        pytest.skip("No Vulkan device available")
@@ -0,0 +1,35 @@
+import numpy as np
+
+import vkdispatch as vd
+
+
+def test_submit_all_orders_copy_after_earlier_dispatch():
+    size = 1 << 20
+
+    @vd.compute_shader(vd.float32[0])
+    def fill(buf):
+        ind = vd.shader.global_x.copy()
+        buf[ind] = 7
+
+    @vd.compute_shader(vd.float32[0], vd.float32[0])
+    def double(dst, src):
+        ind = vd.shader.global_x.copy()
+        dst[ind] = src[ind] * 2
+
+    src = vd.Buffer((size,), vd.float32)
+    doubled = vd.Buffer((size,), vd.float32)
+    copied = vd.Buffer((size,), vd.float32)
+
+    # The barrier before double clears the write of src, so the copy in the second
+    # list is only ordered if that barrier already blocks transfer stages
+    first = vd.CommandList()
+    fill[size, first](src)
+    double[size, first](doubled, src)
+
+    second = vd.CommandList()
+    vd.stage_transfer_copy_buffers(second, src, copied)
+
+    vd.submit_all([first, second])
+
+    assert np.all(copied.read(0) == 7)
+    assert np.all(doubled.read(0) == 14)
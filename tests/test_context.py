@@ -0,0 +1,25 @@
+import subprocess
+import sys
+
+# The global context can only be created once per process
+SCRIPT = """
+import vkdispatch as vd
+
+context = vd.make_context(0, stream_depth=3, staging_size=1 << 20, staging_slices=4)
+
+assert vd.get_context() is context
+assert vd.get_context().stream_depth == 3
+assert vd.get_context().staging_size == 1 << 20
+assert vd.get_context().staging_slices == 4
+
+try:
+    vd.make_context(0)
+except RuntimeError:
+    pass
+else:
+    raise AssertionError("A second context was created")
+"""
+
+
+def test_make_context_sets_global_context():
+    subprocess.run([sys.executable, "-c", SCRIPT], check=True)
@@ -1,8 +1,11 @@
 from .buffer import asbuffer
 from .buffer import Buffer
+from .buffer_pool import BufferPool
 from .command_list import CommandList
 from .command_list import get_command_list
 from .command_list import get_command_list_handle
+from .command_list import submit_all
+from .command_list import submit_all_async
 from .context import get_context
 from .context import get_context_handle
 from .context import make_context
@@ -23,6 +26,7 @@ from .dtype import uvec2
 from .dtype import uvec4
 from .dtype import vec2
 from .dtype import vec4
+from .future import Future
 from .image import image
 from .image import image2d
 from .image import image2d_array
@@ -30,6 +34,7 @@ from .image import image3d
 from .init import DeviceInfo
 from .init import get_devices
 from .init import init_instance
+from .pinned_array import PinnedArrayPool
 from .shader_variable import ShaderVariable
 from .shader_builder import PushConstantBuffer
 from .shader_builder import shader
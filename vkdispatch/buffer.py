@@ -1,3 +1,4 @@
+import operator
 from typing import Tuple
 
 import numpy as np
@@ -11,25 +12,305 @@ class Buffer:
     """TODO: Docstring"""
 
     _handle: int
+    _context: "vd.Context"
     var_type: dtype
     shape: Tuple[int]
     size: int
     mem_size: int
+    pool: "vd.BufferPool"
+    host_visible: bool
+    _parent: "Buffer"
+    _byte_offset: int
+    _pending_read: "vd.Future"
 
-    def __init__(self, shape: Tuple[int], var_type: dtype) -> None:
+    def __init__(
+        self,
+        shape: Tuple[int],
+        var_type: dtype,
+        pool: "vd.BufferPool" = None,
+        host_visible: bool = False,
+    ) -> None:
+        """Create a new buffer on every device of the context.
+
+        Parameters:
+        shape (Tuple[int]): The shape of the buffer.
+        var_type (dtype): The data type of the buffer.
+        pool (vd.BufferPool): Take the buffer from this pool and return it there
+            once the buffer is garbage collected. Default is None, which gives
+            the buffer its own allocation.
+        host_visible (bool): Keep the buffer in memory the host can map. Reads and
+            writes then copy directly from and to the mapping, and numpy() gives a
+            view of it without any copy. This is fastest on integrated GPUs, CPU
+            implementations like lavapipe and cards with resizable BAR. Default is
+            False.
+        """
+        self._handle = None
+
+        if pool is not None and host_visible:
+            raise ValueError("Pooled buffers cannot be host visible!")
+
+        # The context is only destroyed after every buffer created in it
+        self._context = vd.get_context()
         self.var_type: dtype = var_type
         self.shape: Tuple[int] = shape
         self.size: int = np.prod(shape)
         self.mem_size: int = self.size * self.var_type.item_size
+        self.pool = pool
+        self.host_visible = host_visible
+        self._parent = None
+        self._byte_offset = 0
+        self._pending_read = None
 
-        self._handle: int = vkdispatch_native.buffer_create(
-            vd.get_context_handle(), self.mem_size
-        )
+        if pool is not None:
+            self._handle: int = vkdispatch_native.buffer_pool_acquire(
+                pool._handle, self.mem_size
+            )
+        else:
+            self._handle: int = vkdispatch_native.buffer_create(
+                self._context._handle, self.mem_size, 1 if host_visible else 0
+            )
 
     def __del__(self) -> None:
-        pass  # vkdispatch_native.buffer_destroy(self._handle)
+        if self._handle is None:
+            return
+
+        # The native side copies a pending read into its array until it is finished
+        self._finish_pending_read()
+
+        # Views share the memory of the buffer they belong to
+        if self._parent is not None:
+            return
+
+        # The native side frees the memory once the submitted work using it has finished
+        if self.pool is not None:
+            vkdispatch_native.buffer_pool_release(self.pool._handle, self._handle)
+        else:
+            vkdispatch_native.buffer_destroy(self._handle)
+
+        self._handle = None
+
+    def _finish_pending_read(self) -> None:
+        if self._pending_read is not None:
+            self._pending_read.result()
+            self._pending_read = None
+
+    def _check_write_data(self, data: np.ndarray, offset: int) -> np.ndarray:
+        if offset < 0 or offset * self.var_type.item_size + data.nbytes > self.mem_size:
+            raise ValueError("The data does not fit in the buffer!")
+
+        return np.ascontiguousarray(data)
+
+    def _check_range(self, offset: int, count: int) -> int:
+        if count is None:
+            count = self.size - offset
+
+        if offset < 0 or count < 0 or offset + count > self.size:
+            raise ValueError("The range is outside of the buffer!")
+
+        return count
+
+    def _make_result_array(
+        self, shape: Tuple[int] = None, out: np.ndarray = None
+    ) -> np.ndarray:
+        shape = (
+            self.shape if shape is None else shape
+        ) + self.var_type._true_numpy_shape
+        numpy_dtype = vd.to_numpy_dtype(self.var_type.scalar)
+
+        if out is None:
+            return np.ndarray(shape=shape, dtype=numpy_dtype)
+
+        if not isinstance(out, np.ndarray):
+            raise ValueError("The output must be a numpy array!")
+
+        if out.shape != tuple(shape) or out.dtype != numpy_dtype:
+            raise ValueError(
+                "The output array must have shape %s and dtype %s, "
+                "not shape %s and dtype %s!"
+                % (tuple(shape), np.dtype(numpy_dtype), out.shape, out.dtype)
+            )
+
+        if not out.flags.c_contiguous or not out.flags.writeable:
+            raise ValueError("The output array must be C contiguous and writeable!")
+
+        return out
+
+    def _get_pinned_target(
+        self, out: np.ndarray, device_index: int
+    ) -> Tuple["Buffer", int]:
+        # Arrays from a PinnedArrayPool view the mapping of a host visible buffer on
+        # the first device. Reads into them copy on the GPU without going through
+        # the staging ring.
+        if out is None or self.host_visible or device_index > 0:
+            return None
+
+        owner = out.base
+
+        while isinstance(owner, np.ndarray):
+            owner = owner.base
+
+        if not isinstance(owner, Buffer) or not owner.host_visible:
+            return None
+
+        mapping = vkdispatch_native.buffer_get_mapping(
+            owner._handle, owner.mem_size, 0, owner
+        )
+
+        return owner, out.ctypes.data - mapping.ctypes.data
+
+    def _get_regions(self, key) -> Tuple[np.ndarray, np.ndarray, Tuple[int]]:
+        if not isinstance(key, tuple):
+            key = (key,)
+
+        if len(key) > len(self.shape):
+            raise IndexError(
+                "Too many indices for a buffer of %d dimensions!" % len(self.shape)
+            )
+
+        starts = []
+        stops = []
+        shape = []
+
+        for dim, dim_size in enumerate(self.shape):
+            index = key[dim] if dim < len(key) else slice(None)
+
+            if isinstance(index, slice):
+                start, stop, step = index.indices(dim_size)
+
+                if step != 1:
+                    raise IndexError("Only slices with a step of 1 are supported!")
+
+                stop = max(start, stop)
+                shape.append(stop - start)
+            else:
+                start = operator.index(index)
+
+                if start < 0:
+                    start += dim_size
+
+                if start < 0 or start >= dim_size:
+                    raise IndexError(
+                        "Index %d is out of bounds for dimension %d with size %d!"
+                        % (index, dim, dim_size)
+                    )
+
+                stop = start + 1
+
+            starts.append(start)
+            stops.append(stop)
+
+        strides = [
+            int(np.prod(self.shape[dim + 1 :])) for dim in range(len(self.shape))
+        ]
+
+        # The innermost dimensions that are selected completely, together with the first
+        # one that is not, are contiguous in memory and copied as one region
+        split = len(self.shape)
+        run_size = 1
+
+        while split > 0:
+            split -= 1
+            run_size *= stops[split] - starts[split]
+
+            if stops[split] - starts[split] != self.shape[split]:
+                break
+
+        offsets = np.array(
+            sum(starts[dim] * strides[dim] for dim in range(split, len(self.shape))),
+            dtype=np.int64,
+        )
+
+        # Every index of the outer dimensions starts another region, in row major order
+        for dim in range(split):
+            offsets = np.add.outer(
+                offsets,
+                np.arange(starts[dim], stops[dim], dtype=np.int64) * strides[dim],
+            )
+
+        item_size = self.var_type.item_size
+        offsets = (offsets.reshape(-1) * item_size + self._byte_offset).astype(
+            np.uint64
+        )
+        sizes = np.full(offsets.shape, run_size * item_size, dtype=np.uint64)
+
+        return offsets, sizes, tuple(shape)
+
+    def view(self, offset: int, shape: Tuple[int], var_type: dtype = None) -> "Buffer":
+        """Create a buffer that views part of this buffer's memory, without a new
+        allocation. Views can be read, written, sliced and copied like any buffer,
+        bound to shader arguments and transformed by FFT plans, which all access
+        the memory at the view's offset. Work on a view is ordered against all
+        other work on the buffer it belongs to.
+
+        Parameters:
+        offset (int): The byte offset of the view in this buffer. Views bound to
+            shader arguments need an offset that is a multiple of the device's
+            storage buffer offset alignment, which is at most 256 bytes. Binding
+            a view with any other offset raises a ValueError.
+        shape (Tuple[int]): The shape of the view.
+        var_type (dtype): The data type of the view. Default is None, which keeps
+            the data type of this buffer.
+
+        Returns:
+        (Buffer): The view. It keeps this buffer alive.
+        """
+        if var_type is None:
+            var_type = self.var_type
+
+        shape = tuple(shape)
+        mem_size = int(np.prod(shape)) * var_type.item_size
+
+        if offset < 0 or offset + mem_size > self.mem_size:
+            raise ValueError("The view does not fit in the buffer!")
+
+        view = Buffer.__new__(Buffer)
+        view._context = self._context
+        view.var_type = var_type
+        view.shape = shape
+        view.size = int(np.prod(shape))
+        view.mem_size = mem_size
+        view.pool = None
+        view.host_visible = self.host_visible
+        view._handle = self._handle
+        view._parent = self if self._parent is None else self._parent
+        view._byte_offset = self._byte_offset + offset
+        view._pending_read = None
+
+        return view
+
+    def numpy(self, device_index: int = 0) -> np.ndarray:
+        """Return a numpy array that views the mapped memory of a host visible
+        buffer. The call waits until the device is done with the buffer, after
+        that the view must not be used while submitted work accesses the buffer.
+        Writes through the view are seen by any work submitted later.
+
+        Parameters:
+        device_index (int): The device whose memory is viewed. Default is 0.
 
-    def write(self, data: np.ndarray, device_index: int = -1) -> None:
+        Returns:
+        (np.ndarray): The contents of the buffer, viewed without a copy.
+        """
+        if not self.host_visible:
+            raise ValueError("Only host visible buffers can be viewed as numpy arrays!")
+
+        self._finish_pending_read()
+
+        mapping = vkdispatch_native.buffer_get_mapping(
+            self._handle, self._byte_offset + self.mem_size, device_index, self
+        )
+
+        if mapping is None:
+            raise ValueError("The buffer is not mapped on device %d!" % device_index)
+
+        vkdispatch_native.buffer_wait(self._handle, device_index)
+
+        return (
+            mapping[self._byte_offset :]
+            .view(vd.to_numpy_dtype(self.var_type.scalar))
+            .reshape(self.shape + self.var_type._true_numpy_shape)
+        )
+
+    def write(self, data: np.ndarray, device_index: int = -1, offset: int = 0) -> None:
         """Given data in some numpy array, write that data to the buffer at device
         specified by device_index. The default device index of -1 will write to the
         all devices.
@@ -38,38 +319,239 @@ class Buffer:
         data (np.ndarray): The data to write to the buffer.
         device_index (int): The device index to write the data to. Default is -1 and
             will write to all devices.
+        offset (int): The element of the buffer where the data starts. Only the bytes
+            of the data are copied, so smaller arrays update part of the buffer.
+            Default is 0.
 
         Returns:
         None
         """
-        if data.size * np.dtype(data.dtype).itemsize != self.mem_size:
-            raise ValueError("Numpy buffer sizes must match!")
+        self._finish_pending_read()
+
+        data = self._check_write_data(data, offset)
 
         vkdispatch_native.buffer_write(
-            self._handle, np.ascontiguousarray(data), 0, self.mem_size, device_index
+            self._handle,
+            data,
+            self._byte_offset + offset * self.var_type.item_size,
+            data.nbytes,
+            device_index,
         )
 
-    def read(self, device_index: int = -1) -> np.ndarray:
+    def write_async(
+        self, data: np.ndarray, device_index: int = -1, offset: int = 0
+    ) -> "vd.Future":
+        """Start writing the data to the buffer and return without waiting for the
+        copy to finish. The data is copied to the context's staging ring before
+        this call returns, so the array can be reused right away.
+
+        Parameters:
+        data (np.ndarray): The data to write to the buffer.
+        device_index (int): The device index to write the data to. Default is -1 and
+            will write to all devices.
+        offset (int): The element of the buffer where the data starts. Default is 0.
+
+        Returns:
+        (vd.Future): A future that is done once the data is in the buffer. It can
+            also be awaited from asyncio code.
+        """
+        self._finish_pending_read()
+
+        data = self._check_write_data(data, offset)
+
+        return vd.Future(
+            vkdispatch_native.buffer_write_async(
+                self._handle,
+                data,
+                self._byte_offset + offset * self.var_type.item_size,
+                data.nbytes,
+                device_index,
+            )
+        )
+
+    def read(
+        self,
+        device_index: int = -1,
+        offset: int = 0,
+        count: int = None,
+        out: np.ndarray = None,
+    ) -> np.ndarray:
         """Read the data in the buffer at the specified device index and return it as a
         numpy array.
 
         Parameters:
         device_index (int): The device index to read the data from. Default is -1 and
             will read from all devices.
+        offset (int): The first element to read. Default is 0.
+        count (int): The number of elements to read. Default is None, which reads up
+            to the end of the buffer. Partial reads return a flat array.
+        out (np.ndarray): A preallocated array to read into instead of allocating a
+            new one. It must be C contiguous and have the shape and dtype of the
+            result. Arrays from a vd.PinnedArrayPool are filled by a copy on the
+            GPU without any staging. Default is None.
 
         Returns:
         (np.ndarray): The data in the buffer as a numpy array.
         """
-        result = np.ndarray(
-            shape=(self.shape + self.var_type._true_numpy_shape),
-            dtype=vd.to_numpy_dtype(self.var_type.scalar),
+        self._finish_pending_read()
+
+        count = self._check_range(offset, count)
+        result = self._make_result_array(
+            None if offset == 0 and count == self.size else (count,), out
         )
+
+        pinned_target = self._get_pinned_target(out, device_index)
+
+        if pinned_target is not None:
+            vkdispatch_native.buffer_copy(
+                self._handle,
+                pinned_target[0]._handle,
+                self._byte_offset + offset * self.var_type.item_size,
+                pinned_target[1],
+                result.nbytes,
+                0,
+            )
+
+            return result
+
         vkdispatch_native.buffer_read(
-            self._handle, result, 0, self.mem_size, device_index
+            self._handle,
+            result,
+            self._byte_offset + offset * self.var_type.item_size,
+            count * self.var_type.item_size,
+            device_index,
+        )
+
+        return result
+
+    def read_async(
+        self,
+        device_index: int = -1,
+        offset: int = 0,
+        count: int = None,
+        out: np.ndarray = None,
+    ) -> "vd.Future":
+        """Start copying the buffer to the host and return without waiting for the
+        copy to finish. The result of the returned future is the numpy array.
+
+        Parameters:
+        device_index (int): The device index to read the data from. Default is -1 and
+            will read from the first device.
+        offset (int): The first element to read. Default is 0.
+        count (int): The number of elements to read. Default is None, which reads up
+            to the end of the buffer. Partial reads return a flat array.
+        out (np.ndarray): A preallocated array to read into instead of allocating a
+            new one. It must be C contiguous and have the shape and dtype of the
+            result. Arrays from a vd.PinnedArrayPool are filled by a copy on the
+            GPU without any staging. Default is None.
+
+        Returns:
+        (vd.Future): A future whose result is the data in the buffer. Awaiting it
+            returns the data without blocking the event loop.
+        """
+        self._finish_pending_read()
+
+        count = self._check_range(offset, count)
+        result = self._make_result_array(
+            None if offset == 0 and count == self.size else (count,), out
         )
 
+        pinned_target = self._get_pinned_target(out, device_index)
+
+        if pinned_target is not None:
+            return vd.Future(
+                vkdispatch_native.buffer_copy_async(
+                    self._handle,
+                    pinned_target[0]._handle,
+                    self._byte_offset + offset * self.var_type.item_size,
+                    pinned_target[1],
+                    result.nbytes,
+                    0,
+                ),
+                lambda: result,
+            )
+
+        def finish_read() -> np.ndarray:
+            vkdispatch_native.buffer_read_finish(
+                self._handle, result, result.nbytes, device_index
+            )
+            return result
+
+        self._pending_read = vd.Future(
+            vkdispatch_native.buffer_read_async(
+                self._handle,
+                result,
+                self._byte_offset + offset * self.var_type.item_size,
+                count * self.var_type.item_size,
+                device_index,
+            ),
+            finish_read,
+        )
+
+        return self._pending_read
+
+    def __getitem__(self, key) -> np.ndarray:
+        """Read a region of the buffer on the first device. Integers and slices with
+        a step of 1 select along each dimension, like with a numpy array, and only
+        the selected bytes are copied. A strided region is copied with one transfer
+        command that holds a copy region per row.
+        """
+        self._finish_pending_read()
+
+        offsets, sizes, shape = self._get_regions(key)
+        result = self._make_result_array(shape)
+
+        if result.size > 0:
+            vkdispatch_native.buffer_read_regions(
+                self._handle, result, offsets, sizes, 0
+            )
+
         return result
 
+    def __setitem__(self, key, value) -> None:
+        """Write to a region of the buffer on every device, selected the same way as
+        with __getitem__. The value is broadcast to the shape of the region.
+        """
+        self._finish_pending_read()
+
+        offsets, sizes, shape = self._get_regions(key)
+
+        data = np.ascontiguousarray(
+            np.broadcast_to(
+                np.asarray(value, dtype=vd.to_numpy_dtype(self.var_type.scalar)),
+                shape + self.var_type._true_numpy_shape,
+            )
+        )
+
+        if data.size > 0:
+            vkdispatch_native.buffer_write_regions(
+                self._handle, data, offsets, sizes, -1
+            )
+
+    def copy_to(self, other: "Buffer", device_index: int = -1) -> None:
+        """Copy the contents of this buffer into another buffer on the GPU. Either
+        buffer can be a view, the copy then only touches the viewed memory.
+
+        Parameters:
+        other (Buffer): The buffer to copy into. Its memory size must match.
+        device_index (int): The device index to copy on. Default is -1 and will
+            copy on all devices.
+        """
+        if other.mem_size != self.mem_size:
+            raise ValueError("Buffer memory sizes must match!")
+
+        self._finish_pending_read()
+        other._finish_pending_read()
+
+        vkdispatch_native.buffer_copy(
+            self._handle,
+            other._handle,
+            self._byte_offset,
+            other._byte_offset,
+            self.mem_size,
+            device_index,
+        )
+
 
 # TODO: Move this to a class method of Buffer
 def asbuffer(array: np.ndarray) -> Buffer:
@@ -0,0 +1,84 @@
+from typing import Dict
+from typing import Tuple
+
+import vkdispatch as vd
+import vkdispatch_native
+from vkdispatch.dtype import dtype
+
+
+class BufferPool:
+    """A pool of device buffers for short-lived scratch buffers. Buffers are
+    sub-allocated from large memory blocks and rounded up to a size class, and a
+    released buffer is kept for the next buffer of the same size class instead of
+    being freed.
+    """
+
+    _handle: int
+    _context: "vd.Context"
+    block_size: int
+
+    def __init__(self, block_size: int = 256 * 1024 * 1024) -> None:
+        """Create a new buffer pool on every device of the context.
+
+        Parameters:
+        block_size (int): The size in bytes of the memory blocks that buffers are
+            sub-allocated from. Default is 256 MiB.
+        """
+        self.block_size = block_size
+        self._context = vd.get_context()
+        self._handle = vkdispatch_native.buffer_pool_create(
+            self._context._handle, block_size
+        )
+
+    def __del__(self) -> None:
+        if getattr(self, "_handle", None) is None:
+            return
+
+        # Every buffer of the pool holds a reference to it, so all of them were released
+        vkdispatch_native.buffer_pool_destroy(self._handle)
+
+    def allocate(self, shape: Tuple[int], var_type: dtype) -> "vd.Buffer":
+        """Get a buffer from the pool. It returns to the pool once it is garbage
+        collected.
+
+        Parameters:
+        shape (Tuple[int]): The shape of the buffer.
+        var_type (dtype): The data type of the buffer.
+
+        Returns:
+        (vd.Buffer): The pooled buffer.
+        """
+        return vd.Buffer(shape, var_type, pool=self)
+
+    def trim(self) -> None:
+        """Free every buffer that was released to the pool, once the GPU is done
+        with it.
+        """
+        vkdispatch_native.buffer_pool_trim(self._handle)
+
+    def get_stats(self) -> Dict[str, int]:
+        """Get the statistics of the pool, summed over all devices.
+
+        Returns:
+        (Dict[str, int]): The number and total size of the memory blocks and of the
+            buffers allocated in them, the number and total size of released
+            buffers waiting for reuse, and how many requests were served by a
+            released buffer (hits) or needed a new allocation (misses).
+        """
+        stats = vkdispatch_native.buffer_pool_get_stats(self._handle)
+
+        return dict(
+            zip(
+                [
+                    "block_count",
+                    "block_bytes",
+                    "allocation_count",
+                    "allocation_bytes",
+                    "free_count",
+                    "free_bytes",
+                    "hits",
+                    "misses",
+                ],
+                stats,
+            )
+        )
@@ -1,6 +1,13 @@
+import collections
+import queue
+import threading
 from typing import Any
 from typing import Callable
+from typing import Dict
+from typing import Iterable
 from typing import List
+from typing import Optional
+from typing import Tuple
 
 import numpy as np
 
@@ -12,18 +19,52 @@ class CommandList:
     """TODO: Docstring"""
 
     _handle: int
+    _context: "vd.Context"
     _reset_on_submit: bool
+    _frozen: bool
+    _profiling: bool
+    params_buffer: bool
     pc_buffers: List
     descriptor_sets: List
+    resources: List
+    stage_names: List[str]
+    dependencies: List["CommandList"]
 
-    def __init__(self, reset_on_submit: bool = False) -> None:
-        self._handle = vkdispatch_native.command_list_create(vd.get_context_handle())
+    def __init__(
+        self, reset_on_submit: bool = False, params_buffer: bool = False
+    ) -> None:
+        """Create a new command list.
+
+        Parameters:
+        reset_on_submit (bool): Clear the recorded stages after every submit.
+        params_buffer (bool): Upload the per-instance shader parameters of each
+            submit into one device storage buffer that every dispatch reads its
+            slot from, instead of recording them as push constants. This keeps
+            the command buffer size independent of the instance data and lets
+            frozen lists replay new parameters without recording again. The
+            buffer has a slot for every command buffer the streams of a device
+            keep in flight, so submits only wait for a slot once that many are
+            pending. A frozen list always uses the same slot, so each of its
+            submits waits on the host for the previous one to finish.
+        """
+        self._context = vd.get_context()
+        self._handle = vkdispatch_native.command_list_create(self._context._handle)
         self.pc_buffers = []
         self.descriptor_sets = []
+        self.resources = []
+        self.stage_names = []
+        self.dependencies = []
         self._reset_on_submit = reset_on_submit
+        self._frozen = False
+        self._profiling = False
+        self.params_buffer = params_buffer
 
     def __del__(self) -> None:
-        pass  # vkdispatch_native.command_list_destroy(self._handle)
+        if getattr(self, "_handle", None) is None:
+            return
+
+        # The native side frees the list once every submit of it has finished
+        vkdispatch_native.command_list_destroy(self._handle)
 
     def get_instance_size(self) -> int:
         """Get the total size of the command list in bytes."""
@@ -37,48 +78,454 @@ class CommandList:
         """Add a descriptor set to the command list."""
         self.descriptor_sets.append(descriptor_set)
 
+    def add_resource(self, resource) -> None:
+        """Keep an object used by a recorded stage alive until the list is reset."""
+        self.resources.append(resource)
+
+    def add_stage_name(self, name: str) -> None:
+        """Name the stage that was just recorded, used to label profiling results."""
+        self.stage_names.append(name)
+
     def reset(self) -> None:
         """Reset the command list by clearing the push constant buffer and descriptor
         set lists. The call to command_list_reset frees all associated memory.
         """
+        # The stages are cleared before the descriptor sets they bind can be destroyed
+        vkdispatch_native.command_list_reset(self._handle)
         self.pc_buffers = []
         self.descriptor_sets = []
-        vkdispatch_native.command_list_reset(self._handle)
+        self.resources = []
+        self.stage_names = []
+
+    def depends_on(self, *command_lists: "CommandList") -> None:
+        """Make every following submit of this list wait on the GPU for the last
+        submit of each given list on the same device. Lists without a dependency
+        between them are spread over the queues of the device and run concurrently.
 
-    def submit(self, device_index: int = 0, data: bytes = None) -> None:
-        """Submit the command list to the specified device with additional data to
-        append to the front of the command list.
-        
         Parameters:
-        device_index (int): The device index to submit the command list to.\
-                Default is 0.
-        data (bytes): The additional data to append to the front of the command list.
+        command_lists (CommandList): The command lists this list depends on.
+        """
+        for command_list in command_lists:
+            if command_list is self:
+                raise ValueError("A command list cannot depend on itself!")
+
+            # Keeping a reference also keeps the native list alive while this one
+            # points to it
+            if command_list not in self.dependencies:
+                self.dependencies.append(command_list)
+                vkdispatch_native.command_list_add_dependency(
+                    self._handle, command_list._handle
+                )
+
+    def clear_dependencies(self) -> None:
+        """Remove all dependencies declared with depends_on."""
+        self.dependencies = []
+        vkdispatch_native.command_list_clear_dependencies(self._handle)
+
+    def freeze(self) -> None:
+        """Freeze the command list so that its stages are recorded into a reusable
+        command buffer once and replayed on every following submit. The recording
+        is only redone when the stages, the instance count or the instance data
+        change. Stages reading their parameters from the parameters buffer do not
+        count as changed instance data.
         """
-        instances = None
+        if self._reset_on_submit:
+            raise ValueError("Cannot freeze a command list that resets on submit!")
+
+        vkdispatch_native.command_list_freeze(self._handle)
+        self._frozen = True
+
+    def unfreeze(self) -> None:
+        """Release the frozen recordings and go back to recording on every submit."""
+        vkdispatch_native.command_list_unfreeze(self._handle)
+        self._frozen = False
+
+    @property
+    def frozen(self) -> bool:
+        return self._frozen
+
+    def enable_profiling(self, enabled: bool = True) -> None:
+        """Write GPU timestamps before and after every stage of every instance in
+        the following submits, so that get_profile can report where the time goes.
+        Profiling adds a query pool per device and makes each submit wait on the
+        host for the previous profiled submit of this list, so async submits of a
+        profiled list do not overlap. It also places a barrier between all stages,
+        including independent ones that would otherwise run concurrently.
+
+        Parameters:
+        enabled (bool): Turn profiling on or off. Default is True.
+        """
+        vkdispatch_native.command_list_set_profiling(self._handle, enabled)
+        self._profiling = enabled
+
+    @property
+    def profiling(self) -> bool:
+        return self._profiling
+
+    def get_profile(self, device_index: int = 0) -> List[Tuple[str, np.ndarray]]:
+        """Wait for the last profiled submit on the given device and return its
+        GPU timings. Stages are separated by barriers while profiling, so the times
+        measure each stage on its own and can add up to more than an unprofiled
+        submit takes, where independent stages overlap.
+
+        Parameters:
+        device_index (int): The device index to get the timings of. Default is 0.
+
+        Returns:
+        (List[Tuple[str, np.ndarray]]): One entry per stage, holding the stage's
+            name and an array with the time in seconds it took in every instance.
+        """
+        timings = vkdispatch_native.command_list_get_profile(self._handle, device_index)
+
+        stage_count = len(self.stage_names)
+
+        if stage_count == 0:
+            return []
+
+        timings = timings.reshape(-1, stage_count) / 1e9
 
+        return [(name, timings[:, ii]) for ii, name in enumerate(self.stage_names)]
+
+    def _get_instance_data(self, data: Any) -> Tuple[memoryview, int]:
         if data is None:
             data = b""
 
             for pc_buffer in self.pc_buffers:
                 data += pc_buffer.get_bytes()
 
-            instances = 1
-
             if len(data) != self.get_instance_size():
                 raise ValueError("Push constant buffer size mismatch!")
-        else:
-            if len(data) % self.get_instance_size() != 0:
-                raise ValueError("Push constant buffer size mismatch!")
 
-            instances = len(data) // self.get_instance_size()
+            return memoryview(data), 1
+
+        # Any contiguous buffer is passed to the native submit without copying it
+        view = memoryview(data)
+
+        if not view.c_contiguous:
+            raise ValueError("Instance data must be contiguous!")
+
+        view = view.cast("B")
+
+        if view.nbytes % self.get_instance_size() != 0:
+            raise ValueError("Push constant buffer size mismatch!")
+
+        return view, view.nbytes // self.get_instance_size()
+
+    def _get_devices(self, device_index: int) -> List[int]:
+        if device_index == -1:
+            return list(range(len(vd.get_context().devices)))
+
+        return [device_index]
+
+    def submit(self, device_index: int = 0, data: Any = None) -> None:
+        """Submit the command list to the specified device with additional data to
+        append to the front of the command list.
+
+        With a device index of -1 the instances are split into one contiguous shard
+        per device in the context. Every shard is submitted before any of them is
+        waited on, and the call returns once all devices have finished.
+        
+        Parameters:
+        device_index (int): The device index to submit the command list to.\
+                Default is 0, -1 shards the instances across all devices.
+        data (Any): The additional data to append to the front of the command list.
+            Any contiguous buffer-protocol object works (bytes, bytearray, numpy
+            arrays, memoryview, mmap) and is read in place without a copy.
+        """
+        data, instances = self._get_instance_data(data)
 
         vkdispatch_native.command_list_submit(
-            self._handle, data, instances, device_index
+            self._handle, data, instances, self._get_devices(device_index)
         )
 
         if self._reset_on_submit:
             self.reset()
 
+    def get_batch_data(self, params: Dict[str, np.ndarray]) -> np.ndarray:
+        """Pack the instance data of a whole batch of instances in one vectorized
+        step, using the layout of the command list's push constant buffers.
+
+        Parameters:
+        params (Dict[str, np.ndarray]): The per-instance values of push constant
+            fields keyed by field name, with the instances along the leading axis.
+            A field is set in every push constant buffer that declares it, and
+            fields that are not given keep their current value.
+
+        Returns:
+        (np.ndarray): The instance data to pass to submit, as a flat uint8 array.
+        """
+        if len(params) == 0:
+            raise ValueError("Must give the values of at least one field!")
+
+        for key in params.keys():
+            if not any(key in pc_buffer.ref_dict for pc_buffer in self.pc_buffers):
+                raise ValueError(f"Invalid push constant '{key}'!")
+
+        instance_count = len(next(iter(params.values())))
+
+        data = np.concatenate(
+            [
+                pc_buffer.get_batch_bytes(instance_count, params)
+                for pc_buffer in self.pc_buffers
+            ],
+            axis=1,
+        )
+
+        if data.shape[1] != self.get_instance_size():
+            raise ValueError("Push constant buffer size mismatch!")
+
+        return data.reshape(-1)
+
+    def submit_batch(
+        self, params: Dict[str, np.ndarray], device_index: int = 0
+    ) -> None:
+        """Submit one instance of the command list for every entry along the
+        leading axis of the given push constant arrays.
+
+        Parameters:
+        params (Dict[str, np.ndarray]): The per-instance values of push constant
+            fields keyed by field name, see get_batch_data.
+        device_index (int): The device index to submit the command list to.\
+                Default is 0, -1 shards the instances across all devices.
+        """
+        self.submit(device_index, self.get_batch_data(params))
+
+    def _pack_instances(self, instances: List[Dict[str, Any]]) -> np.ndarray:
+        params = {
+            key: np.stack([np.asarray(instance[key]) for instance in instances])
+            for key in instances[0].keys()
+        }
+
+        return self.get_batch_data(params)
+
+    def stream(
+        self,
+        param_iter: Iterable[Dict[str, Any]],
+        batch_size: int = 100,
+        depth: int = 2,
+        device_index: int = 0,
+        on_batch: Optional[Callable[[int], None]] = None,
+        batched: bool = False,
+    ) -> int:
+        """Submit one instance of the command list for every set of push constant
+        values produced by an iterator, such as a generator. The values are packed
+        into batches on a background thread while earlier batches run on the GPU,
+        so the device is not left idle while Python builds the next batch.
+
+        Parameters:
+        param_iter (Iterable[Dict[str, Any]]): The push constant values of each
+            instance keyed by field name, every instance must give the same fields.
+            With batched set, every item is instead a whole batch of per-instance
+            arrays keyed by field name, as taken by get_batch_data.
+        batch_size (int): The number of instances submitted together, unused when
+            the items are already batches. Default is 100.
+        depth (int): The number of batches that are packed ahead and the number
+            that are kept in flight on the GPU. Default is 2. With params_buffer,
+            a frozen list only keeps one batch in flight, see CommandList.
+        device_index (int): The device index to submit the command list to.\
+                Default is 0, -1 shards every batch across all devices.
+        on_batch (Optional[Callable[[int], None]]): Called with the instance count
+            of every batch once it was submitted.
+        batched (bool): Whether the iterator produces whole batches. Default is
+            False.
+
+        Returns:
+        (int): The total number of submitted instances. All of them have finished
+            on the GPU when stream returns.
+        """
+        if batch_size < 1 or depth < 1:
+            raise ValueError("Batch size and depth must be positive!")
+
+        if self._reset_on_submit:
+            raise ValueError("Cannot stream a command list that resets on submit!")
+
+        batches = queue.Queue(maxsize=depth)
+        stop = threading.Event()
+
+        def put(item: Any) -> bool:
+            # Polls the stop flag so a failed submitting side never leaves the
+            # packer blocked on a full queue
+            while not stop.is_set():
+                try:
+                    batches.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+
+            return False
+
+        def pack_batch(params: Dict[str, Any]) -> Tuple[np.ndarray, int]:
+            return self.get_batch_data(params), len(next(iter(params.values())))
+
+        def pack() -> None:
+            try:
+                instances = []
+
+                for params in param_iter:
+                    if batched:
+                        if not put(pack_batch(params)):
+                            return
+
+                        continue
+
+                    instances.append(params)
+
+                    if len(instances) == batch_size:
+                        if not put((self._pack_instances(instances), len(instances))):
+                            return
+
+                        instances = []
+
+                if len(instances) > 0:
+                    if not put((self._pack_instances(instances), len(instances))):
+                        return
+
+                put(None)
+            except BaseException as e:
+                put(e)
+
+        # A daemon thread does not hold up the interpreter if the submitting side fails
+        threading.Thread(target=pack, daemon=True).start()
+
+        in_flight = collections.deque()
+        total = 0
+
+        try:
+            while True:
+                batch = batches.get()
+
+                if batch is None:
+                    break
+
+                if isinstance(batch, BaseException):
+                    raise batch
+
+                data, instance_count = batch
+
+                in_flight.append(self.submit_async(device_index, data))
+
+                if len(in_flight) > depth:
+                    in_flight.popleft().wait()
+
+                total += instance_count
+
+                if on_batch is not None:
+                    on_batch(instance_count)
+        finally:
+            stop.set()
+
+            while len(in_flight) > 0:
+                in_flight.popleft().wait()
+
+        return total
+
+    def submit_async(self, device_index: int = 0, data: Any = None) -> "vd.Future":
+        """Submit the command list like submit, and return a future that tracks the
+        completion of the submitted work on the GPU.
+
+        Parameters:
+        device_index (int): The device index to submit the command list to.\
+                Default is 0, -1 shards the instances across all devices.
+        data (Any): The additional data to append to the front of the command list.
+            Any contiguous buffer-protocol object works (bytes, bytearray, numpy
+            arrays, memoryview, mmap) and is read in place without a copy.
+
+        Returns:
+        (vd.Future): A future that is done once the GPU has executed the list. It
+            can also be awaited from asyncio code.
+        """
+        data, instances = self._get_instance_data(data)
+
+        future = vd.Future(
+            vkdispatch_native.command_list_submit_async(
+                self._handle, data, instances, self._get_devices(device_index)
+            )
+        )
+
+        if self._reset_on_submit:
+            self.reset()
+
+        return future
+
+
+def submit_all_async(
+    command_lists: List[CommandList], data: List[Any] = None, device_index: int = 0
+) -> "vd.Future":
+    """Record several command lists into one command buffer and submit them to
+    the device with a single queue submit, in the given order. Barriers are only
+    placed where a list uses a buffer of an earlier one or depends on it. A list
+    can not depend on a list that comes after it. Frozen lists are recorded again
+    into the shared command buffer, their frozen recordings are not reused.
+
+    Parameters:
+    command_lists (List[CommandList]): The command lists to submit, each at most once.
+    data (List[Any]): The instance data of every list, see CommandList.submit.
+        Entries that are None use the list's push constant buffers.
+    device_index (int): The device index to submit the command lists to. Default is 0.
+
+    Returns:
+    (vd.Future): A future that is done once the GPU has executed all lists.
+    """
+    if len(command_lists) == 0:
+        raise ValueError("Must give at least one command list!")
+
+    list_ids = set(id(command_list) for command_list in command_lists)
+
+    if len(list_ids) != len(command_lists):
+        raise ValueError("Each command list can only be submitted once!")
+
+    for index, command_list in enumerate(command_lists):
+        dependencies = command_list.dependencies
+
+        for later_list in command_lists[index + 1 :]:
+            if any(dependency is later_list for dependency in dependencies):
+                raise ValueError(
+                    "A command list can not depend on a list submitted after it!"
+                )
+
+    if data is None:
+        data = [None] * len(command_lists)
+
+    if len(data) != len(command_lists):
+        raise ValueError("Must give the instance data of every command list!")
+
+    if device_index < 0:
+        raise ValueError("Command lists submitted together must go to a single device!")
+
+    instance_data = [
+        command_list._get_instance_data(list_data)
+        for command_list, list_data in zip(command_lists, data)
+    ]
+
+    future = vd.Future(
+        vkdispatch_native.command_list_submit_all(
+            [command_list._handle for command_list in command_lists],
+            [list_data for list_data, _ in instance_data],
+            [instances for _, instances in instance_data],
+            device_index,
+        )
+    )
+
+    for command_list in command_lists:
+        if command_list._reset_on_submit:
+            command_list.reset()
+
+    return future
+
+
+def submit_all(
+    command_lists: List[CommandList], data: List[Any] = None, device_index: int = 0
+) -> None:
+    """Submit several command lists with a single queue submit, like
+    submit_all_async but without returning a future.
+
+    Parameters:
+    command_lists (List[CommandList]): The command lists to submit, each at most once.
+    data (List[Any]): The instance data of every list, see CommandList.submit.
+    device_index (int): The device index to submit the command lists to. Default is 0.
+    """
+    submit_all_async(command_lists, data, device_index)
+
 
 __cmd_list = None
 
@@ -9,23 +9,77 @@ class Context:
     """TODO: Docstring"""
 
     _handle: int
+    devices: List[int]
+    submission_thread_counts: List[int]
+    stream_depth: int
+    staging_size: int
+    staging_slices: int
 
     def __init__(
         self,
         devices: List[int],
         submission_thread_counts: List[int] = None,
+        stream_depth: int = 2,
+        staging_size: int = 64 * 1024 * 1024,
+        staging_slices: int = 2,
     ) -> None:
-        self._handle = vkdispatch_native.context_create(devices, submission_thread_counts)
+        self.devices = devices
+        self.submission_thread_counts = submission_thread_counts
+        self.stream_depth = stream_depth
+        self.staging_size = staging_size
+        self.staging_slices = staging_slices
+        self._handle = vkdispatch_native.context_create(
+            devices,
+            submission_thread_counts,
+            stream_depth,
+            staging_size,
+            staging_slices,
+        )
 
     def __del__(self) -> None:
-        pass  # vkdispatch_native.context_destroy(self._handle)
+        if getattr(self, "_handle", None) is None:
+            return
+
+        # Objects created in the context hold a reference to it, so they are all
+        # gone by now
+        vkdispatch_native.context_destroy(self._handle)
 
 
 def make_context(
     devices: Union[int, List[int]],
     submission_thread_counts: Union[int, List[int]] = None,
     debug_mode: bool = False,
+    stream_depth: int = 2,
+    staging_size: int = 64 * 1024 * 1024,
+    staging_slices: int = 2,
 ) -> Context:
+    """Create a context on the given devices and make it the global context that
+    buffers, command lists and plans are created in. Must be called before
+    anything that uses the context, since get_context otherwise creates one with
+    the default settings on every device.
+
+    Parameters:
+    devices (Union[int, List[int]]): The index or indices of the devices to use.
+    submission_thread_counts (Union[int, List[int]]): The number of streams on
+        each device, spread over the compute queues of the device. Default is 1.
+    debug_mode (bool): Enable the validation layers. Default is False.
+    stream_depth (int): The number of recorded command buffers each stream can
+        keep in flight before recording waits for the oldest one. Default is 2.
+    staging_size (int): The size in bytes of the host-visible staging ring that
+        all buffer transfers on a device go through. Larger transfers are split
+        into chunks. Default is 64 MiB.
+    staging_slices (int): The number of slices the staging ring is split into.
+        Each chunk of a transfer uses one slice, so the host can copy one chunk
+        while the transfers of the others run. Default is 2.
+
+    Returns:
+    (Context): The created context.
+    """
+    global __context
+
+    if __context is not None:
+        raise RuntimeError("A context has already been created!")
+
     if isinstance(devices, int):
         devices = [devices]
 
@@ -50,19 +104,33 @@ def make_context(
     assert all(
         [dev >= 0 and dev < total_devices for dev in devices]
     ), f"All device indicies must between 0 and {total_devices}"
+    assert (
+        type(stream_depth) == int and stream_depth >= 1
+    ), "Stream depth must be a positive integer!"
+    assert (
+        type(staging_size) == int and staging_size >= 4096
+    ), "Staging size must be at least 4096 bytes!"
+    assert (
+        type(staging_slices) == int and staging_slices >= 1
+    ), "Staging slice count must be a positive integer!"
+    assert (
+        staging_size // staging_slices >= 4096
+    ), "Staging slices must be at least 4096 bytes!"
+
+    __context = Context(
+        devices, submission_thread_counts, stream_depth, staging_size, staging_slices
+    )
 
-    return Context(devices, submission_thread_counts)
+    return __context
 
 
 __context: Context = None
 
 
 def get_context() -> Context:
-    global __context
-
     if __context is None:
         device_count = len(vkdispatch.get_devices())
-        __context = make_context([i for i in range(device_count)])
+        make_context([i for i in range(device_count)])
 
     return __context
 
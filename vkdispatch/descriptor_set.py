@@ -6,11 +6,42 @@ class DescriptorSet:
     """TODO: Docstring"""
 
     _handle: int
+    _context: "vd.Context"
+    _buffers: dict
 
     def __init__(self, compute_plan_handle: int) -> None:
+        self._context = vd.get_context()
+        self._buffers = {}
         self._handle = vkdispatch_native.descriptor_set_create(compute_plan_handle)
 
+    def __del__(self) -> None:
+        if getattr(self, "_handle", None) is None:
+            return
+
+        # The native side frees the set once the submitted work that may bind it
+        # has finished
+        vkdispatch_native.descriptor_set_destroy(self._handle)
+
+    def _check_offset_alignment(self, offset: int) -> None:
+        devices = vd.get_devices()
+
+        for device_index in self._context.devices:
+            alignment = devices[device_index].min_storage_buffer_offset_alignment
+
+            if offset % alignment != 0:
+                raise ValueError(
+                    f"Buffer offset {offset} is not a multiple of the storage buffer "
+                    f"offset alignment {alignment} of device {device_index}!"
+                )
+
     def bind_buffer(self, buffer: vd.Buffer, binding: int) -> None:
+        # Views are bound at their offset, which every device must accept
+        if buffer._byte_offset != 0:
+            self._check_offset_alignment(buffer._byte_offset)
+
+        # Bound buffers stay alive as long as the set can be used
+        self._buffers[binding] = buffer
+
         vkdispatch_native.descriptor_set_write_buffer(
-            self._handle, binding, buffer._handle
+            self._handle, binding, buffer._handle, buffer._byte_offset, buffer.mem_size
         )
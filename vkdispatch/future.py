@@ -0,0 +1,134 @@
+import asyncio
+from typing import Any
+from typing import Callable
+from typing import Generator
+
+import vkdispatch_native
+
+
+class Future:
+    """A handle to work that was submitted to the GPU without waiting for it to
+    finish. Completion is tracked with the timeline semaphores of the streams that
+    the work was submitted to. Futures can be awaited from asyncio code.
+    """
+
+    _handle: int
+    _result_func: Callable[[], Any]
+    _result: Any
+    _finished: bool
+
+    def __init__(self, handle: int, result_func: Callable[[], Any] = None) -> None:
+        """Wrap a native future handle.
+
+        Parameters:
+        handle (int): The native future handle.
+        result_func (Callable[[], Any]): Called once the work has finished to
+            produce the result of the future. Default is None, which makes the
+            result None.
+        """
+        self._handle = handle
+        self._result_func = result_func
+        self._result = None
+        self._finished = False
+
+    def __del__(self) -> None:
+        if getattr(self, "_handle", None) is not None:
+            vkdispatch_native.future_destroy(self._handle)
+            self._handle = None
+
+    def done(self) -> bool:
+        """Check if the submitted work has finished without blocking."""
+        if self._finished:
+            return True
+
+        return vkdispatch_native.future_done(self._handle)
+
+    def wait(self, timeout: float = None) -> bool:
+        """Block until the submitted work has finished.
+
+        Parameters:
+        timeout (float): The maximum number of seconds to wait. Default is None,
+            which waits forever.
+
+        Returns:
+        (bool): True if the work finished, False if the timeout expired first.
+        """
+        if self._finished:
+            return True
+
+        timeout_ns = 2**64 - 1 if timeout is None else max(int(timeout * 1e9), 0)
+
+        return vkdispatch_native.future_wait(self._handle, timeout_ns)
+
+    def result(self, timeout: float = None) -> Any:
+        """Wait for the submitted work and return its result.
+
+        Parameters:
+        timeout (float): The maximum number of seconds to wait. Default is None,
+            which waits forever.
+
+        Returns:
+        (Any): The result of the future, for example the array of a buffer read.
+        """
+        if self._finished:
+            return self._result
+
+        if not self.wait(timeout):
+            raise TimeoutError("Timed out waiting for the submitted work!")
+
+        if self._result_func is not None:
+            self._result = self._result_func()
+            self._result_func = None
+
+        self._finished = True
+
+        return self._result
+
+    def add_done_callback(self, callback: Callable[[], None]) -> None:
+        """Call a function once the submitted work has finished. The context's
+        watcher thread calls it as soon as the GPU signals completion, so it must
+        be thread-safe. If the context is destroyed before the work finishes, the
+        function is never called.
+
+        Parameters:
+        callback (Callable[[], None]): The function to call.
+        """
+        if self._finished:
+            callback()
+            return
+
+        def notify(done: bool) -> None:
+            if done:
+                callback()
+
+        vkdispatch_native.future_notify(self._handle, notify)
+
+    def __await__(self) -> Generator[Any, None, Any]:
+        """Wait for the submitted work without blocking the event loop and return
+        the result of the future. Raises a RuntimeError if the context is destroyed
+        before the work finishes.
+        """
+        if not self._finished:
+            loop = asyncio.get_running_loop()
+            waiter = loop.create_future()
+
+            def set_done(done: bool) -> None:
+                if waiter.done():
+                    return
+
+                if done:
+                    waiter.set_result(None)
+                else:
+                    waiter.set_exception(
+                        RuntimeError(
+                            "The context was destroyed before the work finished!"
+                        )
+                    )
+
+            vkdispatch_native.future_notify(
+                self._handle, lambda done: loop.call_soon_threadsafe(set_done, done)
+            )
+
+            yield from waiter.__await__()
+
+        return self.result()
@@ -41,6 +41,7 @@ class DeviceInfo:
         supported_operations: int,
         quad_operations_in_all_stages: int,
         max_compute_shared_memory_size: int,
+        min_storage_buffer_offset_alignment: int,
     ):
         self.dev_index = dev_index
 
@@ -77,6 +78,8 @@ class DeviceInfo:
 
         self.max_compute_shared_memory_size = max_compute_shared_memory_size
 
+        self.min_storage_buffer_offset_alignment = min_storage_buffer_offset_alignment
+
     def __repr__(self) -> str:
         result = f"Device {self.dev_index}: {self.device_name}\n"
 
@@ -111,6 +114,10 @@ class DeviceInfo:
         result += (
             f"\tMax Compute Shared Memory Size: {self.max_compute_shared_memory_size}\n"
         )
+        result += (
+            "\tMin Storage Buffer Offset Alignment: "
+            f"{self.min_storage_buffer_offset_alignment}\n"
+        )
 
         return result
 
@@ -0,0 +1,79 @@
+from typing import Dict
+from typing import List
+from typing import Tuple
+
+import numpy as np
+
+import vkdispatch as vd
+
+
+class PinnedArrayPool:
+    """A pool of numpy arrays that live in mapped memory of the GPU. Reading a
+    buffer into one of these arrays with Buffer.read(out=...) copies the data on
+    the GPU straight into the array, without the staging ring or a host side copy.
+    Released arrays are kept for the next request of the same size class, so
+    repeated readbacks do not allocate.
+    """
+
+    _free: Dict[int, List["vd.Buffer"]]
+
+    def __init__(self) -> None:
+        self._free = {}
+
+    @staticmethod
+    def _get_size_class(size: int) -> int:
+        # Four size classes per power of two, starting at 256 bytes
+        size = max(size, 256)
+        step = 1 << max((size - 1).bit_length() - 3, 0)
+        return (size + step - 1) // step * step
+
+    def empty(self, shape: Tuple[int], dtype: np.dtype) -> np.ndarray:
+        """Get an uninitialized array from the pool.
+
+        Parameters:
+        shape (Tuple[int]): The shape of the array.
+        dtype (np.dtype): The numpy data type of the array.
+
+        Returns:
+        (np.ndarray): The array. It keeps its memory alive and can be given back
+            with release() once it is no longer used.
+        """
+        shape = tuple(shape)
+        size = int(np.prod(shape)) * np.dtype(dtype).itemsize
+        size_class = self._get_size_class(size)
+
+        free_buffers = self._free.get(size_class)
+
+        if free_buffers:
+            buffer = free_buffers.pop()
+        else:
+            buffer = vd.Buffer((size_class // 4,), vd.uint32, host_visible=True)
+
+        # Waits until the GPU is done with the memory, in case a read into it is
+        # still running
+        array = buffer.numpy().view(np.uint8)
+
+        return array[:size].view(dtype).reshape(shape)
+
+    def release(self, array: np.ndarray) -> None:
+        """Give an array back to the pool. Neither the array nor any view of it may
+        be used afterwards.
+
+        Parameters:
+        array (np.ndarray): An array returned by empty().
+        """
+        buffer = array.base
+
+        while isinstance(buffer, np.ndarray):
+            buffer = buffer.base
+
+        if not isinstance(buffer, vd.Buffer) or not buffer.host_visible:
+            raise ValueError("The array was not allocated by a PinnedArrayPool!")
+
+        self._free.setdefault(buffer.mem_size, []).append(buffer)
+
+    def clear(self) -> None:
+        """Drop every released array, which frees their memory once nothing else
+        references it.
+        """
+        self._free.clear()
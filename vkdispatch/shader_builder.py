@@ -70,6 +70,59 @@ class PushConstantBuffer:
     def get_bytes(self):
         return b"".join([elem.tobytes() for elem in self.pc_list])
 
+    def get_batch_bytes(
+        self, instance_count: int, values: Dict[str, np.ndarray]
+    ) -> np.ndarray:
+        """Pack the push constants of many instances at once. Fields found in
+        values take one entry per instance along their leading axis, all other
+        fields repeat their current value.
+
+        Parameters:
+        instance_count (int): The number of instances to pack.
+        values (Dict[str, np.ndarray]): Per-instance values keyed by field name.
+            Fields of this buffer that are missing are left at their current value.
+
+        Returns:
+        (np.ndarray): A (instance_count, bytes per instance) uint8 array whose rows
+            match get_bytes for each instance.
+        """
+        field_sizes = [elem.nbytes for elem in self.pc_list]
+        result = np.empty((instance_count, sum(field_sizes)), dtype=np.uint8)
+
+        for key, ii in self.ref_dict.items():
+            offset = sum(field_sizes[:ii])
+
+            if key not in values:
+                result[:, offset : offset + field_sizes[ii]] = np.frombuffer(
+                    self.pc_list[ii].tobytes(), dtype=np.uint8
+                )
+                continue
+
+            arr = np.asarray(values[key])
+
+            # Complex values packed into float fields take two floats each
+            if np.iscomplexobj(arr) and not np.issubdtype(
+                self.numpy_dtypes[ii], np.complexfloating
+            ):
+                arr = np.stack((arr.real, arr.imag), axis=-1)
+
+            arr = arr.astype(self.numpy_dtypes[ii], copy=False)
+
+            if arr.size != instance_count * self.pc_list[ii].size:
+                raise ValueError(
+                    f"Expected {instance_count} values of shape "
+                    f"{self.var_types[ii].numpy_shape} for {key} but got an array "
+                    f"of shape {arr.shape}!"
+                )
+
+            result[:, offset : offset + field_sizes[ii]] = (
+                np.ascontiguousarray(arr)
+                .view(np.uint8)
+                .reshape(instance_count, field_sizes[ii])
+            )
+
+        return result
+
 
 class ShaderBuilder:
     """TODO: Docstring"""
@@ -283,7 +336,7 @@ class ShaderBuilder:
     def append_contents(self, contents: str) -> None:
         self.contents += ("\t" * self.scope_num) + contents
 
-    def build(self, x: int, y: int, z: int) -> str:
+    def build(self, x: int, y: int, z: int, params_buffer: bool = False) -> str:
         self.pc_list.sort(key=lambda x: x[1].item_size, reverse=True)
         self.pc_dict = {elem[0]: (ii, elem[1]) for ii, elem in enumerate(self.pc_list)}
 
@@ -300,7 +353,12 @@ class ShaderBuilder:
                 [f"\t{elem[2]}" for elem in self.pc_list]
             )
 
-            header += f"\nlayout(push_constant) uniform PushConstant {{\n { push_constant_contents } \n}} PC;\n"
+            if params_buffer:
+                # Parameters are read from the command list's parameters buffer,
+                # bound with a dynamic offset right after the shader's own buffers
+                header += f"\nlayout(std430, set = 0, binding = {len(self.binding_list)}) readonly buffer PushConstant {{\n { push_constant_contents } \n}} PC;\n"
+            else:
+                header += f"\nlayout(push_constant) uniform PushConstant {{\n { push_constant_contents } \n}} PC;\n"
 
         layout_str = (
             f"layout(local_size_x = {x}, local_size_y = {y}, local_size_z = {z}) in;"
@@ -13,7 +13,9 @@ class ShaderDispatcher:
     """TODO: Docstring"""
 
     plan: vd.ComputePlan
+    params_plan: vd.ComputePlan
     source: str
+    params_source: str
     pc_buff_dict: Dict[str, vd.PushConstantBuffer]
     my_local_size: Tuple[int, int, int]
     func_args: List[vd.ShaderVariable]
@@ -25,26 +27,59 @@ class ShaderDispatcher:
         pc_buff_dict: dict,
         my_local_size: Tuple[int, int, int],
         func_args: List[vd.ShaderVariable],
+        params_source: str = None,
     ):
         self.plan = plan
+        self.params_plan = None
         self.pc_buff_dict = copy.deepcopy(pc_buff_dict)
         self.my_local_size = my_local_size
         self.func_args = func_args
         self.source = source
+        self.params_source = params_source
+
+    def get_plan(self, cmd_list: vd.CommandList = None) -> vd.ComputePlan:
+        """Get the plan to record into the given command list. Command lists that
+        keep their parameters in a device buffer need the variant of the shader
+        that reads them from there, which is only compiled on first use.
+        """
+        if cmd_list is None or not cmd_list.params_buffer:
+            return self.plan
+
+        if self.params_plan is None:
+            self.params_plan = vd.ComputePlan(
+                self.params_source,
+                self.plan.binding_count,
+                self.plan.pc_size,
+                params_buffer=True,
+                name=self.plan.name,
+            )
+
+        return self.params_plan
 
     def __repr__(self) -> str:
         return self.source
 
-    def __getitem__(self, exec_dims: Union[tuple, int]):
+    def __getitem__(self, exec_dims: Union[tuple, int, vd.Buffer]):
         my_blocks = [exec_dims, 1, 1]
         my_cmd_list: List[vd.CommandList] = [None]
+        my_indirect_buffer: vd.Buffer = None
 
-        if isinstance(exec_dims, tuple):
+        if isinstance(exec_dims, vd.Buffer):
+            my_indirect_buffer = exec_dims
+            my_blocks = [1, 1, 1]
+        elif isinstance(exec_dims, tuple):
             my_blocks = [1, 1, 1]
 
             for i, val in enumerate(exec_dims):
                 if isinstance(val, int) or np.issubdtype(type(val), np.integer):
                     my_blocks[i] = val
+                elif isinstance(val, vd.Buffer):
+                    if not i == 0:
+                        raise ValueError(
+                            "Only the first dimension can be an indirect buffer!"
+                        )
+
+                    my_indirect_buffer = val
                 else:
                     if not isinstance(val, vd.CommandList):
                         raise ValueError(f"Invalid dimension '{val}'!")
@@ -58,17 +93,34 @@ class ShaderDispatcher:
         my_limits_y = my_blocks[1]
         my_limits_z = my_blocks[2]
 
+        # The workgroup counts of an indirect dispatch are only known on the GPU, so
+        # the bounds check is disabled and left to the shader
+        if my_indirect_buffer is not None:
+            my_limits_x = my_limits_y = my_limits_z = 0xFFFFFFFF
+
         my_blocks[0] = (my_blocks[0] + self.my_local_size[0] - 1) // self.my_local_size[0]
         my_blocks[1] = (my_blocks[1] + self.my_local_size[1] - 1) // self.my_local_size[1]
         my_blocks[2] = (my_blocks[2] + self.my_local_size[2] - 1) // self.my_local_size[2]
 
+        def record(
+            plan: vd.ComputePlan,
+            cmd_list: vd.CommandList,
+            descriptor_set: vd.DescriptorSet,
+        ):
+            if my_indirect_buffer is not None:
+                plan.record_indirect(cmd_list, descriptor_set, my_indirect_buffer)
+            else:
+                plan.record(cmd_list, descriptor_set, my_blocks)
+
         def wrapper_func(*args, **kwargs):
             if len(args) != len(self.func_args):
                 raise ValueError(
                     f"Expected {len(self.func_args)} arguments, got {len(args)}!"
                 )
 
-            descriptor_set = vd.DescriptorSet(self.plan._handle)
+            plan = self.get_plan(my_cmd_list[0])
+
+            descriptor_set = vd.DescriptorSet(plan._handle)
             pc_buff = vd.PushConstantBuffer(self.pc_buff_dict)
 
             pc_buff["exec_count"] = [my_limits_x, my_limits_y, my_limits_z, 0]
@@ -83,7 +135,7 @@ class ShaderDispatcher:
                 cmd_list = vd.get_command_list()
                 cmd_list.add_pc_buffer(pc_buff)
                 cmd_list.add_desctiptor_set(descriptor_set)
-                self.plan.record(cmd_list, descriptor_set, my_blocks)
+                record(plan, cmd_list, descriptor_set)
                 cmd_list.submit()
                 return
 
@@ -94,7 +146,7 @@ class ShaderDispatcher:
 
             my_cmd_list[0].add_pc_buffer(pc_buff)
             my_cmd_list[0].add_desctiptor_set(descriptor_set)
-            self.plan.record(my_cmd_list[0], descriptor_set, my_blocks)
+            record(plan, my_cmd_list[0], descriptor_set)
 
             return pc_buff
 
@@ -137,9 +189,25 @@ def compute_shader(*args, local_size: Tuple[int, int, int] = None):
             my_local_size[0], my_local_size[1], my_local_size[2]
         )
 
-        plan = vd.ComputePlan(shader_source, builder.binding_count, builder.pc_size)
+        params_source = builder.build(
+            my_local_size[0], my_local_size[1], my_local_size[2], params_buffer=True
+        )
 
-        wrapper = ShaderDispatcher(plan, shader_source, builder.pc_dict, my_local_size, func_args)
+        plan = vd.ComputePlan(
+            shader_source,
+            builder.binding_count,
+            builder.pc_size,
+            name=build_func.__name__,
+        )
+
+        wrapper = ShaderDispatcher(
+            plan,
+            shader_source,
+            builder.pc_dict,
+            my_local_size,
+            func_args,
+            params_source,
+        )
 
         builder.reset()
 
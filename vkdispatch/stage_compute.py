@@ -7,17 +7,30 @@ from .descriptor_set import DescriptorSet
 
 
 class ComputePlan:
-    def __init__(self, shader_source: str, binding_count: int, pc_size: int) -> None:
+    def __init__(
+        self,
+        shader_source: str,
+        binding_count: int,
+        pc_size: int,
+        params_buffer: bool = False,
+        name: str = None,
+    ) -> None:
 
+        self.name = "compute" if name is None else name
         self.binding_count = binding_count
         self.pc_size = pc_size
         self.shader_source = shader_source
+        self.params_buffer = params_buffer
 
         # for ii, line in enumerate(shader_source.split("\n")):
         #    print(f"{ii + 1:03d} | {line}")
 
         self._handle = vkdispatch_native.stage_compute_plan_create(
-            vd.get_context_handle(), shader_source.encode(), binding_count, pc_size
+            vd.get_context_handle(),
+            shader_source.encode(),
+            binding_count,
+            pc_size,
+            params_buffer,
         )
 
     def record(
@@ -34,3 +47,37 @@ class ComputePlan:
             blocks[1],
             blocks[2],
         )
+        command_list.add_stage_name(f"{self.name}{tuple(blocks)}")
+
+    def record_indirect(
+        self,
+        command_list: CommandList,
+        descriptor_set: DescriptorSet,
+        buffer: "vd.Buffer",
+        offset: int = 0,
+    ) -> None:
+        """Record a dispatch whose workgroup counts are read from a buffer on the
+        GPU when the command list executes, so they can be written by an earlier
+        stage without a round trip through the host.
+
+        Parameters:
+        command_list (CommandList): The command list to record into.
+        descriptor_set (DescriptorSet): The descriptor set to bind.
+        buffer (vd.Buffer): The buffer holding the three uint32 workgroup counts.
+        offset (int): The byte offset of the counts in the buffer. Default is 0.
+        """
+        if offset % 4 != 0:
+            raise ValueError("Indirect dispatch offset must be a multiple of 4!")
+
+        if offset + 12 > buffer.mem_size:
+            raise ValueError("Indirect dispatch counts must lie inside the buffer!")
+
+        vkdispatch_native.stage_compute_record_indirect(
+            command_list._handle,
+            self._handle,
+            descriptor_set._handle,
+            buffer._handle,
+            buffer._byte_offset + offset,
+        )
+        command_list.add_resource(buffer)
+        command_list.add_stage_name(f"{self.name}(indirect)")
@@ -19,12 +19,22 @@ class FFTPlan:
             vd.get_context_handle(), list(self.shape), self.mem_size
         )
 
-    def record(self, command_list: vd.CommandList, buffer: vd.Buffer, inverse: bool = False):
+    def record(
+        self, command_list: vd.CommandList, buffer: vd.Buffer, inverse: bool = False
+    ):
         assert buffer.var_type == vd.complex64, "buffer must be of dtype complex64"
         assert buffer.mem_size == self.mem_size, "buffer size must match plan size"
 
         vkdispatch_native.stage_fft_record(
-            command_list._handle, self._handle, buffer._handle, 1 if inverse else -1
+            command_list._handle,
+            self._handle,
+            buffer._handle,
+            1 if inverse else -1,
+            buffer._byte_offset,
+        )
+        command_list.add_resource(buffer)
+        command_list.add_stage_name(
+            f"{'ifft' if inverse else 'fft'}{tuple(self.shape)}"
         )
 
     def record_forward(self, command_list: vd.CommandList, buffer: vd.Buffer):
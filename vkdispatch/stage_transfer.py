@@ -27,8 +27,16 @@ def stage_transfer_copy_buffers(
     assert size + dst_offset <= dst.mem_size, "Dst offset + size > dst buffer size!"
 
     vkdispatch_native.stage_transfer_record_copy_buffer(
-        command_list._handle, src._handle, dst._handle, src_offset, dst_offset, size
+        command_list._handle,
+        src._handle,
+        dst._handle,
+        src._byte_offset + src_offset,
+        dst._byte_offset + dst_offset,
+        size,
     )
+    command_list.add_resource(src)
+    command_list.add_resource(dst)
+    command_list.add_stage_name(f"copy_buffers({size})")
 
 
 def stage_transfer_copy_image(
@@ -162,13 +170,14 @@ def stage_transfer_copy_buffer_to_image(
         image._handle,
         buffer._handle,
         image_offset,
-        buffer_offset,
+        buffer._byte_offset + buffer_offset,
         buffer_row_length,
         buffer_image_height,
         extent,
         image_baseLayer,
         image_layerCount,
     )
+    command_list.add_resource(buffer)
 
 
 def stage_transfer_copy_image_to_buffer(
@@ -229,10 +238,11 @@ def stage_transfer_copy_image_to_buffer(
         image._handle,
         buffer._handle,
         image_offset,
-        buffer_offset,
+        buffer._byte_offset + buffer_offset,
         buffer_row_length,
         buffer_image_height,
         extent,
         image_baseLayer,
         image_layerCount,
     )
+    command_list.add_resource(buffer)
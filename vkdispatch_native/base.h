@@ -5,11 +5,13 @@
 
 struct Context;
 struct Buffer;
+struct BufferPool;
 struct Image;
 struct Stage;
 struct CommandList;
 struct FFTPlan;
 struct ComputePlan;
 struct DescriptorSet;
+struct Future;
 
  #endif // BASE_H
\ No newline at end of file
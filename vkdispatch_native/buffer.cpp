@@ -1,17 +1,47 @@
 #include "internal.h"
 
 #include <iostream>
+#include <algorithm>
 
-struct Buffer* buffer_create_extern(struct Context* context, unsigned long long size) {
+void buffer_get_create_info(struct Context* ctx, int device, unsigned long long size, VkBufferCreateInfo* create_info, uint32_t* queue_families) {
+    vk::BufferCreateInfo bufferCreateInfo = vk::BufferCreateInfo()
+        .setSize(size)
+        .setUsage(vk::BufferUsageFlagBits::eTransferSrc | vk::BufferUsageFlagBits::eTransferDst | vk::BufferUsageFlagBits::eStorageBuffer | vk::BufferUsageFlagBits::eIndirectBuffer);        
+
+    // Transfers run on their own queue family when the device has one, so the buffer is shared between both
+    queue_families[0] = ctx->streams[device][0]->queueFamilyIndex;
+    queue_families[1] = ctx->transferStreams[device]->queueFamilyIndex;
+
+    if(queue_families[0] != queue_families[1]) {
+        bufferCreateInfo
+            .setSharingMode(vk::SharingMode::eConcurrent)
+            .setQueueFamilyIndexCount(2)
+            .setPQueueFamilyIndices(queue_families);
+    }
+
+    *create_info = static_cast<VkBufferCreateInfo>(bufferCreateInfo);
+}
+
+struct Buffer* buffer_create_extern(struct Context* context, unsigned long long size, int host_visible) {
+    return buffer_allocate(context, size, NULL, host_visible != 0);
+}
+
+struct Buffer* buffer_allocate(struct Context* context, unsigned long long size, struct BufferPool* pool, bool host_visible) {
     struct Context* ctx = (struct Context*)context;
 
+    // Buffers freed earlier are released once their work is done, before new memory is taken
+    context_collect_deferred(ctx);
+
     struct Buffer* buffer = new struct Buffer();
     buffer->ctx = context;
+    buffer->size = size;
+    buffer->pool = pool;
+    buffer->host_visible = host_visible;
 
     for (int i = 0; i < context->deviceCount; i++) {
-        vk::BufferCreateInfo bufferCreateInfo = vk::BufferCreateInfo()
-            .setSize(size)
-            .setUsage(vk::BufferUsageFlagBits::eTransferSrc | vk::BufferUsageFlagBits::eTransferDst | vk::BufferUsageFlagBits::eStorageBuffer);        
+        VkBufferCreateInfo bufferCreateInfoStruct;
+        uint32_t queueFamilies[2];
+        buffer_get_create_info(ctx, i, size, &bufferCreateInfoStruct, queueFamilies);
         
         VmaAllocation vmaAllocation;
 
@@ -20,131 +50,312 @@ struct Buffer* buffer_create_extern(struct Context* context, unsigned long long
 		vmaAllocationCreateInfo.usage = VMA_MEMORY_USAGE_AUTO_PREFER_DEVICE;
 		vmaAllocationCreateInfo.pUserData = &vmaAllocation;
 
-        VkBufferCreateInfo bufferCreateInfoStruct = static_cast<VkBufferCreateInfo>(bufferCreateInfo);
+        // Pooled buffers are sub-allocated from the large blocks of the pool
+        if(pool != NULL)
+            vmaAllocationCreateInfo.pool = pool->pools[i];
+
+        // Host visible buffers stay mapped for their whole lifetime. VMA still prefers device local memory,
+        // which is mappable on integrated GPUs, CPU implementations and cards with resizable BAR.
+        // Coherent memory is required so the host never has to flush or invalidate the mapping.
+        if(host_visible) {
+            vmaAllocationCreateInfo.flags = VMA_ALLOCATION_CREATE_HOST_ACCESS_RANDOM_BIT | VMA_ALLOCATION_CREATE_MAPPED_BIT;
+            vmaAllocationCreateInfo.requiredFlags = VK_MEMORY_PROPERTY_HOST_VISIBLE_BIT | VK_MEMORY_PROPERTY_HOST_COHERENT_BIT;
+        }
+
         VkBuffer temp_buffer;
-		VK_CALL(vmaCreateBuffer(ctx->allocators[i], &bufferCreateInfoStruct, &vmaAllocationCreateInfo, &temp_buffer, &vmaAllocation, NULL));
+        VmaAllocationInfo allocationInfo = {};
+		VK_CALL(vmaCreateBuffer(ctx->allocators[i], &bufferCreateInfoStruct, &vmaAllocationCreateInfo, &temp_buffer, &vmaAllocation, &allocationInfo));
 
         LOG_INFO("Buffer created %p", temp_buffer);
 
         buffer->allocations.push_back(vmaAllocation);
         buffer->buffers.push_back(temp_buffer);
+        buffer->mappings.push_back(host_visible ? allocationInfo.pMappedData : NULL);
+
+        buffer->accesses.push_back({});
+    }
+
+    return buffer;
+}
+
+void buffer_destroy_extern(struct Buffer* buffer) {
+    struct Context* ctx = (struct Context*)buffer->ctx;
+
+    std::vector<struct StreamSubmission> waits;
+
+    for (int i = 0; i < ctx->deviceCount; i++)
+        buffer_get_waits(buffer, i, waits);
 
-        vk::BufferCreateInfo stagingBufferCreateInfo = vk::BufferCreateInfo()
-            .setSize(size)
-            .setUsage(vk::BufferUsageFlagBits::eTransferSrc | vk::BufferUsageFlagBits::eTransferDst);
+    // Submitted work may still use the buffer, its memory is freed once the last of it has finished
+    context_defer_destroy(ctx, waits, [ctx, buffer]() {
+        for (int i = 0; i < ctx->deviceCount; i++) {
+            vmaDestroyBuffer(ctx->allocators[i], buffer->buffers[i], buffer->allocations[i]);
+        }
+
+        delete buffer;
+    });
+}
 
-        VmaAllocation vmaAllocationStaging;
+void* buffer_get_mapping_extern(struct Buffer* buffer, int device_index) {
+    return buffer->mappings[device_index == -1 ? 0 : device_index];
+}
 
-        vmaAllocationCreateInfo = {};
-		vmaAllocationCreateInfo.flags = VMA_ALLOCATION_CREATE_HOST_ACCESS_RANDOM_BIT;
-		vmaAllocationCreateInfo.usage = VMA_MEMORY_USAGE_AUTO_PREFER_HOST;
-		vmaAllocationCreateInfo.pUserData = &vmaAllocationStaging;
+void buffer_wait_device(struct Buffer* buffer, int device) {
+    std::vector<struct StreamSubmission> waits;
+    buffer_get_waits(buffer, device, waits);
 
-        VkBufferCreateInfo stagingBufferCreateInfoStruct = static_cast<VkBufferCreateInfo>(stagingBufferCreateInfo);
-        VkBuffer temp_staging_buffer;
-        VK_CALL(vmaCreateBuffer(ctx->allocators[i], &stagingBufferCreateInfoStruct, &vmaAllocationCreateInfo, &temp_staging_buffer, &vmaAllocationStaging, NULL));
+    for(int i = 0; i < waits.size(); i++)
+        waits[i].stream->wait(waits[i].submission, UINT64_MAX);
+}
 
-        LOG_INFO("Staging buffer created %p", temp_staging_buffer);
+void buffer_wait_extern(struct Buffer* buffer, int device_index) {
+    int enum_count = device_index == -1 ? buffer->ctx->deviceCount : 1;
+    int start_index = device_index == -1 ? 0 : device_index;
 
-        buffer->stagingAllocations.push_back(vmaAllocationStaging);
-        buffer->stagingBuffers.push_back(temp_staging_buffer);
+    for (int i = 0; i < enum_count; i++)
+        buffer_wait_device(buffer, start_index + i);
+}
 
-        buffer->fences.push_back(ctx->devices[i].createFence(
-            vk::FenceCreateInfo()
-            .setFlags(vk::FenceCreateFlagBits::eSignaled)
-        ));
+void buffer_get_waits(struct Buffer* buffer, int device, std::vector<struct StreamSubmission>& waits) {
+    std::unique_lock<std::mutex> lock(buffer->mutex);
+
+    for(int i = 0; i < buffer->accesses[device].size(); i++)
+        stream_add_wait(waits, buffer->accesses[device][i]);
+}
+
+void buffer_set_access(struct Buffer* buffer, int device, Stream* stream, uint64_t submission) {
+    std::unique_lock<std::mutex> lock(buffer->mutex);
+
+    for(int i = 0; i < buffer->accesses[device].size(); i++) {
+        if(buffer->accesses[device][i].stream == stream) {
+            buffer->accesses[device][i].submission = submission;
+            return;
+        }
     }
 
-    return buffer;
+    buffer->accesses[device].push_back({stream, submission});
 }
 
-void buffer_destroy_extern(struct Buffer* buffer) {
-    struct Context* ctx = (struct Context*)buffer->ctx;
-    
-    for (int i = 0; i < buffer->ctx->deviceCount; i++) {
-        vmaDestroyBuffer(ctx->allocators[i], buffer->buffers[i], buffer->allocations[i]);
-        vmaDestroyBuffer(ctx->allocators[i], buffer->stagingBuffers[i], buffer->stagingAllocations[i]);
+static void buffer_transfer_regions(struct Buffer* buffer, char* data, unsigned long long* offsets, unsigned long long* sizes, int region_count, int device, bool write, struct Future* future) {
+    struct Context* ctx = buffer->ctx;
+
+    // Mapped buffers are accessed directly once the device is done with them, without a copy command
+    if(buffer->mappings[device] != NULL) {
+        buffer_wait_device(buffer, device);
+
+        char* mapping = (char*)buffer->mappings[device];
+
+        for(int i = 0; i < region_count; i++) {
+            if(write)
+                memcpy(mapping + offsets[i], data, sizes[i]);
+            else
+                memcpy(data, mapping + offsets[i], sizes[i]);
+
+            data += sizes[i];
+        }
+
+        return;
     }
 
-    delete buffer;
+    struct StagingRing* ring = ctx->stagingRings[device];
+    Stream* stream = ctx->transferStreams[device];
+
+    // Transfers from every thread share the device's staging ring and take turns using it
+    std::unique_lock<std::mutex> lock(ring->mutex);
+
+    // The chunks touch disjoint ranges, so only earlier work on the buffer has to finish before them
+    std::vector<struct StreamSubmission> waits;
+    buffer_get_waits(buffer, device, waits);
+
+    int region = 0;
+    unsigned long long region_position = 0;
+
+    // The regions are packed back to back in the data and in the ring. Every slice holds as many of
+    // them as fit and is copied with one command, so a strided region of a few rows is a single submit.
+    // Regions larger than a slice are split over several of them, and while one slice's copy runs on
+    // the transfer queue the host already fills or drains the next one.
+    while(region < region_count) {
+        struct StagingSlice* slice = staging_ring_acquire(ring);
+
+        std::vector<vk::BufferCopy> regions;
+        char* slice_data = data;
+        unsigned long long slice_used = 0;
+
+        while(region < region_count && slice_used < slice->size) {
+            unsigned long long chunk_size = std::min(sizes[region] - region_position, slice->size - slice_used);
+
+            if(chunk_size > 0) {
+                if(write)
+                    memcpy(ring->mapped + slice->offset + slice_used, data, chunk_size);
+
+                unsigned long long staging_offset = slice->offset + slice_used;
+                unsigned long long buffer_offset = offsets[region] + region_position;
+
+                regions.push_back(
+                    vk::BufferCopy()
+                    .setSrcOffset(write ? staging_offset : buffer_offset)
+                    .setDstOffset(write ? buffer_offset : staging_offset)
+                    .setSize(chunk_size)
+                );
+            }
+
+            data += chunk_size;
+            slice_used += chunk_size;
+            region_position += chunk_size;
+
+            if(region_position == sizes[region]) {
+                region++;
+                region_position = 0;
+            }
+        }
+
+        if(regions.empty())
+            continue;
+
+        vk::Buffer src = write ? ring->buffer : buffer->buffers[device];
+        vk::Buffer dst = write ? buffer->buffers[device] : ring->buffer;
+
+        slice->stream = stream;
+        slice->submission = stream->record([src, dst, regions](vk::CommandBuffer& cmd_buffer) {
+            cmd_buffer.copyBuffer(src, dst, regions);
+        }, waits);
+
+        // A read is copied out of the ring by buffer_read_finish, or by the next transfer that needs the slice
+        if(!write) {
+            slice->readback_dst = slice_data;
+            slice->readback_size = slice_used;
+        }
+
+        buffer_set_access(buffer, device, stream, slice->submission);
+        future_add_submission(future, stream, slice->submission);
+    }
 }
 
-void buffer_write_extern(struct Buffer* buffer, void* data, unsigned long long offset, unsigned long long size, int device_index) {
-    struct Context* ctx = (struct Context*)buffer->ctx;
+struct Future* buffer_write_regions_async_extern(struct Buffer* buffer, void* data, unsigned long long* offsets, unsigned long long* sizes, int region_count, int device_index) {
+    struct Future* future = future_create_extern(buffer->ctx);
 
     int enum_count = device_index == -1 ? buffer->ctx->deviceCount : 1;
     int start_index = device_index == -1 ? 0 : device_index;
 
     for (int i = 0; i < enum_count; i++) {
-        int dev_index = start_index + i;
-        
-        LOG_INFO("Writing buffer data to device %d", dev_index);
+        LOG_INFO("Writing buffer data to device %d", start_index + i);
 
-        ctx->streams[dev_index]->queue.waitIdle();
+        buffer_transfer_regions(buffer, (char*)data, offsets, sizes, region_count, start_index + i, true, future);
+    }
 
-        void* mapped;
-        VK_CALL(vmaMapMemory(ctx->allocators[dev_index], buffer->stagingAllocations[dev_index], &mapped));
-        memcpy(mapped, data, size);
-        vmaUnmapMemory(ctx->allocators[dev_index], buffer->stagingAllocations[dev_index]);  
+    return future;
+}
 
-        vk::CommandBuffer cmd_buffer = ctx->streams[dev_index]->begin();
+struct Future* buffer_write_async_extern(struct Buffer* buffer, void* data, unsigned long long offset, unsigned long long size, int device_index) {
+    return buffer_write_regions_async_extern(buffer, data, &offset, &size, 1, device_index);
+}
 
-        cmd_buffer.copyBuffer(buffer->stagingBuffers[dev_index], buffer->buffers[dev_index], 
-            vk::BufferCopy()
-            .setSrcOffset(0)
-            .setDstOffset(offset)
-            .setSize(size)
-        );
+void buffer_write_regions_extern(struct Buffer* buffer, void* data, unsigned long long* offsets, unsigned long long* sizes, int region_count, int device_index) {
+    struct Future* future = buffer_write_regions_async_extern(buffer, data, offsets, sizes, region_count, device_index);
+    future_wait_extern(future, UINT64_MAX);
+    future_destroy_extern(future);
+}
 
-        vk::Fence& fence = ctx->streams[dev_index]->submit();
-        ctx->devices[dev_index].waitForFences(fence, VK_TRUE, UINT64_MAX);
-    }
+void buffer_write_extern(struct Buffer* buffer, void* data, unsigned long long offset, unsigned long long size, int device_index) {
+    buffer_write_regions_extern(buffer, data, &offset, &size, 1, device_index);
 }
 
-void buffer_read_extern(struct Buffer* buffer, void* data, unsigned long long offset, unsigned long long size, int device_index) {
-    struct Context* ctx = (struct Context*)buffer->ctx;
+struct Future* buffer_read_regions_async_extern(struct Buffer* buffer, void* data, unsigned long long* offsets, unsigned long long* sizes, int region_count, int device_index) {
+    struct Future* future = future_create_extern(buffer->ctx);
 
     LOG_INFO("Reading buffer data");
 
-    int dev_index = device_index == -1 ? 0 : device_index;
+    buffer_transfer_regions(buffer, (char*)data, offsets, sizes, region_count, device_index == -1 ? 0 : device_index, false, future);
 
-    vk::CommandBuffer cmd_buffer = ctx->streams[dev_index]->begin();
+    return future;
+}
 
-    cmd_buffer.copyBuffer(buffer->buffers[dev_index], buffer->stagingBuffers[dev_index],
-        vk::BufferCopy()
-        .setSrcOffset(offset)
-        .setDstOffset(0)
-        .setSize(size)
-    );
+struct Future* buffer_read_async_extern(struct Buffer* buffer, void* data, unsigned long long offset, unsigned long long size, int device_index) {
+    return buffer_read_regions_async_extern(buffer, data, &offset, &size, 1, device_index);
+}
+
+void buffer_read_finish_extern(struct Buffer* buffer, void* data, unsigned long long size, int device_index) {
+    struct Context* ctx = (struct Context*)buffer->ctx;
+
+    int dev_index = device_index == -1 ? 0 : device_index;
 
-    vk::Fence& fence = ctx->streams[dev_index]->submit();
-    ctx->devices[dev_index].waitForFences(fence, VK_TRUE, UINT64_MAX);
+    struct StagingRing* ring = ctx->stagingRings[dev_index];
 
-    void* mapped;
-    VK_CALL(vmaMapMemory(ctx->allocators[dev_index], buffer->stagingAllocations[dev_index], &mapped));
-    memcpy(data, mapped, size);
-    vmaUnmapMemory(ctx->allocators[dev_index], buffer->stagingAllocations[dev_index]);
+    std::unique_lock<std::mutex> lock(ring->mutex);
+    staging_ring_flush(ring, data, size);
 
     LOG_INFO("Buffer data read");
 }
 
-void buffer_copy_extern(struct Buffer* src, struct Buffer* dst, unsigned long long src_offset, unsigned long long dst_offset, unsigned long long size, int device_index) {
-    /*
-    assert(src->ctx == dst->ctx);
+void buffer_read_regions_extern(struct Buffer* buffer, void* data, unsigned long long* offsets, unsigned long long* sizes, int region_count, int device_index) {
+    struct Future* future = buffer_read_regions_async_extern(buffer, data, offsets, sizes, region_count, device_index);
+    future_destroy_extern(future);
+
+    unsigned long long size = 0;
+
+    for(int i = 0; i < region_count; i++)
+        size += sizes[i];
+
+    buffer_read_finish_extern(buffer, data, size, device_index);
+}
 
-    int enum_count = device_index == -1 ? src->ctx->deviceCount : 1;
+void buffer_read_extern(struct Buffer* buffer, void* data, unsigned long long offset, unsigned long long size, int device_index) {
+    buffer_read_regions_extern(buffer, data, &offset, &size, 1, device_index);
+}
+
+struct Future* buffer_copy_async_extern(struct Buffer* src, struct Buffer* dst, unsigned long long src_offset, unsigned long long dst_offset, unsigned long long size, int device_index) {
+    struct Context* ctx = src->ctx;
+    struct Future* future = future_create_extern(ctx);
+
+    int enum_count = device_index == -1 ? ctx->deviceCount : 1;
     int start_index = device_index == -1 ? 0 : device_index;
 
     for (int i = 0; i < enum_count; i++) {
         int dev_index = start_index + i;
+        Stream* stream = ctx->transferStreams[dev_index];
+
+        std::vector<struct StreamSubmission> waits;
+        buffer_get_waits(src, dev_index, waits);
+        buffer_get_waits(dst, dev_index, waits);
+
+        vk::Buffer src_buffer = src->buffers[dev_index];
+        vk::Buffer dst_buffer = dst->buffers[dev_index];
+        bool host_visible = dst->host_visible;
+
+        vk::BufferCopy region = vk::BufferCopy()
+            .setSrcOffset(src_offset)
+            .setDstOffset(dst_offset)
+            .setSize(size);
+
+        uint64_t submission = stream->record([src_buffer, dst_buffer, region, host_visible](vk::CommandBuffer& cmd_buffer) {
+            cmd_buffer.copyBuffer(src_buffer, dst_buffer, region);
+
+            // A copy into a mapped buffer is read by the host directly
+            if(host_visible) {
+                vk::MemoryBarrier host_barrier = vk::MemoryBarrier()
+                    .setSrcAccessMask(vk::AccessFlagBits::eTransferWrite)
+                    .setDstAccessMask(vk::AccessFlagBits::eHostRead);
+
+                cmd_buffer.pipelineBarrier(
+                    vk::PipelineStageFlagBits::eTransfer,
+                    vk::PipelineStageFlagBits::eHost,
+                    vk::DependencyFlags(),
+                    1,
+                    &host_barrier,
+                    0, 0, 0, 0);
+            }
+        }, waits);
+
+        buffer_set_access(src, dev_index, stream, submission);
+        buffer_set_access(dst, dev_index, stream, submission);
+        future_add_submission(future, stream, submission);
+    }
 
-        VkBufferCopy bufferCopy;
-        bufferCopy.size = size;
-        bufferCopy.dstOffset = dst_offset;
-        bufferCopy.srcOffset = src_offset;
+    return future;
+}
 
-        src->ctx->queues[dev_index]->waitIdle();
-        dst->buffers[dev_index]->copyFrom(src->buffers[dev_index], src->ctx->queues[dev_index], bufferCopy);
-    }
-    */
-}
\ No newline at end of file
+void buffer_copy_extern(struct Buffer* src, struct Buffer* dst, unsigned long long src_offset, unsigned long long dst_offset, unsigned long long size, int device_index) {
+    struct Future* future = buffer_copy_async_extern(src, dst, src_offset, dst_offset, size, device_index);
+    future_wait_extern(future, UINT64_MAX);
+    future_destroy_extern(future);
+}
@@ -3,12 +3,26 @@
 
 #include "base.h"
 
-struct Buffer* buffer_create_extern(struct Context* context, unsigned long long size);
+struct Buffer* buffer_create_extern(struct Context* context, unsigned long long size, int host_visible);
 void buffer_destroy_extern(struct Buffer* buffer);
 
+void* buffer_get_mapping_extern(struct Buffer* buffer, int device_index);
+void buffer_wait_extern(struct Buffer* buffer, int device_index);
+
 void buffer_write_extern(struct Buffer* buffer, void* data, unsigned long long offset, unsigned long long size, int device_index);
 void buffer_read_extern(struct Buffer* buffer, void* data, unsigned long long offset, unsigned long long size, int device_index);
 
-//void buffer_copy_extern(struct Buffer* src, struct Buffer* dst, unsigned long long src_offset, unsigned long long dst_offset, unsigned long long size, int device_index);
+struct Future* buffer_write_async_extern(struct Buffer* buffer, void* data, unsigned long long offset, unsigned long long size, int device_index);
+struct Future* buffer_read_async_extern(struct Buffer* buffer, void* data, unsigned long long offset, unsigned long long size, int device_index);
+void buffer_read_finish_extern(struct Buffer* buffer, void* data, unsigned long long size, int device_index);
+
+void buffer_write_regions_extern(struct Buffer* buffer, void* data, unsigned long long* offsets, unsigned long long* sizes, int region_count, int device_index);
+void buffer_read_regions_extern(struct Buffer* buffer, void* data, unsigned long long* offsets, unsigned long long* sizes, int region_count, int device_index);
+
+struct Future* buffer_write_regions_async_extern(struct Buffer* buffer, void* data, unsigned long long* offsets, unsigned long long* sizes, int region_count, int device_index);
+struct Future* buffer_read_regions_async_extern(struct Buffer* buffer, void* data, unsigned long long* offsets, unsigned long long* sizes, int region_count, int device_index);
+
+void buffer_copy_extern(struct Buffer* src, struct Buffer* dst, unsigned long long src_offset, unsigned long long dst_offset, unsigned long long size, int device_index);
+struct Future* buffer_copy_async_extern(struct Buffer* src, struct Buffer* dst, unsigned long long src_offset, unsigned long long dst_offset, unsigned long long size, int device_index);
 
 #endif // SRC_BUFFER_H_
\ No newline at end of file
@@ -9,26 +9,157 @@ from libc.stdlib cimport malloc, free
 cdef extern from "buffer.h":
     struct Context
     struct Buffer
+    struct Future
 
-    Buffer* buffer_create_extern(Context* context, unsigned long long size)
+    Buffer* buffer_create_extern(Context* context, unsigned long long size, int host_visible)
     void buffer_destroy_extern(Buffer* buffer)
 
-    void buffer_write_extern(Buffer* buffer, void* data, unsigned long long offset, unsigned long long size, int device_index)
-    void buffer_read_extern(Buffer* buffer, void* data, unsigned long long offset, unsigned long long size, int device_index)
+    void* buffer_get_mapping_extern(Buffer* buffer, int device_index)
+    void buffer_wait_extern(Buffer* buffer, int device_index) nogil
 
-    #void buffer_copy_extern(Buffer* src, Buffer* dst, unsigned long long src_offset, unsigned long long dst_offset, unsigned long long size, int device_index)
+    void buffer_write_extern(Buffer* buffer, void* data, unsigned long long offset, unsigned long long size, int device_index) nogil
+    void buffer_read_extern(Buffer* buffer, void* data, unsigned long long offset, unsigned long long size, int device_index) nogil
 
-cpdef inline buffer_create(unsigned long long context, unsigned long long size):
-    return <unsigned long long>buffer_create_extern(<Context*>context, size)
+    Future* buffer_write_async_extern(Buffer* buffer, void* data, unsigned long long offset, unsigned long long size, int device_index) nogil
+    Future* buffer_read_async_extern(Buffer* buffer, void* data, unsigned long long offset, unsigned long long size, int device_index) nogil
+    void buffer_read_finish_extern(Buffer* buffer, void* data, unsigned long long size, int device_index) nogil
+
+    void buffer_write_regions_extern(Buffer* buffer, void* data, unsigned long long* offsets, unsigned long long* sizes, int region_count, int device_index) nogil
+    void buffer_read_regions_extern(Buffer* buffer, void* data, unsigned long long* offsets, unsigned long long* sizes, int region_count, int device_index) nogil
+
+    Future* buffer_write_regions_async_extern(Buffer* buffer, void* data, unsigned long long* offsets, unsigned long long* sizes, int region_count, int device_index) nogil
+    Future* buffer_read_regions_async_extern(Buffer* buffer, void* data, unsigned long long* offsets, unsigned long long* sizes, int region_count, int device_index) nogil
+
+    void buffer_copy_extern(Buffer* src, Buffer* dst, unsigned long long src_offset, unsigned long long dst_offset, unsigned long long size, int device_index) nogil
+    Future* buffer_copy_async_extern(Buffer* src, Buffer* dst, unsigned long long src_offset, unsigned long long dst_offset, unsigned long long size, int device_index) nogil
+
+cpdef inline buffer_create(unsigned long long context, unsigned long long size, int host_visible):
+    return <unsigned long long>buffer_create_extern(<Context*>context, size, host_visible)
 
 cpdef inline buffer_destroy(unsigned long long buffer):
     buffer_destroy_extern(<Buffer*>buffer)
 
+cpdef inline buffer_get_mapping(unsigned long long buffer, unsigned long long size, int device_index, object owner):
+    cdef void* mapping = buffer_get_mapping_extern(<Buffer*>buffer, device_index)
+    cdef cnp.npy_intp dims[1]
+
+    if mapping == NULL:
+        return None
+
+    dims[0] = size
+    cdef cnp.ndarray result = cnp.PyArray_SimpleNewFromData(1, dims, cnp.NPY_UINT8, mapping)
+
+    # The array does not own the mapped memory, it keeps the owner of the buffer alive instead
+    cnp.set_array_base(result, owner)
+
+    return result
+
+cpdef inline buffer_wait(unsigned long long buffer, int device_index):
+    cdef Buffer* buffer_c = <Buffer*>buffer
+
+    with nogil:
+        buffer_wait_extern(buffer_c, device_index)
+
 cpdef inline buffer_write(unsigned long long buffer, cnp.ndarray data, unsigned long long offset, unsigned long long size, int device_index):
-    buffer_write_extern(<Buffer*>buffer, <void*>data.data, offset, size, device_index)
+    cdef Buffer* buffer_c = <Buffer*>buffer
+    cdef void* data_c = <void*>data.data
+
+    with nogil:
+        buffer_write_extern(buffer_c, data_c, offset, size, device_index)
 
 cpdef inline buffer_read(unsigned long long buffer, cnp.ndarray data, unsigned long long offset, unsigned long long size, int device_index):
-    buffer_read_extern(<Buffer*>buffer, <void*>data.data, offset, size, device_index)
+    cdef Buffer* buffer_c = <Buffer*>buffer
+    cdef void* data_c = <void*>data.data
+
+    with nogil:
+        buffer_read_extern(buffer_c, data_c, offset, size, device_index)
+
+cpdef inline buffer_write_async(unsigned long long buffer, cnp.ndarray data, unsigned long long offset, unsigned long long size, int device_index):
+    cdef Buffer* buffer_c = <Buffer*>buffer
+    cdef void* data_c = <void*>data.data
+    cdef Future* future
+
+    with nogil:
+        future = buffer_write_async_extern(buffer_c, data_c, offset, size, device_index)
+
+    return <unsigned long long>future
+
+cpdef inline buffer_read_async(unsigned long long buffer, cnp.ndarray data, unsigned long long offset, unsigned long long size, int device_index):
+    cdef Buffer* buffer_c = <Buffer*>buffer
+    cdef void* data_c = <void*>data.data
+    cdef Future* future
+
+    with nogil:
+        future = buffer_read_async_extern(buffer_c, data_c, offset, size, device_index)
+
+    return <unsigned long long>future
+
+cpdef inline buffer_read_finish(unsigned long long buffer, cnp.ndarray data, unsigned long long size, int device_index):
+    cdef Buffer* buffer_c = <Buffer*>buffer
+    cdef void* data_c = <void*>data.data
+
+    with nogil:
+        buffer_read_finish_extern(buffer_c, data_c, size, device_index)
+
+cpdef inline buffer_write_regions(unsigned long long buffer, cnp.ndarray data, cnp.ndarray[cnp.uint64_t, ndim=1] offsets, cnp.ndarray[cnp.uint64_t, ndim=1] sizes, int device_index):
+    cdef Buffer* buffer_c = <Buffer*>buffer
+    cdef void* data_c = <void*>data.data
+    cdef unsigned long long* offsets_c = <unsigned long long*>offsets.data
+    cdef unsigned long long* sizes_c = <unsigned long long*>sizes.data
+    cdef int region_count = offsets.shape[0]
+
+    with nogil:
+        buffer_write_regions_extern(buffer_c, data_c, offsets_c, sizes_c, region_count, device_index)
+
+cpdef inline buffer_read_regions(unsigned long long buffer, cnp.ndarray data, cnp.ndarray[cnp.uint64_t, ndim=1] offsets, cnp.ndarray[cnp.uint64_t, ndim=1] sizes, int device_index):
+    cdef Buffer* buffer_c = <Buffer*>buffer
+    cdef void* data_c = <void*>data.data
+    cdef unsigned long long* offsets_c = <unsigned long long*>offsets.data
+    cdef unsigned long long* sizes_c = <unsigned long long*>sizes.data
+    cdef int region_count = offsets.shape[0]
+
+    with nogil:
+        buffer_read_regions_extern(buffer_c, data_c, offsets_c, sizes_c, region_count, device_index)
+
+cpdef inline buffer_write_regions_async(unsigned long long buffer, cnp.ndarray data, cnp.ndarray[cnp.uint64_t, ndim=1] offsets, cnp.ndarray[cnp.uint64_t, ndim=1] sizes, int device_index):
+    cdef Buffer* buffer_c = <Buffer*>buffer
+    cdef void* data_c = <void*>data.data
+    cdef unsigned long long* offsets_c = <unsigned long long*>offsets.data
+    cdef unsigned long long* sizes_c = <unsigned long long*>sizes.data
+    cdef int region_count = offsets.shape[0]
+    cdef Future* future
+
+    with nogil:
+        future = buffer_write_regions_async_extern(buffer_c, data_c, offsets_c, sizes_c, region_count, device_index)
+
+    return <unsigned long long>future
+
+cpdef inline buffer_read_regions_async(unsigned long long buffer, cnp.ndarray data, cnp.ndarray[cnp.uint64_t, ndim=1] offsets, cnp.ndarray[cnp.uint64_t, ndim=1] sizes, int device_index):
+    cdef Buffer* buffer_c = <Buffer*>buffer
+    cdef void* data_c = <void*>data.data
+    cdef unsigned long long* offsets_c = <unsigned long long*>offsets.data
+    cdef unsigned long long* sizes_c = <unsigned long long*>sizes.data
+    cdef int region_count = offsets.shape[0]
+    cdef Future* future
+
+    with nogil:
+        future = buffer_read_regions_async_extern(buffer_c, data_c, offsets_c, sizes_c, region_count, device_index)
+
+    return <unsigned long long>future
+
+cpdef inline buffer_copy(unsigned long long src, unsigned long long dst, unsigned long long src_offset, unsigned long long dst_offset, unsigned long long size, int device_index):
+    cdef Buffer* src_c = <Buffer*>src
+    cdef Buffer* dst_c = <Buffer*>dst
+
+    with nogil:
+        buffer_copy_extern(src_c, dst_c, src_offset, dst_offset, size, device_index)
+
+cpdef inline buffer_copy_async(unsigned long long src, unsigned long long dst, unsigned long long src_offset, unsigned long long dst_offset, unsigned long long size, int device_index):
+    cdef Buffer* src_c = <Buffer*>src
+    cdef Buffer* dst_c = <Buffer*>dst
+    cdef Future* future
+
+    with nogil:
+        future = buffer_copy_async_extern(src_c, dst_c, src_offset, dst_offset, size, device_index)
 
-#cpdef inline buffer_copy(unsigned long long src, unsigned long long dst, unsigned long long src_offset, unsigned long long dst_offset, unsigned long long size, int device_index):
-#    buffer_copy_extern(<Buffer*>src, <Buffer*>dst, src_offset, dst_offset, size, device_index)
\ No newline at end of file
+    return <unsigned long long>future
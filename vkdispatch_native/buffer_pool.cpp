@@ -0,0 +1,137 @@
+#include "internal.h"
+
+struct BufferPool* buffer_pool_create_extern(struct Context* context, unsigned long long block_size) {
+    LOG_INFO("Creating buffer pool with block size %llu", block_size);
+
+    struct BufferPool* pool = new struct BufferPool();
+    pool->ctx = context;
+    pool->hits = 0;
+    pool->misses = 0;
+
+    for (int i = 0; i < context->deviceCount; i++) {
+        // Every buffer of the pool is created with the same usage, so one memory type serves all of them
+        VkBufferCreateInfo bufferCreateInfo;
+        uint32_t queueFamilies[2];
+        buffer_get_create_info(context, i, 1024, &bufferCreateInfo, queueFamilies);
+
+        VmaAllocationCreateInfo vmaAllocationCreateInfo = {};
+        vmaAllocationCreateInfo.usage = VMA_MEMORY_USAGE_AUTO_PREFER_DEVICE;
+
+        uint32_t memoryTypeIndex;
+        VK_CALL(vmaFindMemoryTypeIndexForBufferInfo(context->allocators[i], &bufferCreateInfo, &vmaAllocationCreateInfo, &memoryTypeIndex));
+
+        // Without an algorithm flag VMA places allocations in the blocks with its TLSF allocator
+        VmaPoolCreateInfo poolCreateInfo = {};
+        poolCreateInfo.memoryTypeIndex = memoryTypeIndex;
+        poolCreateInfo.blockSize = block_size;
+        poolCreateInfo.minBlockCount = 0;
+
+        VmaPool vmaPool;
+        VK_CALL(vmaCreatePool(context->allocators[i], &poolCreateInfo, &vmaPool));
+
+        pool->pools.push_back(vmaPool);
+    }
+
+    return pool;
+}
+
+void buffer_pool_destroy_extern(struct BufferPool* pool) {
+    struct Context* ctx = pool->ctx;
+
+    buffer_pool_trim_extern(pool);
+
+    // The released buffers are freed by earlier deferred entries, the pools go once everything submitted so far is done
+    std::vector<struct StreamSubmission> waits;
+    context_get_submitted(ctx, waits);
+
+    context_defer_destroy(ctx, waits, [ctx, pool]() {
+        for (int i = 0; i < ctx->deviceCount; i++) {
+            vmaDestroyPool(ctx->allocators[i], pool->pools[i]);
+        }
+
+        delete pool;
+    });
+}
+
+static unsigned long long buffer_pool_size_class(unsigned long long size) {
+    if(size <= 256)
+        return 256;
+
+    unsigned long long power = 256;
+
+    while(power * 2 < size)
+        power *= 2;
+
+    // Four classes per power of two keep the rounding waste under a quarter of the size
+    unsigned long long step = power / 4;
+
+    return ((size + step - 1) / step) * step;
+}
+
+struct Buffer* buffer_pool_acquire_extern(struct BufferPool* pool, unsigned long long size) {
+    unsigned long long size_class = buffer_pool_size_class(size);
+
+    {
+        std::unique_lock<std::mutex> lock(pool->mutex);
+
+        std::vector<struct Buffer*>& free_buffers = pool->freeBuffers[size_class];
+
+        // A reused buffer keeps its access history, so new work on it still waits for the previous owner's work
+        if(free_buffers.size() > 0) {
+            struct Buffer* buffer = free_buffers.back();
+            free_buffers.pop_back();
+
+            pool->hits += 1;
+
+            return buffer;
+        }
+
+        pool->misses += 1;
+    }
+
+    LOG_INFO("Allocating pooled buffer of size class %llu", size_class);
+
+    return buffer_allocate(pool->ctx, size_class, pool, false);
+}
+
+void buffer_pool_release_extern(struct BufferPool* pool, struct Buffer* buffer) {
+    std::unique_lock<std::mutex> lock(pool->mutex);
+    pool->freeBuffers[buffer->size].push_back(buffer);
+}
+
+void buffer_pool_trim_extern(struct BufferPool* pool) {
+    std::unique_lock<std::mutex> lock(pool->mutex);
+
+    // Released buffers may still be in use by submitted work, which defers freeing them
+    for(auto& entry : pool->freeBuffers) {
+        for(struct Buffer* buffer : entry.second)
+            buffer_destroy_extern(buffer);
+    }
+
+    pool->freeBuffers.clear();
+}
+
+void buffer_pool_get_stats_extern(struct BufferPool* pool, unsigned long long* stats) {
+    std::unique_lock<std::mutex> lock(pool->mutex);
+
+    for(int i = 0; i < 8; i++)
+        stats[i] = 0;
+
+    for (int i = 0; i < pool->ctx->deviceCount; i++) {
+        VmaStatistics statistics;
+        vmaGetPoolStatistics(pool->ctx->allocators[i], pool->pools[i], &statistics);
+
+        stats[0] += statistics.blockCount;
+        stats[1] += statistics.blockBytes;
+        stats[2] += statistics.allocationCount;
+        stats[3] += statistics.allocationBytes;
+    }
+
+    for(auto& entry : pool->freeBuffers) {
+        stats[4] += entry.second.size();
+        stats[5] += entry.first * entry.second.size();
+    }
+
+    stats[6] = pool->hits;
+    stats[7] = pool->misses;
+}
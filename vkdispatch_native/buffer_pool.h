@@ -0,0 +1,15 @@
+#ifndef SRC_BUFFER_POOL_H_
+#define SRC_BUFFER_POOL_H_
+
+#include "base.h"
+
+struct BufferPool* buffer_pool_create_extern(struct Context* context, unsigned long long block_size);
+void buffer_pool_destroy_extern(struct BufferPool* pool);
+
+struct Buffer* buffer_pool_acquire_extern(struct BufferPool* pool, unsigned long long size);
+void buffer_pool_release_extern(struct BufferPool* pool, struct Buffer* buffer);
+void buffer_pool_trim_extern(struct BufferPool* pool);
+
+void buffer_pool_get_stats_extern(struct BufferPool* pool, unsigned long long* stats);
+
+#endif // SRC_BUFFER_POOL_H_
@@ -0,0 +1,48 @@
+# distutils: language=c++
+import numpy as np
+cimport numpy as cnp
+from libcpp cimport bool
+import sys
+
+from libc.stdlib cimport malloc, free
+
+cdef extern from "buffer_pool.h":
+    struct Context
+    struct Buffer
+    struct BufferPool
+
+    BufferPool* buffer_pool_create_extern(Context* context, unsigned long long block_size)
+    void buffer_pool_destroy_extern(BufferPool* pool) nogil
+
+    Buffer* buffer_pool_acquire_extern(BufferPool* pool, unsigned long long size)
+    void buffer_pool_release_extern(BufferPool* pool, Buffer* buffer)
+    void buffer_pool_trim_extern(BufferPool* pool) nogil
+
+    void buffer_pool_get_stats_extern(BufferPool* pool, unsigned long long* stats)
+
+cpdef inline buffer_pool_create(unsigned long long context, unsigned long long block_size):
+    return <unsigned long long>buffer_pool_create_extern(<Context*>context, block_size)
+
+cpdef inline buffer_pool_destroy(unsigned long long pool):
+    cdef BufferPool* pool_c = <BufferPool*>pool
+
+    with nogil:
+        buffer_pool_destroy_extern(pool_c)
+
+cpdef inline buffer_pool_acquire(unsigned long long pool, unsigned long long size):
+    return <unsigned long long>buffer_pool_acquire_extern(<BufferPool*>pool, size)
+
+cpdef inline buffer_pool_release(unsigned long long pool, unsigned long long buffer):
+    buffer_pool_release_extern(<BufferPool*>pool, <Buffer*>buffer)
+
+cpdef inline buffer_pool_trim(unsigned long long pool):
+    cdef BufferPool* pool_c = <BufferPool*>pool
+
+    with nogil:
+        buffer_pool_trim_extern(pool_c)
+
+cpdef inline buffer_pool_get_stats(unsigned long long pool):
+    cdef unsigned long long stats[8]
+    buffer_pool_get_stats_extern(<BufferPool*>pool, stats)
+
+    return [stats[i] for i in range(8)]
@@ -1,19 +1,63 @@
 #include "internal.h"
 
+#include <algorithm>
+
 struct CommandList* command_list_create_extern(struct Context* context) {
     LOG_INFO("Creating command list with context %p", context);
 
+    context_collect_deferred(context);
+
     struct CommandList* command_list = new struct CommandList();
     command_list->ctx = context;
+    command_list->frozen = false;
+    command_list->profiling = false;
+
+    for(int i = 0; i < context->deviceCount; i++) {
+        command_list->queryPools.push_back(vk::QueryPool());
+        command_list->queryCapacities.push_back(0);
+        command_list->queryCounts.push_back(0);
+        command_list->queryStreams.push_back(NULL);
+        command_list->querySubmissions.push_back(0);
+
+        command_list->paramsBuffers.push_back(vk::Buffer());
+        command_list->paramsAllocations.push_back(VK_NULL_HANDLE);
+        command_list->paramsMappings.push_back(NULL);
+        command_list->paramsCapacities.push_back(0);
+        command_list->paramsSlotSizes.push_back(0);
+        command_list->paramsSlots.push_back(std::vector<struct StreamSubmission>());
+        command_list->paramsNextSlots.push_back(0);
+
+        command_list->lastStreams.push_back(NULL);
+        command_list->lastSubmissions.push_back(0);
+    }
+
     return command_list;
 }
 
 void command_list_destroy_extern(struct CommandList* command_list) {
-    for(int i = 0; i < command_list->stages.size(); i++) {
-        free(command_list->stages[i].user_data);
-    }
+    struct Context* ctx = command_list->ctx;
+
+    // Submits of the list may be queued or running on any stream, and the stream threads may still be
+    // recording copies of its stages, so it is freed once everything submitted so far has finished
+    std::vector<struct StreamSubmission> waits;
+    context_get_submitted(ctx, waits);
+
+    context_defer_destroy(ctx, waits, [ctx, command_list]() {
+        for(int i = 0; i < command_list->frozenPools.size(); i++) {
+            ctx->devices[i].freeCommandBuffers(command_list->frozenPools[i], command_list->frozenCommandBuffers[i]);
+            ctx->devices[i].destroyCommandPool(command_list->frozenPools[i]);
+        }
 
-    delete command_list;
+        for(int i = 0; i < ctx->deviceCount; i++) {
+            if(command_list->paramsCapacities[i] > 0)
+                vmaDestroyBuffer(ctx->allocators[i], command_list->paramsBuffers[i], command_list->paramsAllocations[i]);
+
+            if(command_list->queryCapacities[i] > 0)
+                ctx->devices[i].destroyQueryPool(command_list->queryPools[i]);
+        }
+
+        delete command_list;
+    });
 }
 
 void command_list_get_instance_size_extern(struct CommandList* command_list, unsigned long long* instance_size) {
@@ -31,46 +75,723 @@ void command_list_get_instance_size_extern(struct CommandList* command_list, uns
 void command_list_reset_extern(struct CommandList* command_list) {
     LOG_INFO("Resetting command list");
 
-    for(int i = 0; i < command_list->stages.size(); i++) {
-        free(command_list->stages[i].user_data);
-    }
+    std::unique_lock<std::mutex> lock(command_list->mutex);
 
+    // Stream threads record from their own copies of the stages, which keep the user data alive
     command_list->stages.clear();
+
+    for(int i = 0; i < command_list->frozenInstanceCounts.size(); i++) {
+        command_list->frozenInstanceCounts[i] = 0;
+    }
 }
 
-void command_list_submit_extern(struct CommandList* command_list, void* instance_buffer, unsigned int instance_count, int* devices, int device_count, int* submission_thread_counts) {
-    // For now, we will just submit the command list to the first device
-    int device = devices[0];
+void command_list_freeze_extern(struct CommandList* command_list) {
+    if(command_list->frozen)
+        return;
 
-    LOG_INFO("Submitting command list to device %d", device);
+    LOG_INFO("Freezing command list %p", command_list);
 
-    char* instance_data = (char*)instance_buffer;
+    struct Context* ctx = command_list->ctx;
+
+    for(int i = 0; i < ctx->deviceCount; i++) {
+        // Frozen recordings get their own pool so they are never recycled by the stream's ring
+        command_list->frozenPools.push_back(ctx->devices[i].createCommandPool(
+            vk::CommandPoolCreateInfo()
+            .setQueueFamilyIndex(ctx->streams[i][0]->queueFamilyIndex)
+            .setFlags(vk::CommandPoolCreateFlagBits::eResetCommandBuffer)
+        ));
+
+        command_list->frozenCommandBuffers.push_back(ctx->devices[i].allocateCommandBuffers(
+            vk::CommandBufferAllocateInfo()
+            .setCommandPool(command_list->frozenPools[i])
+            .setLevel(vk::CommandBufferLevel::ePrimary)
+            .setCommandBufferCount(1)
+        )[0]);
+
+        command_list->frozenStageCounts.push_back(0);
+        command_list->frozenInstanceCounts.push_back(0);
+        command_list->frozenInstanceData.push_back(std::vector<char>());
+    }
+
+    command_list->frozen = true;
+}
+
+void command_list_unfreeze_extern(struct CommandList* command_list) {
+    if(!command_list->frozen)
+        return;
+
+    LOG_INFO("Unfreezing command list %p", command_list);
+
+    struct Context* ctx = command_list->ctx;
+
+    for(int i = 0; i < ctx->deviceCount; i++) {
+        // The frozen command buffer may still be pending on the device
+        context_wait_idle(ctx, i);
+
+        ctx->devices[i].freeCommandBuffers(command_list->frozenPools[i], command_list->frozenCommandBuffers[i]);
+        ctx->devices[i].destroyCommandPool(command_list->frozenPools[i]);
+    }
+
+    command_list->frozenPools.clear();
+    command_list->frozenCommandBuffers.clear();
+    command_list->frozenStageCounts.clear();
+    command_list->frozenInstanceCounts.clear();
+    command_list->frozenInstanceData.clear();
+
+    command_list->frozen = false;
+}
+
+void command_list_add_dependency_extern(struct CommandList* command_list, struct CommandList* dependency) {
+    // Submits read the dependencies of the list while holding its mutex
+    std::unique_lock<std::mutex> lock(command_list->mutex);
+
+    for(struct CommandList* other : command_list->dependencies)
+        if(other == dependency)
+            return;
+
+    command_list->dependencies.push_back(dependency);
+}
+
+void command_list_clear_dependencies_extern(struct CommandList* command_list) {
+    std::unique_lock<std::mutex> lock(command_list->mutex);
+    command_list->dependencies.clear();
+}
+
+void command_list_set_profiling_extern(struct CommandList* command_list, int enabled) {
+    if(command_list->profiling == (enabled != 0))
+        return;
+
+    command_list->profiling = enabled != 0;
+
+    // Frozen recordings have to be redone with or without the timestamp queries
+    for(int i = 0; i < command_list->frozenStageCounts.size(); i++) {
+        command_list->frozenStageCounts[i] = 0;
+    }
+}
+
+static void command_list_prepare_queries(struct CommandList* command_list, unsigned int instance_count, int device) {
+    struct Context* ctx = command_list->ctx;
+    uint32_t required_count = 2 * command_list->stages.size() * instance_count;
+
+    // The query pool is shared by all submissions of the list, so only the latest one is kept
+    if(command_list->queryStreams[device] != NULL)
+        command_list->queryStreams[device]->wait(command_list->querySubmissions[device], UINT64_MAX);
+
+    command_list->queryStreams[device] = NULL;
+    command_list->queryCounts[device] = required_count;
+
+    if(command_list->queryCapacities[device] >= required_count)
+        return;
+
+    LOG_INFO("Growing timestamp query pool of device %d to %u queries", device, required_count);
+
+    if(command_list->queryCapacities[device] != 0) {
+        context_wait_idle(ctx, device);
+        ctx->devices[device].destroyQueryPool(command_list->queryPools[device]);
+    }
+
+    command_list->queryPools[device] = ctx->devices[device].createQueryPool(
+        vk::QueryPoolCreateInfo()
+        .setQueryType(vk::QueryType::eTimestamp)
+        .setQueryCount(required_count)
+    );
+    command_list->queryCapacities[device] = required_count;
+
+    if(command_list->frozen)
+        command_list->frozenStageCounts[device] = 0;
+}
+
+void command_list_get_profile_size_extern(struct CommandList* command_list, int device, unsigned long long* entry_count) {
+    *entry_count = command_list->queryCounts[device] / 2;
+}
+
+void command_list_get_profile_extern(struct CommandList* command_list, int device, double* timings) {
+    std::unique_lock<std::mutex> lock(command_list->mutex);
+
+    struct Context* ctx = command_list->ctx;
+    uint32_t query_count = command_list->queryCounts[device];
+
+    if(query_count == 0)
+        return;
+
+    if(command_list->queryStreams[device] != NULL)
+        command_list->queryStreams[device]->wait(command_list->querySubmissions[device], UINT64_MAX);
+
+    int family = ctx->streams[device][0]->queueFamilyIndex;
+    uint32_t valid_bits = ctx->physicalDevices[device].getQueueFamilyProperties()[family].timestampValidBits;
+    double period = ctx->physicalDevices[device].getProperties().limits.timestampPeriod;
+
+    if(valid_bits == 0) {
+        LOG_ERROR("Queue family %d of device %d does not support timestamps", family, device);
+
+        for(uint32_t i = 0; i < query_count / 2; i++) {
+            timings[i] = 0;
+        }
+
+        return;
+    }
+
+    uint64_t mask = valid_bits == 64 ? UINT64_MAX : ((uint64_t)1 << valid_bits) - 1;
+    std::vector<uint64_t> timestamps(query_count);
+
+    VK_CALL((VkResult)ctx->devices[device].getQueryPoolResults(
+        command_list->queryPools[device],
+        0,
+        query_count,
+        timestamps.size() * sizeof(uint64_t),
+        timestamps.data(),
+        sizeof(uint64_t),
+        vk::QueryResultFlagBits::e64 | vk::QueryResultFlagBits::eWait
+    ));
+
+    for(uint32_t i = 0; i < query_count / 2; i++) {
+        timings[i] = ((timestamps[2 * i + 1] - timestamps[2 * i]) & mask) * period;
+    }
+}
+
+// Location of every instance's parameters inside the command list's parameters buffer.
+// Each stage that reads its parameters from the buffer gets a slot aligned to the device's
+// minimum storage buffer offset alignment, so it can be bound with a dynamic offset.
+struct ParamsLayout {
+    std::vector<uint32_t> offsets;
+    unsigned long long stride;
+    unsigned long long base;
+    int slot;
+};
+
+static void command_list_get_params_layout(struct CommandList* command_list, int device, struct ParamsLayout* layout) {
+    unsigned long long alignment = command_list->ctx->physicalDevices[device].getProperties().limits.minStorageBufferOffsetAlignment;
+
+    layout->offsets.clear();
+    layout->stride = 0;
+    layout->base = 0;
+    layout->slot = -1;
+
+    for(size_t i = 0; i < command_list->stages.size(); i++) {
+        layout->offsets.push_back((uint32_t)layout->stride);
+
+        if(command_list->stages[i].params_set == NULL)
+            continue;
+
+        layout->stride += (command_list->stages[i].instance_data_size + alignment - 1) / alignment * alignment;
+    }
+}
+
+static void command_list_upload_params(struct CommandList* command_list, struct ParamsLayout* layout, char* instance_data, unsigned int instance_count, int device) {
+    struct Context* ctx = command_list->ctx;
+    unsigned long long required_size = layout->stride * instance_count;
+
+    if(required_size == 0)
+        return;
+
+    if(command_list->paramsSlotSizes[device] < required_size) {
+        // There is a slot for every command buffer the compute streams of the device can keep in flight
+        int slot_count = 0;
+
+        for(Stream* stream : ctx->streams[device])
+            slot_count += stream->commandBuffers.size();
+
+        unsigned long long capacity = required_size * slot_count;
+
+        LOG_INFO("Growing parameters buffer of device %d to %llu bytes", device, capacity);
+
+        // The old buffer is bound in descriptor sets that pending submissions may still use
+        context_wait_idle(ctx, device);
+
+        if(command_list->paramsCapacities[device] != 0)
+            vmaDestroyBuffer(ctx->allocators[device], command_list->paramsBuffers[device], command_list->paramsAllocations[device]);
+
+        VkBufferCreateInfo bufferCreateInfo = static_cast<VkBufferCreateInfo>(
+            vk::BufferCreateInfo()
+            .setSize(capacity)
+            .setUsage(vk::BufferUsageFlagBits::eStorageBuffer)
+        );
+
+        VmaAllocationCreateInfo vmaAllocationCreateInfo = {};
+        vmaAllocationCreateInfo.flags = VMA_ALLOCATION_CREATE_HOST_ACCESS_SEQUENTIAL_WRITE_BIT | VMA_ALLOCATION_CREATE_MAPPED_BIT;
+        vmaAllocationCreateInfo.usage = VMA_MEMORY_USAGE_AUTO;
+
+        VkBuffer temp_buffer;
+        VmaAllocation vmaAllocation;
+        VmaAllocationInfo vmaAllocationInfo;
+        VK_CALL(vmaCreateBuffer(ctx->allocators[device], &bufferCreateInfo, &vmaAllocationCreateInfo, &temp_buffer, &vmaAllocation, &vmaAllocationInfo));
+
+        command_list->paramsBuffers[device] = temp_buffer;
+        command_list->paramsAllocations[device] = vmaAllocation;
+        command_list->paramsMappings[device] = vmaAllocationInfo.pMappedData;
+        command_list->paramsCapacities[device] = capacity;
+        command_list->paramsSlotSizes[device] = required_size;
+        command_list->paramsSlots[device].assign(slot_count, {NULL, 0});
+        command_list->paramsNextSlots[device] = 0;
+    }
+
+    bool descriptors_updated = false;
+
+    for(size_t i = 0; i < command_list->stages.size(); i++) {
+        struct Stage& stage = command_list->stages[i];
+
+        if(stage.params_set == NULL || stage.params_set->paramsBuffers[device] == command_list->paramsBuffers[device])
+            continue;
+
+        // The descriptor set may still be bound in a pending submission
+        if(!descriptors_updated)
+            context_wait_idle(ctx, device);
+
+        vk::DescriptorBufferInfo bufferInfo = vk::DescriptorBufferInfo()
+            .setBuffer(command_list->paramsBuffers[device])
+            .setOffset(0)
+            .setRange(stage.instance_data_size);
+
+        ctx->devices[device].updateDescriptorSets(
+            vk::WriteDescriptorSet()
+            .setDstSet(stage.params_set->sets[device])
+            .setDstBinding(stage.params_set->plan->params_binding)
+            .setDescriptorType(vk::DescriptorType::eStorageBufferDynamic)
+            .setBufferInfo(bufferInfo)
+        , nullptr);
+
+        stage.params_set->paramsBuffers[device] = command_list->paramsBuffers[device];
+        descriptors_updated = true;
+    }
+
+    // Frozen recordings referenced the old descriptor contents
+    if(descriptors_updated && command_list->frozen)
+        command_list->frozenStageCounts[device] = 0;
+
+    // Frozen recordings bake in their dynamic offsets, so they always use the first slot
+    int slot = 0;
+
+    if(!command_list->frozen) {
+        slot = command_list->paramsNextSlots[device];
+        command_list->paramsNextSlots[device] = (slot + 1) % command_list->paramsSlots[device].size();
+    }
+
+    // An earlier submission of this list may still be reading the parameters in the slot
+    struct StreamSubmission last = command_list->paramsSlots[device][slot];
+
+    if(last.stream != NULL)
+        last.stream->wait(last.submission, UINT64_MAX);
+
+    layout->slot = slot;
+    layout->base = slot * command_list->paramsSlotSizes[device];
+
+    char* mapped = (char*)command_list->paramsMappings[device] + layout->base;
+    char* current_instance_data = instance_data;
+
+    for(size_t instance = 0; instance < instance_count; instance++) {
+        for (size_t i = 0; i < command_list->stages.size(); i++) {
+            if(command_list->stages[i].params_set != NULL) {
+                memcpy(
+                    mapped + instance * layout->stride + layout->offsets[i],
+                    current_instance_data,
+                    command_list->stages[i].instance_data_size
+                );
+            }
+
+            current_instance_data += command_list->stages[i].instance_data_size;
+        }
+    }
+
+    VK_CALL(vmaFlushAllocation(ctx->allocators[device], command_list->paramsAllocations[device], layout->base, required_size));
+}
+
+static bool buffer_list_contains(std::vector<struct Buffer*>& buffers, struct Buffer* buffer) {
+    return std::find(buffers.begin(), buffers.end(), buffer) != buffers.end();
+}
+
+struct RecordState {
+    std::vector<struct Buffer*> pending_reads;
+    std::vector<struct Buffer*> pending_writes;
+    vk::PipelineStageFlags pending_stages;
+    vk::PipelineStageFlags list_stages;
+};
+
+static void command_list_record_instances(std::vector<struct Stage>& stages, struct ParamsLayout* layout, vk::QueryPool query_pool, vk::CommandBuffer& cmd_buffer, char* instance_data, unsigned int instance_count, int device, struct RecordState* state) {
     char* current_instance_data = instance_data;
 
+    // Every stage of every instance gets a pair of timestamps around it
+    if(query_pool)
+        cmd_buffer.resetQueryPool(query_pool, 0, 2 * stages.size() * instance_count);
+
     vk::MemoryBarrier memory_barrier = vk::MemoryBarrier()
         .setSrcAccessMask(vk::AccessFlagBits::eMemoryWrite)
-        .setDstAccessMask(vk::AccessFlagBits::eMemoryRead);
+        .setDstAccessMask(vk::AccessFlagBits::eMemoryRead | vk::AccessFlagBits::eMemoryWrite);
+
+    // Barriers wait on every stage recorded since the previous barrier and block every stage
+    // kind used by the list, so a hazard that is skipped once is still covered by a later barrier.
+    // The state carries over when several lists are recorded into the same command buffer, and then
+    // already holds the stage kinds of all of them.
+    for (size_t i = 0; i < stages.size(); i++) {
+        state->list_stages |= stages[i].stage;
+    }
 
-    vk::CommandBuffer cmd_buffer = command_list->ctx->streams[device]->begin();
+    std::vector<struct Buffer*>& pending_reads = state->pending_reads;
+    std::vector<struct Buffer*>& pending_writes = state->pending_writes;
+    vk::PipelineStageFlags& pending_stages = state->pending_stages;
+    vk::PipelineStageFlags list_stages = state->list_stages;
 
     for(size_t instance = 0; instance < instance_count; instance++) {
         LOG_INFO("Recording instance %d", instance);
 
-        for (size_t i = 0; i < command_list->stages.size(); i++) {
-            LOG_INFO("Recording stage %d", i);
-            command_list->stages[i].record(cmd_buffer, &command_list->stages[i], current_instance_data, device);
-            if(i < command_list->stages.size() - 1)
+        for (size_t i = 0; i < stages.size(); i++) {
+            struct Stage& stage = stages[i];
+            bool hazard = false;
+
+            // Read after write
+            for (size_t j = 0; j < stage.reads.size() && !hazard; j++) {
+                hazard = buffer_list_contains(pending_writes, stage.reads[j]);
+            }
+
+            // Write after write and write after read
+            for (size_t j = 0; j < stage.writes.size() && !hazard; j++) {
+                hazard = buffer_list_contains(pending_writes, stage.writes[j]) ||
+                         buffer_list_contains(pending_reads, stage.writes[j]);
+            }
+
+            // Profiled stages are kept from overlapping, so the timestamps around each one only cover its own work
+            if(query_pool && pending_stages)
+                hazard = true;
+
+            if(hazard) {
                 cmd_buffer.pipelineBarrier(
-                    command_list->stages[i].stage, 
-                    command_list->stages[i+1].stage,
+                    pending_stages, 
+                    list_stages,
                     vk::DependencyFlags(), 
                     1, 
                     &memory_barrier, 
                     0, 0, 0, 0);
 
-            current_instance_data += command_list->stages[i].instance_data_size;
+                pending_reads.clear();
+                pending_writes.clear();
+                pending_stages = vk::PipelineStageFlags();
+            }
+
+            LOG_INFO("Recording stage %d", i);
+            uint32_t params_offset = (uint32_t)(layout->base + instance * layout->stride) + layout->offsets[i];
+            uint32_t query = 2 * (instance * stages.size() + i);
+
+            if(query_pool)
+                cmd_buffer.writeTimestamp(vk::PipelineStageFlagBits::eTopOfPipe, query_pool, query);
+
+            stage.record(cmd_buffer, &stage, current_instance_data, params_offset, device);
+
+            if(query_pool)
+                cmd_buffer.writeTimestamp(vk::PipelineStageFlagBits::eBottomOfPipe, query_pool, query + 1);
+
+            for (size_t j = 0; j < stage.reads.size(); j++) {
+                if(!buffer_list_contains(pending_reads, stage.reads[j]))
+                    pending_reads.push_back(stage.reads[j]);
+            }
+
+            for (size_t j = 0; j < stage.writes.size(); j++) {
+                if(!buffer_list_contains(pending_writes, stage.writes[j]))
+                    pending_writes.push_back(stage.writes[j]);
+            }
+
+            pending_stages |= stage.stage;
+
+            current_instance_data += stage.instance_data_size;
         }
     }
 
-    command_list->ctx->streams[device]->submit();
-}
\ No newline at end of file
+    // Writes to mapped buffers are read by the host without any copy command, so they have to be made visible to it
+    for (size_t i = 0; i < pending_writes.size(); i++) {
+        if(!pending_writes[i]->host_visible)
+            continue;
+
+        vk::MemoryBarrier host_barrier = vk::MemoryBarrier()
+            .setSrcAccessMask(vk::AccessFlagBits::eMemoryWrite)
+            .setDstAccessMask(vk::AccessFlagBits::eHostRead);
+
+        cmd_buffer.pipelineBarrier(
+            pending_stages,
+            vk::PipelineStageFlagBits::eHost,
+            vk::DependencyFlags(),
+            1,
+            &host_barrier,
+            0, 0, 0, 0);
+
+        break;
+    }
+}
+
+static uint64_t command_list_submit_frozen(struct CommandList* command_list, Stream* stream, std::vector<struct StreamSubmission>& waits, struct ParamsLayout* layout, vk::QueryPool query_pool, char* instance_data, unsigned int instance_count, int device) {
+    unsigned long long instance_size;
+    command_list_get_instance_size_extern(command_list, &instance_size);
+
+    size_t data_size = instance_size * instance_count;
+
+    // Only push constants are baked into the recording, parameters read from the buffer can change freely
+    bool data_recorded = false;
+
+    for(size_t i = 0; i < command_list->stages.size(); i++) {
+        if(command_list->stages[i].params_set == NULL && command_list->stages[i].instance_data_size > 0)
+            data_recorded = true;
+    }
+
+    std::vector<char>& recorded_data = command_list->frozenInstanceData[device];
+    vk::CommandBuffer& cmd_buffer = command_list->frozenCommandBuffers[device];
+
+    bool stale = command_list->frozenStageCounts[device] != command_list->stages.size() ||
+                 command_list->frozenInstanceCounts[device] != instance_count ||
+                 (data_recorded && data_size > 0 && memcmp(recorded_data.data(), instance_data, data_size) != 0);
+
+    if(stale) {
+        LOG_INFO("Re-recording frozen command list for device %d", device);
+
+        // A frozen command buffer can only be reset once no submission of it is pending
+        context_wait_idle(command_list->ctx, device);
+
+        cmd_buffer.reset(vk::CommandBufferResetFlags());
+        cmd_buffer.begin(
+            vk::CommandBufferBeginInfo()
+            .setFlags(vk::CommandBufferUsageFlagBits::eSimultaneousUse)
+        );
+
+        struct RecordState state;
+        command_list_record_instances(command_list->stages, layout, query_pool, cmd_buffer, instance_data, instance_count, device, &state);
+
+        cmd_buffer.end();
+
+        if(data_recorded)
+            recorded_data.assign(instance_data, instance_data + data_size);
+
+        command_list->frozenStageCounts[device] = command_list->stages.size();
+        command_list->frozenInstanceCounts[device] = instance_count;
+    }
+
+    return stream->submit(cmd_buffer, waits);
+}
+
+static void command_list_get_waits(struct CommandList* command_list, int device, std::vector<struct Buffer*>& buffers, std::vector<struct StreamSubmission>& waits) {
+    // Earlier submits that used the same buffers, on any stream including the transfer stream, are waited on through their timeline semaphores
+    for(size_t i = 0; i < command_list->stages.size(); i++) {
+        for(struct Buffer* buffer : command_list->stages[i].reads)
+            if(!buffer_list_contains(buffers, buffer))
+                buffers.push_back(buffer);
+
+        for(struct Buffer* buffer : command_list->stages[i].writes)
+            if(!buffer_list_contains(buffers, buffer))
+                buffers.push_back(buffer);
+    }
+
+    for(struct Buffer* buffer : buffers)
+        buffer_get_waits(buffer, device, waits);
+
+    // Declared dependencies wait on the last submit of the other list, which may run on any queue of the device
+    for(struct CommandList* dependency : command_list->dependencies) {
+        struct StreamSubmission last;
+
+        // The dependency may be submitted from another thread at the same time, the pair is read as one snapshot
+        {
+            std::unique_lock<std::mutex> lock(dependency->lastMutex);
+            last = {dependency->lastStreams[device], dependency->lastSubmissions[device]};
+        }
+
+        stream_add_wait(waits, last);
+    }
+}
+
+static void command_list_set_submitted(struct CommandList* command_list, int device, std::vector<struct Buffer*>& buffers, Stream* stream, uint64_t submission, int params_slot) {
+    for(struct Buffer* buffer : buffers)
+        buffer_set_access(buffer, device, stream, submission);
+
+    {
+        std::unique_lock<std::mutex> lock(command_list->lastMutex);
+        command_list->lastStreams[device] = stream;
+        command_list->lastSubmissions[device] = submission;
+    }
+
+    if(command_list->profiling) {
+        command_list->queryStreams[device] = stream;
+        command_list->querySubmissions[device] = submission;
+    }
+
+    if(params_slot >= 0)
+        command_list->paramsSlots[device][params_slot] = {stream, submission};
+}
+
+static uint64_t command_list_submit_device(struct CommandList* command_list, void* instance_buffer, unsigned int instance_count, int device, Stream** submit_stream) {
+    LOG_INFO("Submitting command list to device %d", device);
+
+    char* instance_data = (char*)instance_buffer;
+    Stream* stream = context_next_stream(command_list->ctx, device);
+
+    struct ParamsLayout layout;
+    command_list_get_params_layout(command_list, device, &layout);
+    command_list_upload_params(command_list, &layout, instance_data, instance_count, device);
+
+    vk::QueryPool query_pool;
+
+    if(command_list->profiling) {
+        command_list_prepare_queries(command_list, instance_count, device);
+        query_pool = command_list->queryPools[device];
+    }
+
+    std::vector<struct Buffer*> buffers;
+    std::vector<struct StreamSubmission> waits;
+    command_list_get_waits(command_list, device, buffers, waits);
+
+    uint64_t submission;
+
+    if(command_list->frozen) {
+        submission = command_list_submit_frozen(command_list, stream, waits, &layout, query_pool, instance_data, instance_count, device);
+    } else {
+        unsigned long long instance_size;
+        command_list_get_instance_size_extern(command_list, &instance_size);
+
+        // The stream's thread records later, so it gets its own copy of the stages and the instance data
+        std::vector<struct Stage> stages = command_list->stages;
+        std::vector<char> data(instance_data, instance_data + instance_size * instance_count);
+
+        submission = stream->record([stages, layout, query_pool, data, instance_count, device](vk::CommandBuffer& cmd_buffer) mutable {
+            struct RecordState state;
+            command_list_record_instances(stages, &layout, query_pool, cmd_buffer, data.data(), instance_count, device, &state);
+        }, waits);
+    }
+
+    command_list_set_submitted(command_list, device, buffers, stream, submission, layout.slot);
+
+    *submit_stream = stream;
+
+    return submission;
+}
+
+struct Future* command_list_submit_async_extern(struct CommandList* command_list, void* instance_buffer, unsigned int instance_count, int* devices, int device_count, int* submission_thread_counts) {
+    // Submits of one list from several threads take turns using its parameters buffers and query pools
+    std::unique_lock<std::mutex> lock(command_list->mutex);
+
+    unsigned long long instance_size;
+    command_list_get_instance_size_extern(command_list, &instance_size);
+
+    struct Future* future = future_create_extern(command_list->ctx);
+    char* instance_data = (char*)instance_buffer;
+    unsigned int instance_start = 0;
+
+    // Every device gets a contiguous shard of the instances, all shards are submitted before any is waited on
+    for(int i = 0; i < device_count; i++) {
+        unsigned int shard_count = instance_count / device_count + (i < instance_count % device_count ? 1 : 0);
+
+        // Devices past the last instance get no shard, there is nothing to record or submit for them
+        if(shard_count == 0)
+            continue;
+
+        Stream* stream;
+        uint64_t submission = command_list_submit_device(command_list, instance_data + instance_start * instance_size, shard_count, devices[i], &stream);
+        future_add_submission(future, stream, submission);
+
+        instance_start += shard_count;
+    }
+
+    return future;
+}
+
+void command_list_submit_extern(struct CommandList* command_list, void* instance_buffer, unsigned int instance_count, int* devices, int device_count, int* submission_thread_counts) {
+    struct Future* future = command_list_submit_async_extern(command_list, instance_buffer, instance_count, devices, device_count, submission_thread_counts);
+
+    // A sharded submit returns once every device has finished its shard
+    if(device_count > 1)
+        future_wait_extern(future, UINT64_MAX);
+
+    future_destroy_extern(future);
+}
+
+struct Future* command_list_submit_all_extern(struct CommandList** command_lists, int list_count, void** instance_buffers, unsigned int* instance_counts, int device) {
+    LOG_INFO("Submitting %d command lists to device %d", list_count, device);
+
+    struct Context* ctx = command_lists[0]->ctx;
+
+    // Locking in address order keeps two threads submitting overlapping sets of lists from deadlocking
+    std::vector<struct CommandList*> locked(command_lists, command_lists + list_count);
+    std::sort(locked.begin(), locked.end());
+
+    std::vector<std::unique_lock<std::mutex>> locks;
+
+    for(struct CommandList* command_list : locked)
+        locks.emplace_back(command_list->mutex);
+
+    struct Future* future = future_create_extern(ctx);
+    Stream* stream = context_next_stream(ctx, device);
+
+    std::vector<struct ParamsLayout> layouts(list_count);
+    std::vector<vk::QueryPool> query_pools(list_count);
+    std::vector<std::vector<struct Stage>> stages(list_count);
+    std::vector<std::vector<char>> datas(list_count);
+    std::vector<unsigned int> counts(instance_counts, instance_counts + list_count);
+
+    std::vector<struct Buffer*> buffers;
+    std::vector<struct StreamSubmission> waits;
+
+    // A declared dependency on an earlier list of the batch is not covered by the waits, which only see the
+    // dependency's previous submit, nor by the barriers, which only follow shared buffers. Such lists get a full
+    // barrier in front of them instead. Dependencies on later lists are rejected by the Python side.
+    std::vector<bool> barriers(list_count, false);
+
+    for(int i = 0; i < list_count; i++) {
+        for(int j = 0; j < i && !barriers[i]; j++)
+            barriers[i] = std::find(command_lists[i]->dependencies.begin(), command_lists[i]->dependencies.end(), command_lists[j]) != command_lists[i]->dependencies.end();
+    }
+
+    for(int i = 0; i < list_count; i++) {
+        struct CommandList* command_list = command_lists[i];
+        char* instance_data = (char*)instance_buffers[i];
+
+        command_list_get_params_layout(command_list, device, &layouts[i]);
+        command_list_upload_params(command_list, &layouts[i], instance_data, instance_counts[i], device);
+
+        if(command_list->profiling) {
+            command_list_prepare_queries(command_list, instance_counts[i], device);
+            query_pools[i] = command_list->queryPools[device];
+        }
+
+        command_list_get_waits(command_list, device, buffers, waits);
+
+        unsigned long long instance_size;
+        command_list_get_instance_size_extern(command_list, &instance_size);
+
+        stages[i] = command_list->stages;
+        datas[i].assign(instance_data, instance_data + instance_size * instance_counts[i]);
+    }
+
+    // All lists go into one command buffer and one queue submit, with barriers only where they share buffers or
+    // depend on each other. Frozen lists are recorded again like any other, their frozen recordings are not reused.
+    uint64_t submission = stream->record([stages, layouts, query_pools, datas, counts, barriers, list_count, device](vk::CommandBuffer& cmd_buffer) mutable {
+        struct RecordState state;
+
+        // A barrier clears the pending writes, so it has to block the stage kinds of every list in the batch,
+        // including the lists that are recorded after it
+        for(int i = 0; i < list_count; i++) {
+            for(size_t j = 0; j < stages[i].size(); j++)
+                state.list_stages |= stages[i][j].stage;
+        }
+
+        for(int i = 0; i < list_count; i++) {
+            if(barriers[i]) {
+                vk::MemoryBarrier memory_barrier = vk::MemoryBarrier()
+                    .setSrcAccessMask(vk::AccessFlagBits::eMemoryWrite)
+                    .setDstAccessMask(vk::AccessFlagBits::eMemoryRead | vk::AccessFlagBits::eMemoryWrite);
+
+                cmd_buffer.pipelineBarrier(
+                    vk::PipelineStageFlagBits::eAllCommands,
+                    vk::PipelineStageFlagBits::eAllCommands,
+                    vk::DependencyFlags(),
+                    1,
+                    &memory_barrier,
+                    0, 0, 0, 0);
+
+                state.pending_reads.clear();
+                state.pending_writes.clear();
+                state.pending_stages = vk::PipelineStageFlags();
+            }
+
+            command_list_record_instances(stages[i], &layouts[i], query_pools[i], cmd_buffer, datas[i].data(), counts[i], device, &state);
+        }
+    }, waits);
+
+    for(int i = 0; i < list_count; i++)
+        command_list_set_submitted(command_lists[i], device, buffers, stream, submission, layouts[i].slot);
+
+    future_add_submission(future, stream, submission);
+
+    return future;
+}
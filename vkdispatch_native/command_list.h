@@ -9,6 +9,20 @@ void command_list_destroy_extern(struct CommandList* command_list);
 void command_list_get_instance_size_extern(struct CommandList* command_list, unsigned long long* instance_size);
 
 void command_list_reset_extern(struct CommandList* command_list);
+
+void command_list_freeze_extern(struct CommandList* command_list);
+void command_list_unfreeze_extern(struct CommandList* command_list);
+
+void command_list_add_dependency_extern(struct CommandList* command_list, struct CommandList* dependency);
+void command_list_clear_dependencies_extern(struct CommandList* command_list);
+
+void command_list_set_profiling_extern(struct CommandList* command_list, int enabled);
+void command_list_get_profile_size_extern(struct CommandList* command_list, int device, unsigned long long* entry_count);
+void command_list_get_profile_extern(struct CommandList* command_list, int device, double* timings);
+
 void command_list_submit_extern(struct CommandList* command_list, void* instance_buffer, unsigned int instanceCount, int* devices, int deviceCount, int* submission_thread_counts);
+struct Future* command_list_submit_async_extern(struct CommandList* command_list, void* instance_buffer, unsigned int instanceCount, int* devices, int deviceCount, int* submission_thread_counts);
+
+struct Future* command_list_submit_all_extern(struct CommandList** command_lists, int list_count, void** instance_buffers, unsigned int* instance_counts, int device);
 
 #endif // SRC_COMMAND_LIST_H
\ No newline at end of file
@@ -9,12 +9,22 @@ from libc.stdlib cimport malloc, free
 cdef extern from "command_list.h":
     struct Context
     struct CommandList
+    struct Future
 
     CommandList* command_list_create_extern(Context* context)
     void command_list_destroy_extern(CommandList* command_list)
     void command_list_get_instance_size_extern(CommandList* command_list, unsigned long long* instance_size)
-    void command_list_reset_extern(CommandList* command_list)
-    void command_list_submit_extern(CommandList* command_list, void* instance_buffer, unsigned int instanceCount, int* devices, int deviceCount, int* submission_thread_counts)
+    void command_list_reset_extern(CommandList* command_list) nogil
+    void command_list_freeze_extern(CommandList* command_list)
+    void command_list_unfreeze_extern(CommandList* command_list)
+    void command_list_add_dependency_extern(CommandList* command_list, CommandList* dependency)
+    void command_list_clear_dependencies_extern(CommandList* command_list)
+    void command_list_set_profiling_extern(CommandList* command_list, int enabled)
+    void command_list_get_profile_size_extern(CommandList* command_list, int device, unsigned long long* entry_count)
+    void command_list_get_profile_extern(CommandList* command_list, int device, double* timings) nogil
+    void command_list_submit_extern(CommandList* command_list, void* instance_buffer, unsigned int instanceCount, int* devices, int deviceCount, int* submission_thread_counts) nogil
+    Future* command_list_submit_async_extern(CommandList* command_list, void* instance_buffer, unsigned int instanceCount, int* devices, int deviceCount, int* submission_thread_counts) nogil
+    Future* command_list_submit_all_extern(CommandList** command_lists, int list_count, void** instance_buffers, unsigned int* instance_counts, int device) nogil
 
 cpdef inline command_list_create(unsigned long long context):
     return <unsigned long long>command_list_create_extern(<Context*>context)
@@ -28,12 +38,96 @@ cpdef inline command_list_get_instance_size(unsigned long long command_list):
     return instance_size
 
 cpdef inline command_list_reset(unsigned long long command_list):
-    command_list_reset_extern(<CommandList*>command_list)
+    cdef CommandList* command_list_c = <CommandList*>command_list
 
-cpdef inline command_list_submit(unsigned long long command_list, bytes data, unsigned int instance_count, int device):
-    cdef int devices[1]
-    devices[0] = device
+    with nogil:
+        command_list_reset_extern(command_list_c)
 
-    cdef const char* data_view = data
+cpdef inline command_list_freeze(unsigned long long command_list):
+    command_list_freeze_extern(<CommandList*>command_list)
 
-    command_list_submit_extern(<CommandList*>command_list, <void*>data_view, instance_count, devices, 1, <int*>0)
+cpdef inline command_list_unfreeze(unsigned long long command_list):
+    command_list_unfreeze_extern(<CommandList*>command_list)
+
+cpdef inline command_list_add_dependency(unsigned long long command_list, unsigned long long dependency):
+    command_list_add_dependency_extern(<CommandList*>command_list, <CommandList*>dependency)
+
+cpdef inline command_list_clear_dependencies(unsigned long long command_list):
+    command_list_clear_dependencies_extern(<CommandList*>command_list)
+
+cpdef inline command_list_set_profiling(unsigned long long command_list, bool enabled):
+    command_list_set_profiling_extern(<CommandList*>command_list, 1 if enabled else 0)
+
+cpdef inline command_list_get_profile(unsigned long long command_list, int device):
+    cdef unsigned long long entry_count
+    command_list_get_profile_size_extern(<CommandList*>command_list, device, &entry_count)
+
+    cdef cnp.ndarray[cnp.float64_t, ndim=1] timings = np.zeros(entry_count, dtype=np.float64)
+    cdef CommandList* command_list_c = <CommandList*>command_list
+    cdef double* timings_c = <double*>timings.data
+
+    with nogil:
+        command_list_get_profile_extern(command_list_c, device, timings_c)
+
+    return timings
+
+cpdef inline command_list_submit(unsigned long long command_list, const unsigned char[::1] data, unsigned int instance_count, list[int] devices):
+    cdef int device_count = len(devices)
+    cdef int* devices_c = <int*>malloc(device_count * sizeof(int))
+
+    for i in range(device_count):
+        devices_c[i] = devices[i]
+
+    cdef const unsigned char* data_view = &data[0] if data.shape[0] > 0 else NULL
+    cdef CommandList* command_list_c = <CommandList*>command_list
+
+    with nogil:
+        command_list_submit_extern(command_list_c, <void*>data_view, instance_count, devices_c, device_count, <int*>0)
+
+    free(devices_c)
+
+cpdef inline command_list_submit_async(unsigned long long command_list, const unsigned char[::1] data, unsigned int instance_count, list[int] devices):
+    cdef int device_count = len(devices)
+    cdef int* devices_c = <int*>malloc(device_count * sizeof(int))
+
+    for i in range(device_count):
+        devices_c[i] = devices[i]
+
+    cdef const unsigned char* data_view = &data[0] if data.shape[0] > 0 else NULL
+    cdef CommandList* command_list_c = <CommandList*>command_list
+    cdef Future* future
+
+    with nogil:
+        future = command_list_submit_async_extern(command_list_c, <void*>data_view, instance_count, devices_c, device_count, <int*>0)
+
+    free(devices_c)
+
+    return <unsigned long long>future
+
+cpdef inline command_list_submit_all(list[unsigned long long] command_lists, list data, list[unsigned int] instance_counts, int device):
+    assert len(command_lists) == len(data) and len(command_lists) == len(instance_counts)
+
+    cdef int list_count = len(command_lists)
+    cdef CommandList** command_lists_c = <CommandList**>malloc(list_count * sizeof(CommandList*))
+    cdef void** data_c = <void**>malloc(list_count * sizeof(void*))
+    cdef unsigned int* instance_counts_c = <unsigned int*>malloc(list_count * sizeof(unsigned int))
+    cdef const unsigned char[::1] data_view
+
+    # The data list keeps every buffer alive while the native side reads it
+    for i in range(list_count):
+        data_view = data[i]
+
+        command_lists_c[i] = <CommandList*><unsigned long long>command_lists[i]
+        data_c[i] = <void*>&data_view[0] if data_view.shape[0] > 0 else NULL
+        instance_counts_c[i] = instance_counts[i]
+
+    cdef Future* future
+
+    with nogil:
+        future = command_list_submit_all_extern(command_lists_c, list_count, data_c, instance_counts_c, device)
+
+    free(command_lists_c)
+    free(data_c)
+    free(instance_counts_c)
+
+    return <unsigned long long>future
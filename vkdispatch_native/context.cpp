@@ -1,7 +1,7 @@
 #include "internal.h"
 #include <vector>
 
-struct Context* context_create_extern(int* device_indicies, int* submission_thread_couts, int device_count) {
+struct Context* context_create_extern(int* device_indicies, int* submission_thread_couts, int device_count, int stream_depth, unsigned long long staging_size, int staging_slices) {
     LOG_INFO("Creating context with %d devices", device_count);
 
     struct Context* ctx = new struct Context();
@@ -14,9 +14,10 @@ struct Context* context_create_extern(int* device_indicies, int* submission_thre
     for(int i = 0; i < device_count; i++) {
         auto physical = physicalDevices[device_indicies[i]];
 
-        vk::StructureChain<vk::PhysicalDeviceFeatures2, vk::PhysicalDeviceShaderAtomicFloatFeaturesEXT> featuresChainQuery = {
+        vk::StructureChain<vk::PhysicalDeviceFeatures2, vk::PhysicalDeviceShaderAtomicFloatFeaturesEXT, vk::PhysicalDeviceTimelineSemaphoreFeatures> featuresChainQuery = {
             vk::PhysicalDeviceFeatures2(),
-            vk::PhysicalDeviceShaderAtomicFloatFeaturesEXT()
+            vk::PhysicalDeviceShaderAtomicFloatFeaturesEXT(),
+            vk::PhysicalDeviceTimelineSemaphoreFeatures()
         };
 
         physical.getFeatures2(&featuresChainQuery.get<vk::PhysicalDeviceFeatures2>());
@@ -28,6 +29,11 @@ struct Context* context_create_extern(int* device_indicies, int* submission_thre
             return nullptr;
         }
 
+        if(!featuresChainQuery.get<vk::PhysicalDeviceTimelineSemaphoreFeatures>().timelineSemaphore) {
+            LOG_ERROR("Device does not support timelineSemaphore");
+            return nullptr;
+        }
+
         ctx->physicalDevices.push_back(physical);
 
         LOG_INFO("Creating physical device %p...", static_cast<VkPhysicalDevice>(ctx->physicalDevices[i]));
@@ -54,14 +60,51 @@ struct Context* context_create_extern(int* device_indicies, int* submission_thre
 
         LOG_INFO("Queue Family Index: %d", foundIndex);
 
-        float queue_priority = 1.0f;
+        int stream_count = submission_thread_couts[i] > 0 ? submission_thread_couts[i] : 1;
+        int queue_count = std::min((int)queue_family_properties[foundIndex].queueCount, stream_count);
 
-        
+        LOG_INFO("Creating %d streams on %d queues", stream_count, queue_count);
+
+        // Buffer transfers prefer a family that can only copy, which usually maps to the DMA engines
+        int transferIndex = -1;
+
+        for(int queueIndex = 0; queueIndex < queue_family_properties.size(); queueIndex++) {
+            vk::QueueFlags flags = queue_family_properties[queueIndex].queueFlags;
+
+            if((flags & vk::QueueFlagBits::eTransfer) && !(flags & vk::QueueFlagBits::eCompute) && !(flags & vk::QueueFlagBits::eGraphics)) {
+                transferIndex = queueIndex;
+                break;
+            }
+        }
+
+        // Without one, transfers get a spare queue of the compute family or share its first queue
+        int transfer_queue_index = 0;
+        int compute_queue_count = queue_count;
+
+        if(transferIndex == -1) {
+            transferIndex = foundIndex;
+
+            if(queue_family_properties[foundIndex].queueCount > queue_count) {
+                transfer_queue_index = queue_count;
+                compute_queue_count = queue_count + 1;
+            }
+        }
+
+        LOG_INFO("Transfer Queue Family Index: %d", transferIndex);
 
-        vk::DeviceQueueCreateInfo queueCreateInfo = vk::DeviceQueueCreateInfo()
+        std::vector<float> queue_priorities(compute_queue_count, 1.0f);
+        std::vector<vk::DeviceQueueCreateInfo> queueCreateInfos;
+
+        queueCreateInfos.push_back(vk::DeviceQueueCreateInfo()
             .setQueueFamilyIndex(foundIndex)
-            .setQueueCount(1)
-            .setPQueuePriorities(&queue_priority);
+            .setQueuePriorities(queue_priorities));
+
+        if(transferIndex != foundIndex) {
+            queueCreateInfos.push_back(vk::DeviceQueueCreateInfo()
+                .setQueueFamilyIndex(transferIndex)
+                .setQueueCount(1)
+                .setPQueuePriorities(queue_priorities.data()));
+        }
 
         std::vector<const char*> desiredExtensions =  {
             "VK_KHR_shader_non_semantic_info",
@@ -95,22 +138,62 @@ struct Context* context_create_extern(int* device_indicies, int* submission_thre
             LOG_INFO("Device Extension: %s", extension.extensionName);
         }
 
-        vk::StructureChain<vk::DeviceCreateInfo, vk::PhysicalDeviceFeatures2, vk::PhysicalDeviceShaderAtomicFloatFeaturesEXT> deviceCreateChain = {
+        vk::StructureChain<vk::DeviceCreateInfo, vk::PhysicalDeviceFeatures2, vk::PhysicalDeviceShaderAtomicFloatFeaturesEXT, vk::PhysicalDeviceTimelineSemaphoreFeatures> deviceCreateChain = {
             vk::DeviceCreateInfo()
-                .setQueueCreateInfoCount(1)
-                .setPQueueCreateInfos(&queueCreateInfo)
+                .setQueueCreateInfos(queueCreateInfos)
                 .setPEnabledExtensionNames(desiredExtensions),
             vk::PhysicalDeviceFeatures2(),
             vk::PhysicalDeviceShaderAtomicFloatFeaturesEXT()
-                .setShaderBufferFloat32AtomicAdd(VK_TRUE)
+                .setShaderBufferFloat32AtomicAdd(VK_TRUE),
+            vk::PhysicalDeviceTimelineSemaphoreFeatures()
+                .setTimelineSemaphore(VK_TRUE)
         };
 
         ctx->devices.push_back(ctx->physicalDevices[i].createDevice(deviceCreateChain.get<vk::DeviceCreateInfo>()));
 
         LOG_INFO("Created device %p", static_cast<VkDevice>(ctx->devices[i]));
 
-        ctx->streams.push_back(new Stream(ctx->devices[i], ctx->devices[i].getQueue(foundIndex, 0), foundIndex, 2));
-        ctx->submissionThreadCounts.push_back(submission_thread_couts[i]);
+        std::vector<std::mutex*> queue_mutexes;
+
+        for(int queue_index = 0; queue_index < queue_count; queue_index++) {
+            queue_mutexes.push_back(new std::mutex());
+            ctx->queueMutexes.push_back(queue_mutexes[queue_index]);
+        }
+
+        // Streams are spread over the queues round robin, streams sharing a queue also share its mutex
+        ctx->streams.push_back(std::vector<Stream*>());
+
+        for(int stream_index = 0; stream_index < stream_count; stream_index++) {
+            int queue_index = stream_index % queue_count;
+
+            ctx->streams[i].push_back(new Stream(
+                ctx->devices[i],
+                ctx->devices[i].getQueue(foundIndex, queue_index),
+                foundIndex,
+                queue_mutexes[queue_index],
+                stream_depth
+            ));
+        }
+
+        std::mutex* transfer_mutex = queue_mutexes[0];
+
+        if(transferIndex != foundIndex || transfer_queue_index != 0) {
+            transfer_mutex = new std::mutex();
+            ctx->queueMutexes.push_back(transfer_mutex);
+        }
+
+        ctx->transferStreams.push_back(new Stream(
+            ctx->devices[i],
+            ctx->devices[i].getQueue(transferIndex, transfer_queue_index),
+            transferIndex,
+            transfer_mutex,
+            stream_depth
+        ));
+
+        ctx->watchers.push_back(new FutureWatcher(ctx->devices[i]));
+
+        ctx->nextStreams.push_back(0);
+        ctx->submissionThreadCounts.push_back(stream_count);
 
         VmaVulkanFunctions vmaVulkanFunctions = {};
         vmaVulkanFunctions.vkGetInstanceProcAddr = reinterpret_cast<PFN_vkGetInstanceProcAddr>(
@@ -131,6 +214,9 @@ struct Context* context_create_extern(int* device_indicies, int* submission_thre
         VK_CALL(vmaCreateAllocator(&allocatorCreateInfo, &allocator));
         ctx->allocators.push_back(allocator);
 
+        // With several slices the host copies one chunk while the previous chunk's transfer is still running
+        ctx->stagingRings.push_back(staging_ring_create(ctx, i, staging_size, staging_slices));
+
         LOG_INFO("Created allocator %p", ctx->allocators[i]);
     }
 
@@ -140,17 +226,118 @@ struct Context* context_create_extern(int* device_indicies, int* submission_thre
 }
 
 void context_destroy_extern(struct Context* ctx) {
+    // Resources whose destruction was deferred are freed once all work on the device has finished
     for (int i = 0; i < ctx->deviceCount; i++) {
+        context_wait_idle(ctx, i);
+        ctx->transferStreams[i]->wait_idle();
+    }
+
+    context_collect_deferred(ctx);
+
+    for (int i = 0; i < ctx->deviceCount; i++) {
+        staging_ring_destroy(ctx, i, ctx->stagingRings[i]);
         vmaDestroyAllocator(ctx->allocators[i]);
-        ctx->streams[i]->destroy();
-        delete ctx->streams[i];
+
+        // The watcher waits on the stream timelines, so it stops before they are destroyed
+        ctx->watchers[i]->destroy();
+        delete ctx->watchers[i];
+
+        for(int j = 0; j < ctx->streams[i].size(); j++) {
+            ctx->streams[i][j]->destroy();
+            delete ctx->streams[i][j];
+        }
+
+        ctx->transferStreams[i]->destroy();
+        delete ctx->transferStreams[i];
+
         ctx->devices[i].destroy();
     }
 
+    for(int i = 0; i < ctx->queueMutexes.size(); i++) {
+        delete ctx->queueMutexes[i];
+    }
+
     ctx->devices.clear();
     ctx->streams.clear();
+    ctx->transferStreams.clear();
+    ctx->watchers.clear();
+    ctx->stagingRings.clear();
+    ctx->nextStreams.clear();
+    ctx->queueMutexes.clear();
     ctx->submissionThreadCounts.clear();
     ctx->allocators.clear();
     
     delete ctx;
-}
\ No newline at end of file
+}
+
+Stream* context_next_stream(struct Context* ctx, int device) {
+    std::unique_lock<std::mutex> lock(ctx->mutex);
+
+    int index = ctx->nextStreams[device];
+    ctx->nextStreams[device] = (index + 1) % ctx->streams[device].size();
+
+    return ctx->streams[device][index];
+}
+
+void context_wait_idle(struct Context* ctx, int device) {
+    for(int i = 0; i < ctx->streams[device].size(); i++) {
+        ctx->streams[device][i]->wait_idle();
+    }
+}
+
+void context_get_submitted(struct Context* ctx, std::vector<struct StreamSubmission>& waits) {
+    for(int i = 0; i < ctx->deviceCount; i++) {
+        std::vector<Stream*> streams = ctx->streams[i];
+        streams.push_back(ctx->transferStreams[i]);
+
+        for(Stream* stream : streams) {
+            uint64_t submission;
+
+            {
+                std::unique_lock<std::mutex> lock(stream->mutex);
+                submission = stream->submission_count;
+            }
+
+            stream_add_wait(waits, {stream, submission});
+        }
+    }
+}
+
+void context_defer_destroy(struct Context* ctx, std::vector<struct StreamSubmission> waits, std::function<void()> destroy) {
+    {
+        std::unique_lock<std::mutex> lock(ctx->deferred_mutex);
+        ctx->deferred.push_back({std::move(waits), std::move(destroy)});
+    }
+
+    // Even a resource that is already unused goes through the queue, so it is never freed before older entries
+    context_collect_deferred(ctx);
+}
+
+void context_collect_deferred(struct Context* ctx) {
+    std::unique_lock<std::mutex> lock(ctx->deferred_mutex);
+
+    std::vector<bool> done(ctx->deferred.size(), true);
+
+    // Checked from the newest entry to the oldest. Submissions only ever complete, so once an entry is found
+    // done, every older entry that waits on a subset of its submissions is found done as well. A buffer pool
+    // waits on everything submitted before it was destroyed, so it is never freed before its buffers.
+    for(int i = (int)ctx->deferred.size() - 1; i >= 0; i--) {
+        for(struct StreamSubmission& wait : ctx->deferred[i].waits) {
+            if(!wait.stream->done(wait.submission)) {
+                done[i] = false;
+                break;
+            }
+        }
+    }
+
+    std::vector<struct DeferredDestroy> pending;
+
+    for(int i = 0; i < ctx->deferred.size(); i++) {
+        if(done[i])
+            ctx->deferred[i].destroy();
+        else
+            pending.push_back(std::move(ctx->deferred[i]));
+    }
+
+    ctx->deferred = std::move(pending);
+}
@@ -3,7 +3,7 @@
 
 #include "base.h"
 
-struct Context* context_create_extern(int* device_indicies, int* submission_thread_couts, int device_count);
+struct Context* context_create_extern(int* device_indicies, int* submission_thread_couts, int device_count, int stream_depth, unsigned long long staging_size, int staging_slices);
 void context_destroy_extern(struct Context* context);
 
 #endif  // SRC_DEVICE_CONTEXT_H_
\ No newline at end of file
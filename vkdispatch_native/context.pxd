@@ -9,10 +9,10 @@ from libc.stdlib cimport malloc, free
 cdef extern from "context.h":
     struct Context
 
-    Context* context_create_extern(int* device_indicies, int* submission_thread_couts, int device_count)
-    void context_destroy_extern(Context* device_context);
+    Context* context_create_extern(int* device_indicies, int* submission_thread_couts, int device_count, int stream_depth, unsigned long long staging_size, int staging_slices)
+    void context_destroy_extern(Context* device_context) nogil
 
-cpdef inline context_create(list[int] device_indicies, list[int] submission_thread_counts):
+cpdef inline context_create(list[int] device_indicies, list[int] submission_thread_counts, int stream_depth, unsigned long long staging_size, int staging_slices):
     assert len(device_indicies) == len(submission_thread_counts)
 
     cdef int len_device_indicies = len(device_indicies)
@@ -23,7 +23,7 @@ cpdef inline context_create(list[int] device_indicies, list[int] submission_thre
         device_indicies_c[i] = device_indicies[i]
         submission_thread_counts_c[i] = submission_thread_counts[i]
 
-    cdef unsigned long long result = <unsigned long long>context_create_extern(device_indicies_c, submission_thread_counts_c, len_device_indicies)
+    cdef unsigned long long result = <unsigned long long>context_create_extern(device_indicies_c, submission_thread_counts_c, len_device_indicies, stream_depth, staging_size, staging_slices)
 
     free(device_indicies_c)
     free(submission_thread_counts_c)
@@ -31,4 +31,8 @@ cpdef inline context_create(list[int] device_indicies, list[int] submission_thre
     return result
 
 cpdef inline context_destroy(unsigned long long context):
-    context_destroy_extern(<Context*>context)
\ No newline at end of file
+    cdef Context* ctx = <Context*>context
+
+    # Waits for the devices to go idle, and for the future watchers whose callbacks may need the GIL
+    with nogil:
+        context_destroy_extern(ctx)
\ No newline at end of file
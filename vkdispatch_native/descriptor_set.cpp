@@ -1,8 +1,11 @@
 #include "internal.h"
 
 struct DescriptorSet* descriptor_set_create_extern(struct ComputePlan* plan) {
+    context_collect_deferred(plan->ctx);
+
     struct DescriptorSet* descriptor_set = new struct DescriptorSet();
     descriptor_set->plan = plan;
+    descriptor_set->boundBuffers.resize(plan->binding_count, NULL);
 
     for (int i = 0; i < plan->ctx->deviceCount; i++) {
         descriptor_set->pools.push_back(plan->ctx->devices[i].createDescriptorPool(
@@ -17,28 +20,47 @@ struct DescriptorSet* descriptor_set_create_extern(struct ComputePlan* plan) {
             .setSetLayouts(plan->descriptorSetLayouts[i])
             .setDescriptorSetCount(1)
         )[0]);
+
+        descriptor_set->paramsBuffers.push_back(vk::Buffer());
     }
 
     return descriptor_set;
 }
 
 void descriptor_set_destroy_extern(struct DescriptorSet* descriptor_set) {
-    /*
+    struct Context* ctx = descriptor_set->plan->ctx;
 
-    for (int i = 0; i < descriptor_set->plan->ctx->deviceCount; i++) {
-        delete descriptor_set->descriptorSets[i];
-    }
+    // Command buffers that bind the set may still be pending on any stream of the device
+    std::vector<struct StreamSubmission> waits;
+    context_get_submitted(ctx, waits);
+
+    context_defer_destroy(ctx, waits, [ctx, descriptor_set]() {
+        for (int i = 0; i < ctx->deviceCount; i++) {
+            ctx->devices[i].destroyDescriptorPool(descriptor_set->pools[i]);
+        }
 
-    delete[] descriptor_set->descriptorSets;
-    delete descriptor_set;
-    */
+        delete descriptor_set;
+    });
 }
 
-void descriptor_set_write_buffer_extern(struct DescriptorSet* descriptor_set, unsigned int binding, void* object) {
+void descriptor_set_write_buffer_extern(struct DescriptorSet* descriptor_set, unsigned int binding, void* object, unsigned long long offset, unsigned long long range) {
     struct Context* ctx = (struct Context*)descriptor_set->plan->ctx;
     struct Buffer* buffer = (struct Buffer*)object;
 
-    for (int i = 0; i < descriptor_set->plan->ctx->deviceCount; i++) {
+    // Views into a larger buffer are bound with their offset, which the device requires to be aligned.
+    // The Python side checks it first, writing a misaligned offset is invalid usage.
+    for (int i = 0; i < ctx->deviceCount; i++) {
+        unsigned long long alignment = ctx->physicalDevices[i].getProperties().limits.minStorageBufferOffsetAlignment;
+
+        if(offset % alignment != 0) {
+            LOG_ERROR("Buffer offset %llu is not a multiple of the storage buffer offset alignment %llu", offset, alignment);
+            return;
+        }
+    }
+
+    descriptor_set->boundBuffers[binding] = buffer;
+
+    for (int i = 0; i < ctx->deviceCount; i++) {
         ctx->devices[i].updateDescriptorSets(
             vk::WriteDescriptorSet()
             .setDstSet(descriptor_set->sets[i])
@@ -47,8 +69,8 @@ void descriptor_set_write_buffer_extern(struct DescriptorSet* descriptor_set, un
             .setBufferInfo(
                 vk::DescriptorBufferInfo()
                 .setBuffer(buffer->buffers[i])
-                .setOffset(0)
-                .setRange(VK_WHOLE_SIZE)
+                .setOffset(offset)
+                .setRange(range == 0 ? VK_WHOLE_SIZE : range)
             ), nullptr
         );
     }
@@ -6,7 +6,7 @@
 struct DescriptorSet* descriptor_set_create_extern(struct ComputePlan* plan);
 void descriptor_set_destroy_extern(struct DescriptorSet* descriptor_set);
 
-void descriptor_set_write_buffer_extern(struct DescriptorSet* descriptor_set, unsigned int binding, void* object);
+void descriptor_set_write_buffer_extern(struct DescriptorSet* descriptor_set, unsigned int binding, void* object, unsigned long long offset, unsigned long long range);
 
 
 #endif // SRC_DESCRIPTOR_SET_H
\ No newline at end of file
@@ -13,7 +13,7 @@ cdef extern from "descriptor_set.h":
     DescriptorSet* descriptor_set_create_extern(ComputePlan* plan)
     void descriptor_set_destroy_extern(DescriptorSet* descriptor_set)
 
-    void descriptor_set_write_buffer_extern(DescriptorSet* descriptor_set, unsigned int binding, void* object)
+    void descriptor_set_write_buffer_extern(DescriptorSet* descriptor_set, unsigned int binding, void* object, unsigned long long offset, unsigned long long range)
 
 cpdef inline descriptor_set_create(unsigned long long plan):
     cdef ComputePlan* p = <ComputePlan*>plan
@@ -22,6 +22,6 @@ cpdef inline descriptor_set_create(unsigned long long plan):
 cpdef inline descriptor_set_destroy(unsigned long long descriptor_set):
     descriptor_set_destroy_extern(<DescriptorSet*>descriptor_set)
 
-cpdef inline descriptor_set_write_buffer(unsigned long long descriptor_set, unsigned int binding, unsigned long long object):
+cpdef inline descriptor_set_write_buffer(unsigned long long descriptor_set, unsigned int binding, unsigned long long object, unsigned long long offset, unsigned long long range):
     cdef DescriptorSet* ds = <DescriptorSet*>descriptor_set
-    descriptor_set_write_buffer_extern(ds, binding, <void*>object)
+    descriptor_set_write_buffer_extern(ds, binding, <void*>object, offset, range)
@@ -0,0 +1,173 @@
+#include "internal.h"
+
+#include <chrono>
+
+struct Future* future_create_extern(struct Context* context) {
+    struct Future* future = new struct Future();
+    future->ctx = context;
+
+    return future;
+}
+
+void future_destroy_extern(struct Future* future) {
+    delete future;
+}
+
+void future_add_submission(struct Future* future, struct Stream* stream, uint64_t submission) {
+    future->streams.push_back(stream);
+    future->submissions.push_back(submission);
+}
+
+int future_done_extern(struct Future* future) {
+    for(int i = 0; i < future->streams.size(); i++) {
+        if(!future->streams[i]->done(future->submissions[i]))
+            return 0;
+    }
+
+    return 1;
+}
+
+int future_wait_extern(struct Future* future, unsigned long long timeout) {
+    auto deadline = std::chrono::steady_clock::now() + std::chrono::nanoseconds(timeout);
+
+    for(int i = 0; i < future->streams.size(); i++) {
+        uint64_t remaining = UINT64_MAX;
+
+        if(timeout != UINT64_MAX) {
+            auto now = std::chrono::steady_clock::now();
+            remaining = now < deadline ? std::chrono::duration_cast<std::chrono::nanoseconds>(deadline - now).count() : 0;
+        }
+
+        if(!future->streams[i]->wait(future->submissions[i], remaining))
+            return 0;
+    }
+
+    return 1;
+}
+
+FutureWatcher::FutureWatcher(vk::Device device) {
+    this->device = device;
+    this->wake_value = 0;
+    this->running = true;
+
+    vk::SemaphoreTypeCreateInfo timelineInfo = vk::SemaphoreTypeCreateInfo()
+        .setSemaphoreType(vk::SemaphoreType::eTimeline)
+        .setInitialValue(0);
+
+    // Signaled from the host to interrupt the worker whenever the watched set changes
+    this->wake = device.createSemaphore(vk::SemaphoreCreateInfo().setPNext(&timelineInfo));
+
+    this->worker = std::thread(&FutureWatcher::thread_worker, this);
+}
+
+void FutureWatcher::destroy() {
+    {
+        std::unique_lock<std::mutex> lock(mutex);
+        running = false;
+        wake_value += 1;
+
+        device.signalSemaphore(vk::SemaphoreSignalInfo().setSemaphore(wake).setValue(wake_value));
+    }
+
+    worker.join();
+
+    device.destroySemaphore(wake);
+
+    // Callbacks that never fired are still called once, with a status of 0, so
+    // the caller can release whatever it passed as user data
+    for(struct WatchEntry& entry : entries) {
+        entry.callback->cancelled = true;
+
+        if(--entry.callback->remaining == 0) {
+            entry.callback->callback(entry.callback->user_data, 0);
+            delete entry.callback;
+        }
+    }
+
+    entries.clear();
+}
+
+void FutureWatcher::watch(struct WatchEntry entry) {
+    std::unique_lock<std::mutex> lock(mutex);
+
+    entries.push_back(entry);
+    wake_value += 1;
+
+    device.signalSemaphore(vk::SemaphoreSignalInfo().setSemaphore(wake).setValue(wake_value));
+}
+
+void FutureWatcher::thread_worker() {
+    uint64_t seen_value = 0;
+
+    while(true) {
+        std::vector<vk::Semaphore> semaphores = {wake};
+        std::vector<uint64_t> values = {seen_value + 1};
+
+        {
+            std::unique_lock<std::mutex> lock(mutex);
+
+            if(!running)
+                return;
+
+            for(struct WatchEntry& entry : entries) {
+                semaphores.push_back(entry.stream->timeline);
+                values.push_back(entry.submission);
+            }
+        }
+
+        // Sleeps until any watched submission completes or the watched set changes
+        device.waitSemaphores(
+            vk::SemaphoreWaitInfo()
+            .setFlags(vk::SemaphoreWaitFlagBits::eAny)
+            .setSemaphores(semaphores)
+            .setValues(values)
+        , UINT64_MAX);
+
+        seen_value = device.getSemaphoreCounterValue(wake);
+
+        std::vector<struct FutureCallback*> finished;
+
+        {
+            std::unique_lock<std::mutex> lock(mutex);
+
+            for(int i = 0; i < entries.size(); i++) {
+                if(device.getSemaphoreCounterValue(entries[i].stream->timeline) < entries[i].submission)
+                    continue;
+
+                if(--entries[i].callback->remaining == 0)
+                    finished.push_back(entries[i].callback);
+
+                entries.erase(entries.begin() + i);
+                i--;
+            }
+        }
+
+        for(struct FutureCallback* callback : finished) {
+            callback->callback(callback->user_data, callback->cancelled ? 0 : 1);
+            delete callback;
+        }
+    }
+}
+
+void future_notify_extern(struct Future* future, void (*callback)(void*, int), void* user_data) {
+    struct FutureCallback* future_callback = new struct FutureCallback();
+    future_callback->callback = callback;
+    future_callback->user_data = user_data;
+    future_callback->remaining = future->streams.size();
+    future_callback->cancelled = false;
+
+    if(future_callback->remaining == 0) {
+        callback(user_data, 1);
+        delete future_callback;
+        return;
+    }
+
+    for(int i = 0; i < future->streams.size(); i++) {
+        for(int device = 0; device < future->ctx->deviceCount; device++) {
+            if(future->ctx->devices[device] != future->streams[i]->device)
+                continue;
+
+            future->ctx->watchers[device]->watch({future->streams[i], future->submissions[i], future_callback});
+        }
+    }
+}
@@ -0,0 +1,14 @@
+#ifndef SRC_FUTURE_H
+#define SRC_FUTURE_H
+
+#include "base.h"
+
+struct Future* future_create_extern(struct Context* context);
+void future_destroy_extern(struct Future* future);
+
+int future_done_extern(struct Future* future);
+int future_wait_extern(struct Future* future, unsigned long long timeout);
+
+void future_notify_extern(struct Future* future, void (*callback)(void*, int), void* user_data);
+
+#endif // SRC_FUTURE_H
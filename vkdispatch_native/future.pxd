@@ -0,0 +1,51 @@
+# distutils: language=c++
+import numpy as np
+cimport numpy as cnp
+from libcpp cimport bool
+import sys
+import traceback
+
+from libc.stdlib cimport malloc, free
+from cpython.ref cimport PyObject, Py_INCREF, Py_DECREF
+
+cdef extern from "future.h":
+    struct Context
+    struct Future
+
+    Future* future_create_extern(Context* context)
+    void future_destroy_extern(Future* future)
+
+    int future_done_extern(Future* future)
+    int future_wait_extern(Future* future, unsigned long long timeout) nogil
+
+    void future_notify_extern(Future* future, void (*callback)(void*, int) noexcept, void* user_data)
+
+cpdef inline future_destroy(unsigned long long future):
+    future_destroy_extern(<Future*>future)
+
+cpdef inline future_done(unsigned long long future):
+    return future_done_extern(<Future*>future) != 0
+
+cpdef inline future_wait(unsigned long long future, unsigned long long timeout):
+    cdef Future* future_c = <Future*>future
+    cdef int result
+
+    with nogil:
+        result = future_wait_extern(future_c, timeout)
+
+    return result != 0
+
+cdef inline void future_notify_callback(void* user_data, int status) noexcept with gil:
+    callback = <object>user_data
+
+    # Runs on the native watcher thread, where an exception has nowhere to propagate to
+    try:
+        callback(status != 0)
+    except BaseException:
+        traceback.print_exc()
+    finally:
+        Py_DECREF(callback)
+
+cpdef inline future_notify(unsigned long long future, object callback):
+    Py_INCREF(callback)
+    future_notify_extern(<Future*>future, future_notify_callback, <void*>callback)
@@ -316,6 +316,8 @@ void init_extern(bool debug) {
 
         _instance.devices[i].max_compute_shared_memory_size = properties.limits.maxComputeSharedMemorySize;
 
+        _instance.devices[i].min_storage_buffer_offset_alignment = properties.limits.minStorageBufferOffsetAlignment;
+
         //printf("Device %d: %s\n", i, _instance.devices[i].device_name);
         //printf("Atomics: %d\n", atomicFloatFeatures.shaderBufferFloat32Atomics);
         //printf("Atomics Add: %d\n", atomicFloatFeatures.shaderBufferFloat32AtomicAdd);
@@ -40,6 +40,8 @@ struct PhysicalDeviceProperties {
     unsigned int quad_operations_in_all_stages;
 
     unsigned int max_compute_shared_memory_size;
+
+    unsigned long long min_storage_buffer_offset_alignment;
 };
 
 void init_extern(bool debug);
@@ -44,6 +44,8 @@ cdef extern from "init.h":
         unsigned int quad_operations_in_all_stages
 
         unsigned int max_compute_shared_memory_size
+
+        unsigned long long min_storage_buffer_offset_alignment
     
     void init_extern(bool debug)
     PhysicalDeviceProperties* get_devices_extern(int* count)
@@ -86,7 +88,8 @@ cpdef inline get_devices():
             device.supported_stages,
             device.supported_operations,
             device.quad_operations_in_all_stages,
-            device.max_compute_shared_memory_size
+            device.max_compute_shared_memory_size,
+            device.min_storage_buffer_offset_alignment
         )
         device_list.append(device_info)
 
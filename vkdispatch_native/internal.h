@@ -26,6 +26,14 @@
 
 #include <vkFFT.h>
 #include <vector>
+#include <deque>
+#include <functional>
+#include <thread>
+#include <mutex>
+#include <condition_variable>
+#include <atomic>
+#include <map>
+#include <memory>
 
 #include <stdarg.h>
 
@@ -99,12 +107,14 @@ inline void log_message_noendl(const char* level, const char* format, ...) {
 #include "init.h"
 #include "context.h"
 #include "buffer.h"
+#include "buffer_pool.h"
 #include "image.h"
 #include "stage_transfer.h"
 #include "stage_fft.h"
 #include "stage_compute.h"
 #include "command_list.h"
 #include "descriptor_set.h"
+#include "future.h"
 
 typedef struct {
     vk::Instance instance;
@@ -113,39 +123,171 @@ typedef struct {
 
 extern MyInstance _instance;
 
+class Stream;
+
+struct StreamSubmission {
+    Stream* stream;
+    uint64_t submission;
+};
+
+void stream_add_wait(std::vector<struct StreamSubmission>& waits, struct StreamSubmission submission);
+
+struct StreamTask {
+    std::function<void(vk::CommandBuffer&)> record;
+    vk::CommandBuffer cmd_buffer;
+    std::vector<struct StreamSubmission> waits;
+    uint64_t submission;
+};
+
 class Stream {
 public:
-    Stream(vk::Device device, vk::Queue queue, int queueFamilyIndex, uint32_t command_buffer_count);
+    Stream(vk::Device device, vk::Queue queue, int queueFamilyIndex, std::mutex* queue_mutex, uint32_t command_buffer_count);
     void destroy();
 
-    vk::CommandBuffer& begin();
-    vk::Fence& submit();
+    uint64_t record(std::function<void(vk::CommandBuffer&)> record_func, std::vector<struct StreamSubmission> waits = {});
+    uint64_t submit(vk::CommandBuffer& cmd_buffer, std::vector<struct StreamSubmission> waits = {});
+
+    bool done(uint64_t submission);
+    bool wait(uint64_t submission, uint64_t timeout);
+    void wait_recorded(uint64_t submission);
+    void wait_idle();
+
+    void thread_worker();
+    uint64_t push_task(struct StreamTask task);
+    void acquire();
+    void enqueue(vk::CommandBuffer& cmd_buffer, uint64_t submission, std::vector<struct StreamSubmission>& waits);
 
     vk::Device device;
     vk::Queue queue;
+    std::mutex* queue_mutex;
+    int queueFamilyIndex;
     vk::CommandPool commandPool;
     std::vector<vk::CommandBuffer> commandBuffers;
-    std::vector<vk::Fence> fences;
-    std::vector<vk::Semaphore> semaphores;
+    vk::Semaphore timeline;
+    std::vector<uint64_t> slot_submissions;
     int current_index;
+
+    std::thread worker;
+    std::mutex mutex;
+    std::condition_variable cv;
+    std::deque<struct StreamTask> tasks;
+    bool running;
+    uint64_t submission_count;
+    uint64_t recorded_count;
+};
+
+struct FutureCallback {
+    void (*callback)(void*, int);
+    void* user_data;
+
+    // Shared by the watchers of every device the future was submitted to
+    std::atomic<int> remaining;
+    std::atomic<bool> cancelled;
+};
+
+struct WatchEntry {
+    Stream* stream;
+    uint64_t submission;
+    struct FutureCallback* callback;
+};
+
+class FutureWatcher {
+public:
+    FutureWatcher(vk::Device device);
+    void destroy();
+
+    void watch(struct WatchEntry entry);
+    void thread_worker();
+
+    vk::Device device;
+    vk::Semaphore wake;
+    uint64_t wake_value;
+
+    std::thread worker;
+    std::mutex mutex;
+    std::vector<struct WatchEntry> entries;
+    bool running;
+};
+
+struct DeferredDestroy {
+    std::vector<struct StreamSubmission> waits;
+    std::function<void()> destroy;
 };
 
 struct Context {
     uint32_t deviceCount;
     std::vector<vk::PhysicalDevice> physicalDevices;
     std::vector<vk::Device> devices;
-    std::vector<Stream*> streams;
+    std::vector<std::vector<Stream*>> streams;
+    std::vector<Stream*> transferStreams;
+    std::vector<FutureWatcher*> watchers;
+    std::vector<struct StagingRing*> stagingRings;
+    std::vector<int> nextStreams;
+    std::vector<std::mutex*> queueMutexes;
     std::vector<VmaAllocator> allocators;
     std::vector<uint32_t> submissionThreadCounts;
+    std::mutex mutex;
+
+    std::vector<struct DeferredDestroy> deferred;
+    std::mutex deferred_mutex;
+};
+
+struct StagingSlice {
+    unsigned long long offset;
+    unsigned long long size;
+    Stream* stream;
+    uint64_t submission;
+    void* readback_dst;
+    unsigned long long readback_size;
 };
 
+struct StagingRing {
+    vk::Buffer buffer;
+    VmaAllocation allocation;
+    char* mapped;
+    unsigned long long size;
+    std::vector<struct StagingSlice> slices;
+    int next_slice;
+    std::mutex mutex;
+};
+
+struct StagingRing* staging_ring_create(struct Context* ctx, int device, unsigned long long size, int slice_count);
+void staging_ring_destroy(struct Context* ctx, int device, struct StagingRing* ring);
+void staging_slice_finish(struct StagingRing* ring, struct StagingSlice* slice);
+struct StagingSlice* staging_ring_acquire(struct StagingRing* ring);
+void staging_ring_flush(struct StagingRing* ring, void* data, unsigned long long size);
+
+Stream* context_next_stream(struct Context* ctx, int device);
+void context_wait_idle(struct Context* ctx, int device);
+void context_get_submitted(struct Context* ctx, std::vector<struct StreamSubmission>& waits);
+void context_defer_destroy(struct Context* ctx, std::vector<struct StreamSubmission> waits, std::function<void()> destroy);
+void context_collect_deferred(struct Context* ctx);
+
 struct Buffer {
     struct Context* ctx;
+    unsigned long long size;
+    struct BufferPool* pool;
+    bool host_visible;
     std::vector<vk::Buffer> buffers;
     std::vector<VmaAllocation> allocations;
-    std::vector<vk::Buffer> stagingBuffers;
-    std::vector<VmaAllocation> stagingAllocations;
-    std::vector<vk::Fence> fences;
+    std::vector<void*> mappings;
+    std::vector<std::vector<struct StreamSubmission>> accesses;
+    std::mutex mutex;
+};
+
+struct Buffer* buffer_allocate(struct Context* context, unsigned long long size, struct BufferPool* pool, bool host_visible);
+void buffer_get_create_info(struct Context* ctx, int device, unsigned long long size, VkBufferCreateInfo* create_info, uint32_t* queue_families);
+void buffer_get_waits(struct Buffer* buffer, int device, std::vector<struct StreamSubmission>& waits);
+void buffer_set_access(struct Buffer* buffer, int device, Stream* stream, uint64_t submission);
+void buffer_wait_device(struct Buffer* buffer, int device);
+
+struct BufferPool {
+    struct Context* ctx;
+    std::vector<VmaPool> pools;
+    std::map<unsigned long long, std::vector<struct Buffer*>> freeBuffers;
+    std::mutex mutex;
+    unsigned long long hits;
+    unsigned long long misses;
 };
 
 struct Image {
@@ -156,18 +298,56 @@ struct Image {
     uint32_t block_size;
 };
 
-typedef void (*PFN_stage_record)(vk::CommandBuffer& cmd_buffer, struct Stage* stage, void* instance_data, int device);
+typedef void (*PFN_stage_record)(vk::CommandBuffer& cmd_buffer, struct Stage* stage, void* instance_data, uint32_t params_offset, int device);
 
 struct Stage {
     PFN_stage_record record;
-    void* user_data;
+
+    // Shared with the copies of the stage that stream threads record from, allocated with malloc
+    std::shared_ptr<void> user_data;
     size_t instance_data_size;
     vk::PipelineStageFlags stage;
+    struct DescriptorSet* params_set;
+    std::vector<struct Buffer*> reads;
+    std::vector<struct Buffer*> writes;
 };
 
 struct CommandList {
     struct Context* ctx;
     std::vector<struct Stage> stages;
+
+    bool frozen;
+    std::vector<vk::CommandPool> frozenPools;
+    std::vector<vk::CommandBuffer> frozenCommandBuffers;
+    std::vector<size_t> frozenStageCounts;
+    std::vector<unsigned int> frozenInstanceCounts;
+    std::vector<std::vector<char>> frozenInstanceData;
+
+    std::vector<vk::Buffer> paramsBuffers;
+    std::vector<VmaAllocation> paramsAllocations;
+    std::vector<void*> paramsMappings;
+    std::vector<unsigned long long> paramsCapacities;
+
+    // Each submit writes its parameters into the next slot of the buffer and only waits on the
+    // submission that last used that slot
+    std::vector<unsigned long long> paramsSlotSizes;
+    std::vector<std::vector<struct StreamSubmission>> paramsSlots;
+    std::vector<int> paramsNextSlots;
+
+    bool profiling;
+    std::vector<vk::QueryPool> queryPools;
+    std::vector<uint32_t> queryCapacities;
+    std::vector<uint32_t> queryCounts;
+    std::vector<Stream*> queryStreams;
+    std::vector<uint64_t> querySubmissions;
+
+    std::vector<struct CommandList*> dependencies;
+    std::vector<Stream*> lastStreams;
+    std::vector<uint64_t> lastSubmissions;
+    // Guards only the last submission, it is never held while taking another lock
+    std::mutex lastMutex;
+
+    std::mutex mutex;
 };
 
 struct FFTPlan {
@@ -198,12 +378,23 @@ struct ComputePlan {
     std::vector<vk::Pipeline> pipelines;
     uint32_t binding_count;
     uint32_t pc_size;
+    int params_binding;
 };
 
+struct Future {
+    struct Context* ctx;
+    std::vector<Stream*> streams;
+    std::vector<uint64_t> submissions;
+};
+
+void future_add_submission(struct Future* future, struct Stream* stream, uint64_t submission);
+
 struct DescriptorSet {
     struct ComputePlan* plan;
     std::vector<vk::DescriptorSet> sets;
     std::vector<vk::DescriptorPool> pools;
+    std::vector<vk::Buffer> paramsBuffers;
+    std::vector<struct Buffer*> boundBuffers;
 };
 
 #endif // INTERNAL_H
\ No newline at end of file
@@ -73,7 +73,7 @@ struct ComputePlan* stage_compute_plan_create_extern(struct Context* ctx, struct
     plan->ctx = ctx;
     plan->pc_size = create_info->pc_size;
     plan->binding_count = create_info->binding_count;
-    plan->poolSizes.reserve(ctx->deviceCount);
+    plan->params_binding = -1;
 
     for (int i = 0; i < ctx->deviceCount; i++) {
 
@@ -94,9 +94,17 @@ struct ComputePlan* stage_compute_plan_create_extern(struct Context* ctx, struct
         free(code);
 
         std::vector<vk::DescriptorSetLayoutBinding> bindings;
+        plan->poolSizes.push_back(std::vector<vk::DescriptorPoolSize>());
 
         for (int j = 0; j < create_info->binding_count; j++) {
-            if(create_info->descriptorTypes[j] != DESCRIPTOR_TYPE_STORAGE_BUFFER) {
+            vk::DescriptorType descriptorType;
+
+            if(create_info->descriptorTypes[j] == DESCRIPTOR_TYPE_STORAGE_BUFFER) {
+                descriptorType = vk::DescriptorType::eStorageBuffer;
+            } else if(create_info->descriptorTypes[j] == DESCRIPTOR_TYPE_STORAGE_BUFFER_DYNAMIC) {
+                descriptorType = vk::DescriptorType::eStorageBufferDynamic;
+                plan->params_binding = j;
+            } else {
                 LOG_ERROR("Only storage buffers are supported for now");
                 return NULL;
             }
@@ -104,14 +112,14 @@ struct ComputePlan* stage_compute_plan_create_extern(struct Context* ctx, struct
             bindings.push_back(
                 vk::DescriptorSetLayoutBinding()
                 .setBinding(j)
-                .setDescriptorType(vk::DescriptorType::eStorageBuffer)
+                .setDescriptorType(descriptorType)
                 .setDescriptorCount(1)
                 .setStageFlags(vk::ShaderStageFlagBits::eCompute)
             );
 
             plan->poolSizes[i].push_back(
                 vk::DescriptorPoolSize()
-                .setType(vk::DescriptorType::eStorageBuffer)
+                .setType(descriptorType)
                 .setDescriptorCount(1)
             );
         }
@@ -121,15 +129,17 @@ struct ComputePlan* stage_compute_plan_create_extern(struct Context* ctx, struct
             .setBindings(bindings)
         ));
 
+        vk::PushConstantRange pushConstantRange = vk::PushConstantRange()
+            .setOffset(0)
+            .setSize(create_info->pc_size)
+            .setStageFlags(vk::ShaderStageFlagBits::eCompute);
+
+        // Shaders reading their parameters from the command list's parameters buffer have no push constants
         plan->pipelineLayouts.push_back(ctx->devices[i].createPipelineLayout(
             vk::PipelineLayoutCreateInfo()
             .setSetLayouts(plan->descriptorSetLayouts[i])
-            .setPushConstantRanges(
-                vk::PushConstantRange()
-                .setOffset(0)
-                .setSize(create_info->pc_size)
-                .setStageFlags(vk::ShaderStageFlagBits::eCompute)
-            )
+            .setPushConstantRangeCount(plan->params_binding == -1 ? 1 : 0)
+            .setPPushConstantRanges(&pushConstantRange)
         ));
 
         auto pipelineResult = ctx->devices[i].createComputePipeline(
@@ -162,9 +172,11 @@ struct ComputeRecordInfo {
     unsigned int blocks_y;
     unsigned int blocks_z;
     unsigned int pc_size;
+    struct Buffer* indirect_buffer;
+    unsigned long long indirect_offset;
 };
 
-void stage_compute_record_extern(struct CommandList* command_list, struct ComputePlan* plan, struct DescriptorSet* descriptor_set, unsigned int blocks_x, unsigned int blocks_y, unsigned int blocks_z) {
+static void stage_compute_record(struct CommandList* command_list, struct ComputePlan* plan, struct DescriptorSet* descriptor_set, unsigned int blocks_x, unsigned int blocks_y, unsigned int blocks_z, struct Buffer* indirect_buffer, unsigned long long indirect_offset) {
     struct ComputeRecordInfo* my_compute_info = (struct ComputeRecordInfo*)malloc(sizeof(struct ComputeRecordInfo));
     my_compute_info->plan = plan;
     my_compute_info->descriptor_set = descriptor_set;
@@ -172,35 +184,80 @@ void stage_compute_record_extern(struct CommandList* command_list, struct Comput
     my_compute_info->blocks_y = blocks_y;
     my_compute_info->blocks_z = blocks_z;
     my_compute_info->pc_size = plan->pc_size;
+    my_compute_info->indirect_buffer = indirect_buffer;
+    my_compute_info->indirect_offset = indirect_offset;
+
+    // Shader bindings are not marked readonly, so every bound buffer counts as written
+    std::vector<struct Buffer*> writes;
+
+    for(int i = 0; i < descriptor_set->boundBuffers.size(); i++) {
+        if(descriptor_set->boundBuffers[i] != NULL)
+            writes.push_back(descriptor_set->boundBuffers[i]);
+    }
+
+    std::vector<struct Buffer*> reads;
+    vk::PipelineStageFlags stage_flags = vk::PipelineStageFlagBits::eComputeShader;
+
+    // The workgroup counts are read by the indirect command stage, which barriers must also cover
+    if(indirect_buffer != NULL) {
+        reads.push_back(indirect_buffer);
+        stage_flags |= vk::PipelineStageFlagBits::eDrawIndirect;
+    }
 
     command_list->stages.push_back({
-        [](vk::CommandBuffer& cmd_buffer, struct Stage* stage, void* instance_data, int device) {
+        [](vk::CommandBuffer& cmd_buffer, struct Stage* stage, void* instance_data, uint32_t params_offset, int device) {
             LOG_INFO("Executing Compute");
 
-            struct ComputeRecordInfo* my_compute_info = (struct ComputeRecordInfo*)stage->user_data;
+            struct ComputeRecordInfo* my_compute_info = (struct ComputeRecordInfo*)stage->user_data.get();
 
             cmd_buffer.bindPipeline(vk::PipelineBindPoint::eCompute, my_compute_info->plan->pipelines[device]);
-            
-            cmd_buffer.bindDescriptorSets(
-                vk::PipelineBindPoint::eCompute, 
-                my_compute_info->plan->pipelineLayouts[device], 
-                0, 
-                my_compute_info->descriptor_set->sets[device], 
-                nullptr
-            );
-            
-            cmd_buffer.pushConstants(
-                my_compute_info->plan->pipelineLayouts[device], 
-                vk::ShaderStageFlagBits::eCompute, 
-                0, 
-                my_compute_info->pc_size, 
-                instance_data
-            );
 
-            cmd_buffer.dispatch(my_compute_info->blocks_x, my_compute_info->blocks_y, my_compute_info->blocks_z);
+            if(stage->params_set != NULL) {
+                // The parameters are read from this instance's slot in the command list's parameters buffer
+                cmd_buffer.bindDescriptorSets(
+                    vk::PipelineBindPoint::eCompute, 
+                    my_compute_info->plan->pipelineLayouts[device], 
+                    0, 
+                    my_compute_info->descriptor_set->sets[device], 
+                    params_offset
+                );
+            } else {
+                cmd_buffer.bindDescriptorSets(
+                    vk::PipelineBindPoint::eCompute, 
+                    my_compute_info->plan->pipelineLayouts[device], 
+                    0, 
+                    my_compute_info->descriptor_set->sets[device], 
+                    nullptr
+                );
+                
+                cmd_buffer.pushConstants(
+                    my_compute_info->plan->pipelineLayouts[device], 
+                    vk::ShaderStageFlagBits::eCompute, 
+                    0, 
+                    my_compute_info->pc_size, 
+                    instance_data
+                );
+            }
+
+            if(my_compute_info->indirect_buffer != NULL) {
+                cmd_buffer.dispatchIndirect(my_compute_info->indirect_buffer->buffers[device], my_compute_info->indirect_offset);
+            } else {
+                cmd_buffer.dispatch(my_compute_info->blocks_x, my_compute_info->blocks_y, my_compute_info->blocks_z);
+            }
         },
-        my_compute_info,
+        std::shared_ptr<void>(my_compute_info, free),
         plan->pc_size,
-        vk::PipelineStageFlagBits::eComputeShader
+        stage_flags,
+        plan->params_binding == -1 ? NULL : descriptor_set,
+        reads,
+        writes
     });
+}
+
+void stage_compute_record_extern(struct CommandList* command_list, struct ComputePlan* plan, struct DescriptorSet* descriptor_set, unsigned int blocks_x, unsigned int blocks_y, unsigned int blocks_z) {
+    stage_compute_record(command_list, plan, descriptor_set, blocks_x, blocks_y, blocks_z, NULL, 0);
+}
+
+void stage_compute_record_indirect_extern(struct CommandList* command_list, struct ComputePlan* plan, struct DescriptorSet* descriptor_set, struct Buffer* indirect_buffer, unsigned long long offset) {
+    stage_compute_record(command_list, plan, descriptor_set, 0, 0, 0, indirect_buffer, offset);
 }
\ No newline at end of file
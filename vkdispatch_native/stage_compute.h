@@ -9,6 +9,7 @@ enum DescriptorType {
     DESCRIPTOR_TYPE_UNIFORM_BUFFER = 3,
     DESCRIPTOR_TYPE_UNIFORM_IMAGE = 4,
     DESCRIPTOR_TYPE_SAMPLER = 5,
+    DESCRIPTOR_TYPE_STORAGE_BUFFER_DYNAMIC = 6,
 };
 
 struct ComputePlanCreateInfo {
@@ -20,5 +21,6 @@ struct ComputePlanCreateInfo {
 
 struct ComputePlan* stage_compute_plan_create_extern(struct Context* ctx, struct ComputePlanCreateInfo* create_info);
 void stage_compute_record_extern(struct CommandList* command_list, struct ComputePlan* plan, struct DescriptorSet* descriptor_set, unsigned int blocks_x, unsigned int blocks_y, unsigned int blocks_z);
+void stage_compute_record_indirect_extern(struct CommandList* command_list, struct ComputePlan* plan, struct DescriptorSet* descriptor_set, struct Buffer* indirect_buffer, unsigned long long offset);
 
 #endif // _STAGE_COMPUTE_H_
\ No newline at end of file
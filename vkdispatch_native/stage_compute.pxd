@@ -11,6 +11,7 @@ cdef extern from "stage_compute.h":
     struct Context
     struct CommandList
     struct DescriptorSet
+    struct Buffer
 
     enum DescriptorType:
         DESCRIPTOR_TYPE_STORAGE_BUFFER = 1
@@ -18,6 +19,7 @@ cdef extern from "stage_compute.h":
         DESCRIPTOR_TYPE_UNIFORM_BUFFER = 3
         DESCRIPTOR_TYPE_UNIFORM_IMAGE = 4
         DESCRIPTOR_TYPE_SAMPLER = 5
+        DESCRIPTOR_TYPE_STORAGE_BUFFER_DYNAMIC = 6
     
     struct ComputePlanCreateInfo:
         const char* shader_source
@@ -27,19 +29,26 @@ cdef extern from "stage_compute.h":
 
     ComputePlan* stage_compute_plan_create_extern(Context* ctx, ComputePlanCreateInfo* create_info)
     void stage_compute_record_extern(CommandList* command_list, ComputePlan* plan, DescriptorSet* descriptor_set, unsigned int blocks_x, unsigned int blocks_y, unsigned int blocks_z)
+    void stage_compute_record_indirect_extern(CommandList* command_list, ComputePlan* plan, DescriptorSet* descriptor_set, Buffer* indirect_buffer, unsigned long long offset)
 
-cpdef inline stage_compute_plan_create(unsigned long long context, bytes shader_source, unsigned int binding_count, unsigned int pc_size):
+cpdef inline stage_compute_plan_create(unsigned long long context, bytes shader_source, unsigned int binding_count, unsigned int pc_size, bool params_buffer = False):
     cdef Context* ctx = <Context*>context
 
+    # The parameters buffer takes the binding right after the shader's own buffers
+    cdef unsigned int total_binding_count = binding_count + 1 if params_buffer else binding_count
+
     cdef ComputePlanCreateInfo create_info
     create_info.shader_source = shader_source
-    create_info.descriptorTypes = <DescriptorType*>malloc(binding_count * sizeof(DescriptorType))
-    create_info.binding_count = binding_count
+    create_info.descriptorTypes = <DescriptorType*>malloc(total_binding_count * sizeof(DescriptorType))
+    create_info.binding_count = total_binding_count
     create_info.pc_size = pc_size
 
     for i in range(binding_count):
         create_info.descriptorTypes[i] = DESCRIPTOR_TYPE_STORAGE_BUFFER
 
+    if params_buffer:
+        create_info.descriptorTypes[binding_count] = DESCRIPTOR_TYPE_STORAGE_BUFFER_DYNAMIC
+
     cdef ComputePlan* plan = stage_compute_plan_create_extern(ctx, &create_info)
 
     free(create_info.descriptorTypes)
@@ -52,3 +61,8 @@ cpdef inline stage_compute_record(unsigned long long command_list, unsigned long
     cdef DescriptorSet* ds = <DescriptorSet*>descriptor_set
     stage_compute_record_extern(cl, p, ds, blocks_x, blocks_y, blocks_z)
 
+cpdef inline stage_compute_record_indirect(unsigned long long command_list, unsigned long long plan, unsigned long long descriptor_set, unsigned long long indirect_buffer, unsigned long long offset):
+    cdef CommandList* cl = <CommandList*>command_list
+    cdef ComputePlan* p = <ComputePlan*>plan
+    cdef DescriptorSet* ds = <DescriptorSet*>descriptor_set
+    stage_compute_record_indirect_extern(cl, p, ds, <Buffer*>indirect_buffer, offset)
@@ -12,8 +12,13 @@ struct FFTPlan* stage_fft_plan_create_extern(struct Context* ctx, unsigned long
 
         plan->datas[i].physicalDevice = ctx->physicalDevices[i];
         plan->datas[i].device = ctx->devices[i];
-        plan->datas[i].queue = ctx->streams[i]->queue;
-        plan->datas[i].commandPool = ctx->streams[i]->commandPool;
+        plan->datas[i].queue = ctx->streams[i][0]->queue;
+
+        // The stream pools belong to the stream threads, VkFFT gets its own for its setup uploads
+        plan->datas[i].commandPool = ctx->devices[i].createCommandPool(
+            vk::CommandPoolCreateInfo()
+            .setQueueFamilyIndex(ctx->streams[i][0]->queueFamilyIndex)
+        );
         plan->datas[i].fence = ctx->devices[i].createFence(vk::FenceCreateInfo());
         plan->datas[i].bufferSize = buffer_size;
 
@@ -27,9 +32,21 @@ struct FFTPlan* stage_fft_plan_create_extern(struct Context* ctx, unsigned long
         plan->configs[i].commandPool = &plan->datas[i].commandPool;
         plan->configs[i].fence = &plan->datas[i].fence;
         plan->configs[i].bufferSize = &plan->datas[i].bufferSize;
+
+        // The buffer offset is given with every launch, so one plan serves views at any offset
+        plan->configs[i].specifyOffsetsAtLaunch = 1;
         plan->configs[i].isCompilerInitialized = true;
         
-        VkFFTResult resFFT = initializeVkFFT(&plan->apps[i], plan->configs[i]);
+        VkFFTResult resFFT;
+
+        {
+            std::unique_lock<std::mutex> queue_lock(*ctx->streams[i][0]->queue_mutex);
+            resFFT = initializeVkFFT(&plan->apps[i], plan->configs[i]);
+        }
+
+        ctx->devices[i].destroyCommandPool(plan->datas[i].commandPool);
+        plan->datas[i].commandPool = VK_NULL_HANDLE;
+
         if (resFFT != VKFFT_SUCCESS) {
             LOG_ERROR("Failed to initialize VkFFT %d", resFFT);
             return NULL;
@@ -43,33 +60,41 @@ struct FFTRecordInfo {
     struct FFTPlan* plan;
     struct Buffer* buffer;
     int inverse;
+    unsigned long long offset;
 };
 
-void stage_fft_record_extern(struct CommandList* command_list, struct FFTPlan* plan, struct Buffer* buffer, int inverse) {
+void stage_fft_record_extern(struct CommandList* command_list, struct FFTPlan* plan, struct Buffer* buffer, int inverse, unsigned long long offset) {
     struct FFTRecordInfo* my_fft_info = (struct FFTRecordInfo*)malloc(sizeof(struct FFTRecordInfo));
     my_fft_info->plan = plan;
     my_fft_info->buffer = buffer;
     my_fft_info->inverse = inverse;
+    my_fft_info->offset = offset;
 
     command_list->stages.push_back({
-        [](vk::CommandBuffer& cmd_buffer, struct Stage* stage, void* instance_data, int device) {
+        [](vk::CommandBuffer& cmd_buffer, struct Stage* stage, void* instance_data, uint32_t params_offset, int device) {
             LOG_INFO("Executing FFT");
 
-            struct FFTRecordInfo* my_fft_info = (struct FFTRecordInfo*)stage->user_data;
+            struct FFTRecordInfo* my_fft_info = (struct FFTRecordInfo*)stage->user_data.get();
 
             VkBuffer temp_buf = my_fft_info->buffer->buffers[device];
             VkCommandBuffer temp_cmd = static_cast<VkCommandBuffer>(cmd_buffer);
 
-            my_fft_info->plan->launchParams[device].buffer = &temp_buf;
-            my_fft_info->plan->launchParams[device].commandBuffer = &temp_cmd;
+            // Stream threads can record the same plan concurrently, so the launch parameters stay local
+            VkFFTLaunchParams launch_params = my_fft_info->plan->launchParams[device];
+            launch_params.buffer = &temp_buf;
+            launch_params.commandBuffer = &temp_cmd;
+            launch_params.bufferOffset = my_fft_info->offset;
 
-            VkFFTResult fftRes = VkFFTAppend(&my_fft_info->plan->apps[device], my_fft_info->inverse, &my_fft_info->plan->launchParams[device]);
+            VkFFTResult fftRes = VkFFTAppend(&my_fft_info->plan->apps[device], my_fft_info->inverse, &launch_params);
             if (fftRes != VKFFT_SUCCESS) {
                 LOG_ERROR("Failed to append VkFFT %d", fftRes);
             }
         },
-        my_fft_info,
+        std::shared_ptr<void>(my_fft_info, free),
         0,
-        vk::PipelineStageFlagBits::eComputeShader
+        vk::PipelineStageFlagBits::eComputeShader,
+        NULL,
+        {},
+        {buffer}
     });
 }
\ No newline at end of file
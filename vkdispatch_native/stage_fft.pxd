@@ -14,7 +14,7 @@ cdef extern from "stage_fft.h":
 
 
     FFTPlan* stage_fft_plan_create_extern(Context* ctx, unsigned long long dims, unsigned long long rows, unsigned long long cols, unsigned long long depth, unsigned long long buffer_size)
-    void stage_fft_record_extern(CommandList* command_list, FFTPlan* plan, Buffer* buffer, int inverse)
+    void stage_fft_record_extern(CommandList* command_list, FFTPlan* plan, Buffer* buffer, int inverse, unsigned long long offset)
 
 cpdef inline stage_fft_plan_create(unsigned long long context, list[int] dims, unsigned long long buffer_size):
     assert len(dims) > 0 and len(dims) < 4, "dims must be a list of length 1, 2, or 3"
@@ -36,9 +36,9 @@ cpdef inline stage_fft_plan_create(unsigned long long context, list[int] dims, u
 
     return <unsigned long long>plan
 
-cpdef inline stage_fft_record(unsigned long long command_list, unsigned long long plan, unsigned long long buffer, int inverse):
+cpdef inline stage_fft_record(unsigned long long command_list, unsigned long long plan, unsigned long long buffer, int inverse, unsigned long long offset):
     cdef CommandList* cl = <CommandList*>command_list
     cdef FFTPlan* p = <FFTPlan*>plan
     cdef Buffer* b = <Buffer*>buffer
 
-    stage_fft_record_extern(cl, p, b, inverse)
\ No newline at end of file
+    stage_fft_record_extern(cl, p, b, inverse, offset)
\ No newline at end of file
@@ -9,10 +9,10 @@ void stage_transfer_record_copy_buffer_extern(struct CommandList* command_list,
     LOG_INFO("Recording copy buffer stage");
 
     command_list->stages.push_back({
-        [](vk::CommandBuffer& cmd_buffer, struct Stage* stage, void* instance_data, int device) {
+        [](vk::CommandBuffer& cmd_buffer, struct Stage* stage, void* instance_data, uint32_t params_offset, int device) {
             LOG_INFO("Executing copy buffer stage");
 
-            struct BufferCopyInfo* copy_info = (struct BufferCopyInfo*)stage->user_data;
+            struct BufferCopyInfo* copy_info = (struct BufferCopyInfo*)stage->user_data.get();
 
             cmd_buffer.copyBuffer(copy_info->src->buffers[device], copy_info->dst->buffers[device], 
                 vk::BufferCopy()
@@ -21,9 +21,12 @@ void stage_transfer_record_copy_buffer_extern(struct CommandList* command_list,
                 .setSize(copy_info->size)
             );
         },
-        my_copy_info,
+        std::shared_ptr<void>(my_copy_info, free),
         0,
-        vk::PipelineStageFlagBits::eTransfer
+        vk::PipelineStageFlagBits::eTransfer,
+        NULL,
+        {copy_info->src},
+        {copy_info->dst}
     });
 }
 
@@ -33,7 +36,7 @@ void stage_transfer_record_copy_image_extern(struct CommandList* command_list, s
 /*
     command_list->stages.push_back({
         [](VKLCommandBuffer* cmd_buffer, struct Stage* stage, void* instanceData, int device) {
-            struct ImageCopyInfo* copy_info = (struct ImageCopyInfo*)stage->user_data;
+            struct ImageCopyInfo* copy_info = (struct ImageCopyInfo*)stage->user_data.get();
 
             VkImageCopy imageCopy = {};
             imageCopy.srcOffset = copy_info->src_offset;
@@ -56,7 +59,7 @@ void stage_transfer_record_copy_image_extern(struct CommandList* command_list, s
 
             cmd_buffer->copyImage(copy_info->src->images[device], copy_info->dst->images[device], imageCopy);
         },
-        my_copy_info,
+        std::shared_ptr<void>(my_copy_info, free),
         0,
         VK_PIPELINE_STAGE_TRANSFER_BIT
     });
@@ -70,7 +73,7 @@ void stage_transfer_record_copy_buffer_to_image_extern(struct CommandList* comma
 /*
     command_list->stages.push_back({
         [](VKLCommandBuffer* cmd_buffer, struct Stage* stage, void* instanceData, int device) {
-            struct ImageBufferCopyInfo* copy_info = (struct ImageBufferCopyInfo*)stage->user_data;
+            struct ImageBufferCopyInfo* copy_info = (struct ImageBufferCopyInfo*)stage->user_data.get();
 
             VkBufferImageCopy bufferImageCopy = {};
             bufferImageCopy.bufferOffset = copy_info->buffer_offset;
@@ -95,7 +98,7 @@ void stage_transfer_record_copy_buffer_to_image_extern(struct CommandList* comma
                 &bufferImageCopy
             );
         },
-        my_copy_info,
+        std::shared_ptr<void>(my_copy_info, free),
         0,
         VK_PIPELINE_STAGE_TRANSFER_BIT
     });
@@ -109,7 +112,7 @@ void stage_transfer_record_copy_image_to_buffer_extern(struct CommandList* comma
 /*
     command_list->stages.push_back({
         [](VKLCommandBuffer* cmd_buffer, struct Stage* stage, void* instanceData, int device) {
-            struct ImageBufferCopyInfo* copy_info = (struct ImageBufferCopyInfo*)stage->user_data;
+            struct ImageBufferCopyInfo* copy_info = (struct ImageBufferCopyInfo*)stage->user_data.get();
 
             VkBufferImageCopy bufferImageCopy = {};
             bufferImageCopy.bufferOffset = copy_info->buffer_offset;
@@ -134,7 +137,7 @@ void stage_transfer_record_copy_image_to_buffer_extern(struct CommandList* comma
                 &bufferImageCopy
             );
         },
-        my_copy_info,
+        std::shared_ptr<void>(my_copy_info, free),
         0,
         VK_PIPELINE_STAGE_TRANSFER_BIT
     });
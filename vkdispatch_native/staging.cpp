@@ -0,0 +1,82 @@
+#include "internal.h"
+
+struct StagingRing* staging_ring_create(struct Context* ctx, int device, unsigned long long size, int slice_count) {
+    struct StagingRing* ring = new struct StagingRing();
+    ring->size = size;
+    ring->next_slice = 0;
+
+    vk::BufferCreateInfo bufferCreateInfo = vk::BufferCreateInfo()
+        .setSize(size)
+        .setUsage(vk::BufferUsageFlagBits::eTransferSrc | vk::BufferUsageFlagBits::eTransferDst);
+
+    // The ring stays mapped for the lifetime of the context
+    VmaAllocationCreateInfo vmaAllocationCreateInfo = {};
+    vmaAllocationCreateInfo.flags = VMA_ALLOCATION_CREATE_HOST_ACCESS_RANDOM_BIT | VMA_ALLOCATION_CREATE_MAPPED_BIT;
+    vmaAllocationCreateInfo.usage = VMA_MEMORY_USAGE_AUTO_PREFER_HOST;
+
+    VkBufferCreateInfo bufferCreateInfoStruct = static_cast<VkBufferCreateInfo>(bufferCreateInfo);
+    VkBuffer temp_buffer;
+    VmaAllocationInfo vmaAllocationInfo;
+    VK_CALL(vmaCreateBuffer(ctx->allocators[device], &bufferCreateInfoStruct, &vmaAllocationCreateInfo, &temp_buffer, &ring->allocation, &vmaAllocationInfo));
+
+    LOG_INFO("Staging ring of size %llu created %p", size, temp_buffer);
+
+    ring->buffer = temp_buffer;
+    ring->mapped = (char*)vmaAllocationInfo.pMappedData;
+
+    // Slices stay aligned so that copies into them keep the optimal copy offset alignment
+    unsigned long long slice_size = (size / slice_count) & ~((unsigned long long)255);
+
+    for(int i = 0; i < slice_count; i++) {
+        struct StagingSlice slice = {};
+        slice.offset = i * slice_size;
+        slice.size = slice_size;
+
+        ring->slices.push_back(slice);
+    }
+
+    return ring;
+}
+
+void staging_ring_destroy(struct Context* ctx, int device, struct StagingRing* ring) {
+    for(struct StagingSlice& slice : ring->slices)
+        staging_slice_finish(ring, &slice);
+
+    vmaDestroyBuffer(ctx->allocators[device], ring->buffer, ring->allocation);
+
+    delete ring;
+}
+
+void staging_slice_finish(struct StagingRing* ring, struct StagingSlice* slice) {
+    if(slice->stream != NULL)
+        slice->stream->wait(slice->submission, UINT64_MAX);
+
+    // A read copied into this slice is handed to its destination before the slice is reused
+    if(slice->readback_dst != NULL)
+        memcpy(slice->readback_dst, ring->mapped + slice->offset, slice->readback_size);
+
+    slice->stream = NULL;
+    slice->submission = 0;
+    slice->readback_dst = NULL;
+    slice->readback_size = 0;
+}
+
+struct StagingSlice* staging_ring_acquire(struct StagingRing* ring) {
+    struct StagingSlice* slice = &ring->slices[ring->next_slice];
+    ring->next_slice = (ring->next_slice + 1) % ring->slices.size();
+
+    staging_slice_finish(ring, slice);
+
+    return slice;
+}
+
+void staging_ring_flush(struct StagingRing* ring, void* data, unsigned long long size) {
+    char* start = (char*)data;
+
+    for(struct StagingSlice& slice : ring->slices) {
+        char* dst = (char*)slice.readback_dst;
+
+        if(dst != NULL && dst >= start && dst < start + size)
+            staging_slice_finish(ring, &slice);
+    }
+}
@@ -1,8 +1,28 @@
 #include "internal.h"
 
-Stream::Stream(vk::Device device, vk::Queue queue, int queueFamilyIndex, uint32_t command_buffer_count) {
+#include <chrono>
+#include <algorithm>
+
+void stream_add_wait(std::vector<struct StreamSubmission>& waits, struct StreamSubmission submission) {
+    // Submits on the same stream are not ordered by the queue, so they wait on the stream's own timeline as well
+    if(submission.stream == NULL || submission.stream->done(submission.submission))
+        return;
+
+    for(int i = 0; i < waits.size(); i++) {
+        if(waits[i].stream == submission.stream) {
+            waits[i].submission = std::max(waits[i].submission, submission.submission);
+            return;
+        }
+    }
+
+    waits.push_back(submission);
+}
+
+Stream::Stream(vk::Device device, vk::Queue queue, int queueFamilyIndex, std::mutex* queue_mutex, uint32_t command_buffer_count) {
     this->device = device;
     this->queue = queue;
+    this->queue_mutex = queue_mutex;
+    this->queueFamilyIndex = queueFamilyIndex;
 
     this->commandPool = device.createCommandPool(
         vk::CommandPoolCreateInfo()
@@ -16,75 +36,219 @@ Stream::Stream(vk::Device device, vk::Queue queue, int queueFamilyIndex, uint32_
         .setLevel(vk::CommandBufferLevel::ePrimary)
         .setCommandBufferCount(command_buffer_count)
     );
-    
-    this->current_index = commandBuffers.size() - 1;
 
-    for(int i = 0; i < command_buffer_count; i++) {
-        this->fences.push_back(device.createFence(
-            vk::FenceCreateInfo()
-            .setFlags(i == current_index ? vk::FenceCreateFlags() : vk::FenceCreateFlagBits::eSignaled)
-        ));
+    this->current_index = 0;
 
-        this->semaphores.push_back(device.createSemaphore(vk::SemaphoreCreateInfo()));
-    }
+    for(int i = 0; i < command_buffer_count; i++)
+        this->slot_submissions.push_back(0);
 
-    commandBuffers[0].begin(
-        vk::CommandBufferBeginInfo()
-        .setFlags(vk::CommandBufferUsageFlagBits::eOneTimeSubmit)
-    );
+    vk::SemaphoreTypeCreateInfo timelineInfo = vk::SemaphoreTypeCreateInfo()
+        .setSemaphoreType(vk::SemaphoreType::eTimeline)
+        .setInitialValue(0);
 
-    commandBuffers[0].end();
+    // Signaled with each submission id, which tracks completion and lets other submits wait on work queued here
+    this->timeline = device.createSemaphore(vk::SemaphoreCreateInfo().setPNext(&timelineInfo));
 
-    queue.submit(
-        vk::SubmitInfo()
-        .setPSignalSemaphores(&semaphores.data()[1])
-        .setSignalSemaphoreCount(semaphores.size() - 1)
-        .setCommandBuffers(commandBuffers[0])
-    , fences[current_index]);
+    this->submission_count = 0;
+    this->recorded_count = 0;
+    this->running = true;
 
-    device.waitForFences(fences[current_index], VK_TRUE, UINT64_MAX);
+    this->worker = std::thread(&Stream::thread_worker, this);
 }
 
 void Stream::destroy() {
-    for(int i = 0; i < fences.size(); i++) {
-        device.destroyFence(fences[i]);
+    {
+        std::unique_lock<std::mutex> lock(mutex);
+        running = false;
     }
 
+    cv.notify_all();
+    worker.join();
+
+    wait_idle();
+
+    device.destroySemaphore(timeline);
     device.freeCommandBuffers(commandPool, commandBuffers);
-    device.destroyCommandPool(commandPool); 
+    device.destroyCommandPool(commandPool);
 
-    fences.clear();
+    slot_submissions.clear();
 }
 
-vk::CommandBuffer& Stream::begin() {
-    device.waitForFences(fences[current_index], VK_TRUE, UINT64_MAX);
-    device.resetFences(fences[current_index]);
+uint64_t Stream::push_task(struct StreamTask task) {
+    uint64_t submission;
 
-    commandBuffers[current_index].begin(
-        vk::CommandBufferBeginInfo()
-        .setFlags(vk::CommandBufferUsageFlagBits::eOneTimeSubmit)
-    );
+    {
+        std::unique_lock<std::mutex> lock(mutex);
+
+        submission = ++submission_count;
+        task.submission = submission;
+        tasks.push_back(std::move(task));
+    }
+
+    cv.notify_all();
+
+    return submission;
+}
+
+uint64_t Stream::record(std::function<void(vk::CommandBuffer&)> record_func, std::vector<struct StreamSubmission> waits) {
+    struct StreamTask task;
+    task.record = std::move(record_func);
+    task.waits = std::move(waits);
+
+    return push_task(std::move(task));
+}
+
+uint64_t Stream::submit(vk::CommandBuffer& cmd_buffer, std::vector<struct StreamSubmission> waits) {
+    struct StreamTask task;
+    task.cmd_buffer = cmd_buffer;
+    task.waits = std::move(waits);
+
+    return push_task(std::move(task));
+}
+
+void Stream::thread_worker() {
+    while(true) {
+        struct StreamTask task;
+
+        {
+            std::unique_lock<std::mutex> lock(mutex);
+            cv.wait(lock, [this] { return !tasks.empty() || !running; });
+
+            // Pending tasks are always drained before the worker exits
+            if(tasks.empty())
+                return;
+
+            task = std::move(tasks.front());
+            tasks.pop_front();
+        }
+
+        vk::CommandBuffer cmd_buffer = task.cmd_buffer;
+
+        // Prerecorded command buffers are owned by the caller, only recorded tasks take a slot of the ring
+        if(task.record) {
+            acquire();
+
+            slot_submissions[current_index] = task.submission;
+            cmd_buffer = commandBuffers[current_index];
+            current_index = (current_index + 1) % commandBuffers.size();
+
+            cmd_buffer.begin(
+                vk::CommandBufferBeginInfo()
+                .setFlags(vk::CommandBufferUsageFlagBits::eOneTimeSubmit)
+            );
+
+            task.record(cmd_buffer);
+
+            cmd_buffer.end();
+        }
 
-    return commandBuffers[current_index];
+        enqueue(cmd_buffer, task.submission, task.waits);
+
+        {
+            std::unique_lock<std::mutex> lock(mutex);
+            recorded_count = task.submission;
+        }
+
+        cv.notify_all();
+    }
+}
+
+void Stream::acquire() {
+    // The slot's last command buffer has finished executing once the timeline reaches its submission
+    uint64_t submission = slot_submissions[current_index];
+
+    device.waitSemaphores(
+        vk::SemaphoreWaitInfo()
+        .setSemaphores(timeline)
+        .setValues(submission)
+    , UINT64_MAX);
 }
 
-vk::Fence& Stream::submit() {
-    commandBuffers[current_index].end();
+void Stream::enqueue(vk::CommandBuffer& cmd_buffer, uint64_t submission, std::vector<struct StreamSubmission>& waits) {
+    // Submits only wait on the work they depend on, everything else in the queue may overlap with them
+    std::vector<vk::Semaphore> waitSemaphores;
+    std::vector<uint64_t> waitValues;
+
+    for(int i = 0; i < waits.size(); i++) {
+        // A task on another stream is only guaranteed to be in its queue once it was recorded
+        if(waits[i].stream != this)
+            waits[i].stream->wait_recorded(waits[i].submission);
+
+        waitSemaphores.push_back(waits[i].stream->timeline);
+        waitValues.push_back(waits[i].submission);
+    }
 
-    vk::Fence& result = fences[current_index];
+    std::vector<vk::PipelineStageFlags> waitStages(waitSemaphores.size(), vk::PipelineStageFlagBits::eAllCommands);
 
-    int last_index = current_index;
-    current_index = (current_index + 1) % commandBuffers.size();
+    vk::TimelineSemaphoreSubmitInfo timelineInfo = vk::TimelineSemaphoreSubmitInfo()
+        .setWaitSemaphoreValues(waitValues)
+        .setSignalSemaphoreValues(submission);
 
-    vk::PipelineStageFlags waitStage = vk::PipelineStageFlagBits::eAllCommands;
+    std::unique_lock<std::mutex> queue_lock(*queue_mutex);
 
+    // A signal operation covers all earlier work on the queue, so the timeline value only reaches
+    // a submission id once that submission and everything queued before it has completed
     queue.submit(
         vk::SubmitInfo()
-        .setWaitDstStageMask(waitStage)
-        .setWaitSemaphores(semaphores[last_index])
-        .setSignalSemaphores(semaphores[current_index])
-        .setCommandBuffers(commandBuffers[last_index])
-    , result);
-
-    return result;
-}
\ No newline at end of file
+        .setPNext(&timelineInfo)
+        .setWaitDstStageMask(waitStages)
+        .setWaitSemaphores(waitSemaphores)
+        .setSignalSemaphores(timeline)
+        .setCommandBuffers(cmd_buffer)
+    );
+}
+
+bool Stream::done(uint64_t submission) {
+    {
+        std::unique_lock<std::mutex> lock(mutex);
+
+        if(recorded_count < submission)
+            return false;
+    }
+
+    return device.getSemaphoreCounterValue(timeline) >= submission;
+}
+
+bool Stream::wait(uint64_t submission, uint64_t timeout) {
+    auto deadline = std::chrono::steady_clock::now() + std::chrono::nanoseconds(timeout == UINT64_MAX ? 0 : timeout);
+    auto recorded = [this, submission] { return recorded_count >= submission; };
+
+    {
+        std::unique_lock<std::mutex> lock(mutex);
+
+        // The task may still be queued for the worker thread, in which case nothing will signal the timeline yet
+        if(timeout == UINT64_MAX)
+            cv.wait(lock, recorded);
+        else if(!cv.wait_until(lock, deadline, recorded))
+            return false;
+    }
+
+    uint64_t remaining = UINT64_MAX;
+
+    if(timeout != UINT64_MAX) {
+        auto now = std::chrono::steady_clock::now();
+        remaining = now < deadline ? std::chrono::duration_cast<std::chrono::nanoseconds>(deadline - now).count() : 0;
+    }
+
+    return device.waitSemaphores(
+        vk::SemaphoreWaitInfo()
+        .setSemaphores(timeline)
+        .setValues(submission)
+    , remaining) == vk::Result::eSuccess;
+}
+
+void Stream::wait_recorded(uint64_t submission) {
+    std::unique_lock<std::mutex> lock(mutex);
+    cv.wait(lock, [this, submission] { return recorded_count >= submission; });
+}
+
+void Stream::wait_idle() {
+    uint64_t submission;
+
+    {
+        std::unique_lock<std::mutex> lock(mutex);
+        submission = submission_count;
+    }
+
+    wait(submission, UINT64_MAX);
+}
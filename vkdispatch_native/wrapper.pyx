@@ -7,11 +7,13 @@ import sys
 cimport init
 cimport context
 cimport buffer
+cimport buffer_pool
 cimport image
 cimport command_list
 cimport stage_transfer
 cimport stage_fft
 cimport stage_compute
 cimport descriptor_set
+cimport future
 
 assert sizeof(int) == sizeof(np.int32_t)
\ No newline at end of file